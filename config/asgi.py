@@ -11,6 +11,8 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 
+from config.serving import with_sync_thread_pool
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 # Initialize Django ASGI application early to ensure the AppRegistry
@@ -29,6 +31,6 @@ def get_websocket_application():
     )
 
 application = ProtocolTypeRouter({
-    "http": django_asgi_app,
+    "http": with_sync_thread_pool(django_asgi_app),
     "websocket": get_websocket_application(),
 })
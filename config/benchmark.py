@@ -0,0 +1,346 @@
+"""
+Reproducible API benchmarks on seeded synthetic data.
+
+`seed()` fills the database with a deterministic (seeded RNG) marketplace:
+users joining at an accelerating rate over the last year, a minority of
+travellers owning most listings (Zipf), popular diaspora routes dominating
+the feed, package requests concentrated on popular listings, conversations
+for a share of the requests with long-tailed message counts and a few unread
+messages at the end, and travel alerts. Every synthetic user's username starts
+with PREFIX, so `flush()` removes the data set again.
+
+`run()` drives the hot read endpoints through the DRF test client with the
+same users every time (the busiest traveller, an ordinary user for the feed,
+a superuser for the dashboard) and reports, per scenario, latency
+percentiles, the query count and the peak memory allocated while handling
+one request (tracemalloc). The result is plain JSON, so runs on two commits
+can be compared with `compare()`.
+
+    python manage.py seed_benchmark_data --users 2000
+    python manage.py run_benchmarks --output before.json
+    git checkout other-branch
+    python manage.py run_benchmarks --compare before.json
+"""
+import datetime
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from listings.models import Alert, LocationData, PackageRequest, TravelListing
+from messaging.models import Conversation, Message
+from users.models import Profile
+
+User = get_user_model()
+
+PREFIX = 'benchapi'
+ADMIN_USERNAME = f'{PREFIX}_admin'
+BATCH_SIZE = 2000
+
+DEFAULT_COUNTS = {
+    'users': 1000,
+    'listings': 3000,
+    'requests': 6000,
+    'conversations': 2000,
+    'messages': 30000,
+    'alerts': 800,
+}
+
+# (name, country, country_code), most travelled first.
+CITIES = [
+    ('Douala', 'Cameroon', 'CM'),
+    ('Paris', 'France', 'FR'),
+    ('Yaounde', 'Cameroon', 'CM'),
+    ('Brussels', 'Belgium', 'BE'),
+    ('Montreal', 'Canada', 'CA'),
+    ('Lagos', 'Nigeria', 'NG'),
+    ('London', 'United Kingdom', 'GB'),
+    ('Abidjan', "Cote d'Ivoire", 'CI'),
+    ('Berlin', 'Germany', 'DE'),
+    ('Dakar', 'Senegal', 'SN'),
+    ('Houston', 'United States', 'US'),
+    ('Lyon', 'France', 'FR'),
+]
+
+LISTING_STATUSES = (('published', 70), ('completed', 15), ('fully-booked', 5), ('drafted', 5), ('canceled', 5))
+REQUEST_STATUSES = (('pending', 50), ('accepted', 25), ('rejected', 15), ('completed', 10))
+
+
+def _zipf_weights(n, s=1.1):
+    return list(accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _bulk_create(model, objects):
+    return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def flush():
+    """Delete everything seed() created; returns the number of rows deleted."""
+    users = User.objects.filter(username__startswith=PREFIX)
+    # Conversations only reference users through the M2M table.
+    deleted = Conversation.objects.filter(participants__in=users).distinct().delete()[0]
+    return deleted + users.delete()[0]
+
+
+@transaction.atomic
+def seed(counts=None, seed=42):
+    """Create a synthetic data set (see the module docstring); returns the row counts."""
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = now.date()
+
+    users = _bulk_create(User, [
+        User(
+            username=f'{PREFIX}{i}',
+            email=f'{PREFIX}{i}@example.com',
+            phone_number=f'7{i:013d}',
+            password='!',
+            is_email_verified=rng.random() < 0.8,
+            # Signups accelerate: most accounts are recent.
+            date_joined=now - datetime.timedelta(days=365 * rng.random() ** 2, seconds=rng.randrange(86400)),
+        )
+        for i in range(counts['users'])
+    ])
+    # bulk_create skips the post_save signal that creates profiles.
+    _bulk_create(Profile, [Profile(user=user, full_name=f'Bench User {i}') for i, user in enumerate(users)])
+    User.objects.create(
+        username=ADMIN_USERNAME, email=f'{ADMIN_USERNAME}@example.com', phone_number='69999999999999',
+        password='!', is_staff=True, is_superuser=True,
+    )
+
+    locations = [
+        LocationData.objects.get_or_create(name=name, country=country, country_code=code)[0]
+        for name, country, code in CITIES
+    ]
+    routes = [(pickup, destination) for pickup in locations for destination in locations if pickup != destination]
+    route_weights = _zipf_weights(len(routes))
+
+    # A quarter of the users travel; the first ones far more often than the rest.
+    travellers = users[:max(1, len(users) // 4)]
+    traveller_weights = _zipf_weights(len(travellers))
+    listings = []
+    for _ in range(counts['listings']):
+        pickup, destination = rng.choices(routes, cum_weights=route_weights)[0]
+        listings.append(TravelListing(
+            user=rng.choices(travellers, cum_weights=traveller_weights)[0],
+            pickup_location=pickup,
+            destination_location=destination,
+            travel_date=today + datetime.timedelta(days=rng.randint(-60, 120)),
+            travel_time=datetime.time(rng.randrange(24), rng.choice((0, 15, 30, 45))),
+            maximum_weight_in_kg=Decimal(rng.choice((10, 15, 20, 23, 30, 46))),
+            notes=rng.choice(('', 'No liquids.', 'Documents and small electronics only.')),
+            price_per_kg=Decimal(rng.randint(500, 2500)) / 100,
+            price_per_document=Decimal(rng.randint(5, 20)),
+            status=_weighted(rng, LISTING_STATUSES),
+        ))
+    listings = _bulk_create(TravelListing, listings)
+    for listing in listings:
+        listing.created_at = now - datetime.timedelta(days=180 * rng.random() ** 1.5)
+    TravelListing.objects.bulk_update(listings, ['created_at'], batch_size=BATCH_SIZE)
+
+    listing_weights = _zipf_weights(len(listings), s=0.8)
+    requests = []
+    for _ in range(counts['requests']):
+        listing = rng.choices(listings, cum_weights=listing_weights)[0]
+        sender = rng.choice(users)
+        if sender.pk == listing.user_id:
+            continue
+        requests.append(PackageRequest(
+            user=sender,
+            travel_listing=listing,
+            package_description=rng.choice(('Clothes', 'Documents', 'Phone', 'Gifts for family')),
+            weight=Decimal(rng.randint(50, 2300)) / 100,
+            number_of_document=rng.choice((0, 0, 0, 1, 2)),
+            status=_weighted(rng, REQUEST_STATUSES),
+        ))
+    requests = _bulk_create(PackageRequest, requests)
+    for request in requests:
+        request.created_at = max(request.travel_listing.created_at, now - datetime.timedelta(days=rng.randint(0, 150)))
+    PackageRequest.objects.bulk_update(requests, ['created_at'], batch_size=BATCH_SIZE)
+
+    conversations = _bulk_create(Conversation, [
+        Conversation(travel_listing=request.travel_listing, package_request=request)
+        for request in rng.sample(requests, min(counts['conversations'], len(requests)))
+    ])
+    Participants = Conversation.participants.through
+    _bulk_create(Participants, [
+        Participants(conversation_id=conversation.pk, customuser_id=user_id)
+        for conversation in conversations
+        for user_id in (conversation.package_request.user_id, conversation.travel_listing.user_id)
+    ])
+
+    messages = []
+    if conversations:
+        # Long tail: most conversations hold a few messages, some hundreds.
+        lengths = [rng.paretovariate(1.2) for _ in conversations]
+        scale = counts['messages'] / sum(lengths)
+        for conversation, length in zip(conversations, lengths):
+            sender_ids = (conversation.package_request.user_id, conversation.travel_listing.user_id)
+            total = max(1, round(length * scale))
+            unread = rng.choice((0, 0, 0, 1, 2, 3))
+            messages.extend(
+                Message(
+                    conversation=conversation,
+                    sender_id=sender_ids[i % 2],
+                    content=rng.choice(('Hello, is there still space?', 'Yes, how many kg?', 'About 5kg.',
+                                        'Where can we meet?', 'Thanks!')),
+                    is_read=i < total - unread,
+                )
+                for i in range(total)
+            )
+    _bulk_create(Message, messages)
+
+    alerts = []
+    for _ in range(counts['alerts']):
+        pickup, destination = rng.choices(routes, cum_weights=route_weights)[0]
+        start = today + datetime.timedelta(days=rng.randint(0, 60))
+        alerts.append(Alert(
+            user=rng.choice(users),
+            pickup_location=pickup,
+            destination_location=destination,
+            from_travel_date=start,
+            to_travel_date=start + datetime.timedelta(days=rng.choice((7, 14, 30))) if rng.random() < 0.6 else None,
+            notify_me=rng.random() < 0.7,
+        ))
+    _bulk_create(Alert, alerts)
+
+    return {
+        'users': len(users),
+        'listings': len(listings),
+        'requests': len(requests),
+        'conversations': len(conversations),
+        'messages': len(messages),
+        'alerts': len(alerts),
+    }
+
+
+def scenarios():
+    """(name, user, url, query params) for every benchmarked request."""
+    users = User.objects.filter(username__startswith=PREFIX).exclude(username=ADMIN_USERNAME)
+    traveller = users.annotate(n=Count('travellisting')).order_by('-n', 'pk').first()
+    admin = User.objects.filter(username=ADMIN_USERNAME).first()
+    if traveller is None or admin is None:
+        raise LookupError('No benchmark data; run the seed_benchmark_data command first.')
+    member = users.order_by('-pk').first()
+    busiest = (
+        Conversation.objects.filter(participants=traveller)
+        .annotate(n=Count('messages')).order_by('-n', 'pk').first()
+    )
+    pickup, destination = CITIES[0], CITIES[1]
+
+    found = [
+        ('feed_search', member, reverse('travellisting-list'), {
+            'pickup_location_name': pickup[0],
+            'destination_location_country': destination[1],
+            'travel_date': timezone.localdate().isoformat(),
+        }),
+        ('my_listings', traveller, reverse('travellisting-my-listings'), {}),
+        ('conversation_inbox', traveller, reverse('conversation-list'), {}),
+    ]
+    if busiest is not None:
+        found.append(('messages', traveller, reverse('conversation-messages', args=[busiest.pk]), {}))
+    found += [
+        ('unread_count', traveller, reverse('conversation-unread-count'), {}),
+        ('dashboard_data', admin, reverse('admin-metrics-dashboard-data'), {}),
+    ]
+    return found
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _measure(client, url, params, iterations, warmup):
+    for _ in range(warmup):
+        client.get(url, params)
+
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+
+    # Allocation tracing slows everything down; measure it on a separate request.
+    tracemalloc.start()
+    try:
+        client.get(url, params)
+        allocated_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': max(queries),
+        'response_bytes': len(response.content),
+        'alloc_peak_kib': round(allocated_peak / 1024, 1),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(iterations=50, warmup=5, only=None):
+    """Benchmark every scenario (or those named in `only`); returns the JSON-ready report."""
+    results = {}
+    for name, user, url, params in scenarios():
+        if only and name not in only:
+            continue
+        client = APIClient()
+        client.force_authenticate(user)
+        results[name] = {'url': url, 'params': params, **_measure(client, url, params, iterations, warmup)}
+    return {
+        'revision': _git_revision(),
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'iterations': iterations,
+        'scenarios': results,
+    }
+
+
+COMPARED = ('p50_ms', 'p95_ms', 'queries', 'alloc_peak_kib')
+
+
+def compare(baseline, current):
+    """Rows of (scenario, metric, before, after, change %) for two run() reports."""
+    rows = []
+    for name, after in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        for metric in COMPARED:
+            old, new = before[metric], after[metric]
+            change = (new - old) / old * 100 if old else None
+            rows.append((name, metric, old, new, change))
+    return rows
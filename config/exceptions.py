@@ -12,20 +12,21 @@ def custom_exception_handler(exc, context):
     Custom exception handler to standardize error responses and prevent server crashes
     """
     try:
-        # Log the exception details for debugging
         request = context.get('request')
         user = getattr(request, 'user', 'Anonymous') if request else 'Unknown'
         path = getattr(request, 'path', 'Unknown') if request else 'Unknown'
         method = getattr(request, 'method', 'Unknown') if request else 'Unknown'
-        
-        logger.error(
-            f"Exception in {method} {path} for user {user}: {str(exc)}\n"
-            f"Traceback: {traceback.format_exc()}"
-        )
-        
+
         # Call REST framework's default exception handler first
         response = exception_handler(exc, context)
 
+        # Client errors (validation, auth, throttling) are routine: one line,
+        # no traceback. Anything else is a server error.
+        if response is not None and response.status_code < 500:
+            logger.info("%s %s for user %s -> %s: %s", method, path, user, response.status_code, exc)
+        else:
+            logger.error("Exception in %s %s for user %s: %s", method, path, user, exc, exc_info=exc)
+
         if response is not None:
             error_messages = []
             
@@ -44,10 +45,14 @@ def custom_exception_handler(exc, context):
             else:
                 error_messages.append(str(exc))
 
-            return standard_response(
+            standardized = standard_response(
                 status_code=response.status_code,
                 error=error_messages
             )
+            # Throttled responses tell the client when to retry
+            if 'Retry-After' in response:
+                standardized['Retry-After'] = response['Retry-After']
+            return standardized
 
         # Handle unexpected errors that DRF doesn't handle
         error_messages = ["An internal server error occurred. Please try again later."]
@@ -0,0 +1,64 @@
+"""
+Readiness checks for the load balancer / orchestrator.
+
+The release phase (`manage.py release`) migrates and builds static files
+once per deploy, so a booted worker only needs its backing services to be
+reachable before it takes traffic: the default database (a SELECT 1 on a
+fresh or health-checked connection) and the channel layer (a message sent
+to and received from a new channel, i.e. a Redis round trip in production,
+bounded by settings.HEALTH_CHECK_TIMEOUT). Failures are logged; the response
+only names the exception class.
+"""
+import asyncio
+import logging
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+async def _channel_layer_round_trip(timeout):
+    layer = get_channel_layer()
+    if layer is None:
+        raise RuntimeError('CHANNEL_LAYERS is not configured')
+    channel = await layer.new_channel()
+    await asyncio.wait_for(layer.send(channel, {'type': 'health.check'}), timeout)
+    message = await asyncio.wait_for(layer.receive(channel), timeout)
+    if message.get('type') != 'health.check':
+        raise RuntimeError(f'Unexpected message {message!r}')
+
+
+def check_channel_layer():
+    async_to_sync(_channel_layer_round_trip)(settings.HEALTH_CHECK_TIMEOUT)
+
+
+CHECKS = {
+    'database': check_database,
+    'channel_layer': check_channel_layer,
+}
+
+
+def readiness():
+    """Run every check; returns (all passed, {name: {'ok', 'ms'[, 'error']}})."""
+    results = {}
+    for name, check in CHECKS.items():
+        start = time.perf_counter()
+        try:
+            check()
+        except Exception as exc:
+            logger.warning('Readiness check %s failed: %s', name, exc)
+            results[name] = {'ok': False, 'error': exc.__class__.__name__}
+        else:
+            results[name] = {'ok': True}
+        results[name]['ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return all(result['ok'] for result in results.values()), results
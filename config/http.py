@@ -0,0 +1,215 @@
+"""
+Outbound HTTP for third-party providers (Didit, Apple, Google, Twilio, ...).
+
+Every provider gets one ServiceClient: a requests.Session with its own
+keep-alive pool, default connect/read timeouts, bounded retries (connection
+errors always; 429/502/503/504 and read errors only for idempotent methods),
+a consecutive-failure circuit breaker and latency accounting. Use
+`get_client(name)` so all callers of a provider share the same pool.
+
+Per-service overrides live in settings.HTTP_CLIENTS, e.g.
+    HTTP_CLIENTS = {'didit': {'timeout': (3.05, 15), 'retries': 1}}
+"""
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'timeout': (3.05, 10),
+    'retries': 2,
+    'backoff_factor': 0.3,
+    'pool_maxsize': 10,
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+}
+
+# Called as listener(service, method, status_code_or_None, elapsed_seconds)
+# after every request; used by request instrumentation.
+_listeners = []
+
+
+def add_listener(listener):
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without touching the network while a service's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; after `reset_timeout`
+    seconds one trial request is let through (half-open) and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, success):
+        with self._lock:
+            self._trial_running = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ServiceClient:
+    def __init__(self, name, timeout, retries, backoff_factor, pool_maxsize,
+                 failure_threshold, reset_timeout):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=retries,
+                status=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(429, 502, 503, 504),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.stats = {'requests': 0, 'errors': 0, 'rejected': 0, 'seconds': 0.0, 'max_seconds': 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _account(self, method, status_code, elapsed, failed):
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['errors'] += failed
+            self.stats['seconds'] += elapsed
+            self.stats['max_seconds'] = max(self.stats['max_seconds'], elapsed)
+        for listener in list(_listeners):
+            try:
+                listener(self.name, method, status_code, elapsed)
+            except Exception:
+                logger.debug("HTTP listener failed", exc_info=True)
+
+    def request(self, method, url, **kwargs):
+        if not self.breaker.allow():
+            with self._stats_lock:
+                self.stats['rejected'] += 1
+            raise CircuitOpenError(f'{self.name} circuit is open; not calling {url}')
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            # 4xx is the caller's problem, not the provider's health.
+            failed = response is None or response.status_code >= 500
+            self.breaker.record(not failed)
+            self._account(method, response.status_code if response is not None else None, elapsed, failed)
+            logger.debug("%s %s %s -> %s in %.1f ms", self.name, method, url,
+                         response.status_code if response is not None else 'error', elapsed * 1000)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name):
+    """The shared ServiceClient for provider `name`."""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                options = {**DEFAULTS, **getattr(settings, 'HTTP_CLIENTS', {}).get(name, {})}
+                client = _clients[name] = ServiceClient(name, **options)
+    return client
+
+
+def client_stats():
+    """{service: stats + circuit state} for every client created so far."""
+    return {
+        name: {**client.stats, 'circuit': client.breaker.state}
+        for name, client in list(_clients.items())
+    }
+
+
+_twilio = None
+
+
+def twilio_client():
+    """
+    Shared twilio.rest.Client whose HTTP goes through get_client('twilio')
+    instead of a new session per Client.
+    """
+    global _twilio
+    if _twilio is None:
+        from twilio.http import HttpClient
+        from twilio.http.response import Response as TwilioResponse
+        from twilio.rest import Client
+
+        class TwilioHttpClient(HttpClient):
+            def __init__(self):
+                super().__init__(logger=logger, is_async=False)
+
+            def request(self, method, uri, params=None, data=None, headers=None, auth=None,
+                        timeout=None, allow_redirects=False):
+                kwargs = {'timeout': timeout} if timeout else {}
+                response = get_client('twilio').request(
+                    method, uri, params=params, data=data, headers=headers, auth=auth,
+                    allow_redirects=allow_redirects, **kwargs,
+                )
+                return TwilioResponse(response.status_code, response.text, response.headers)
+
+        _twilio = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN,
+                         http_client=TwilioHttpClient())
+    return _twilio
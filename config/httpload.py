@@ -0,0 +1,228 @@
+"""
+HTTP throughput of the serving profile as the worker count grows.
+
+`scaling()` starts `manage.py serve` on a local port once per worker count,
+drives it with `concurrency` keep-alive HTTP/1.1 connections for `duration`
+seconds (after `warmup` seconds that are not counted) and stops it again. The
+request is a seeded benchmark scenario (see config.benchmark; authenticated
+with a JWT for its user) or a plain `path`. Each run reports requests per
+second, latency percentiles and non-2xx/connection errors, plus the speedup
+over the first run.
+
+The load generator is asyncio in `processes` separate processes on the same
+machine, so it competes with the workers for CPUs: keep worker counts at or
+below cpu_count() minus the generator's share, or the curve flattens early
+for reasons that have nothing to do with the server. Several workers need a
+shared cache (CACHE_URL; see config.serving), as in production.
+
+    python manage.py seed_benchmark_data
+    python manage.py bench_serving --workers 1 2 4 --output serving.json
+"""
+import asyncio
+import math
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from urllib.parse import urlencode
+
+HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length = None
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    if length is None:
+        raise ValueError('Response without Content-Length')
+    await reader.readexactly(length)
+    return status
+
+
+async def _connection(port, request, deadline, latencies, statuses):
+    writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(HOST, port)
+            start = time.perf_counter()
+            writer.write(request)
+            status = await _read_response(reader)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] += 1
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            statuses['connection_error'] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _load_process(port, request, connections, duration):
+    """Runs in a load-generator process; returns (latencies ms, status counts)."""
+    latencies, statuses = [], Counter()
+
+    async def load():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            _connection(port, request, deadline, latencies, statuses) for _ in range(connections)
+        ))
+
+    asyncio.run(load())
+    return latencies, dict(statuses)
+
+
+def generate_load(port, request, concurrency, duration, processes=1):
+    """(requests per second, latencies ms, status counts) for `duration` seconds of load."""
+    per_process = math.ceil(concurrency / processes)
+    # spawn: forking a process with a database connection and a log thread is unsafe.
+    with ProcessPoolExecutor(processes, mp_context=get_context('spawn')) as pool:
+        results = list(pool.map(
+            _load_process, [port] * processes, [request] * processes,
+            [per_process] * processes, [duration] * processes,
+        ))
+    latencies, statuses = [], Counter()
+    for process_latencies, process_statuses in results:
+        latencies += process_latencies
+        statuses.update(process_statuses)
+    return len(latencies) / duration, latencies, statuses
+
+
+def build_request(path, headers=None):
+    lines = [f'GET {path} HTTP/1.1', f'Host: {HOST}', 'Accept: application/json']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+class Server:
+    """`manage.py serve` in a subprocess, for the duration of a `with` block."""
+
+    def __init__(self, workers, port=DEFAULT_PORT, sync_threads=None, timeout=60):
+        self.workers = workers
+        self.port = port
+        self.sync_threads = sync_threads
+        self.timeout = timeout
+        self.process = None
+        self.log = None
+
+    def __enter__(self):
+        from django.conf import settings
+
+        env = dict(os.environ)
+        if self.sync_threads is not None:
+            env['SYNC_VIEW_THREADS'] = str(self.sync_threads)
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, 'manage.py', 'serve', '--host', HOST, '--port', str(self.port),
+             '--workers', str(self.workers), '--no-access-log'],
+            cwd=settings.BASE_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        try:
+            self._wait_until_live()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _wait_until_live(self):
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self.log.seek(0)
+                raise RuntimeError(f'Server exited:\n{self.log.read().decode()[-2000:]}')
+            try:
+                with urllib.request.urlopen(f'http://{HOST}:{self.port}/health/live', timeout=1):
+                    return
+            except (OSError, urllib.error.URLError):
+                time.sleep(0.2)
+        raise RuntimeError(f'Server not live after {self.timeout}s')
+
+    def __exit__(self, *exc_info):
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+
+def default_worker_counts():
+    from config.serving import cpu_count
+
+    cpus = cpu_count()
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    return counts + ([cpus] if counts[-1] != cpus else [])
+
+
+def target(scenario='feed_search', path=None):
+    """(label, raw HTTP request) for a seeded scenario or an unauthenticated path."""
+    if path:
+        return path, build_request(path)
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from config import benchmark
+
+    for name, user, url, params in benchmark.scenarios():
+        if name == scenario:
+            full = f'{url}?{urlencode(params)}' if params else url
+            return name, build_request(full, {'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+    raise LookupError(f'Unknown scenario {scenario!r}')
+
+
+def scaling(workers=None, scenario='feed_search', path=None, concurrency=64, duration=10.0, warmup=2.0,
+            processes=1, sync_threads=None, port=DEFAULT_PORT):
+    """Run the target against each worker count; returns the JSON-ready report."""
+    from django.conf import settings
+    from django.utils import timezone
+
+    from config.benchmark import _git_revision, percentile
+    from config.serving import cpu_count
+
+    label, request = target(scenario, path)
+    runs = []
+    for count in workers or default_worker_counts():
+        with Server(count, port, sync_threads):
+            if warmup:
+                generate_load(port, request, concurrency, warmup, processes)
+            rps, latencies, statuses = generate_load(port, request, concurrency, duration, processes)
+        ok = sum(n for status, n in statuses.items() if isinstance(status, int) and 200 <= status < 300)
+        runs.append({
+            'workers': count,
+            'requests': len(latencies),
+            'errors': sum(statuses.values()) - ok,
+            'statuses': {str(status): n for status, n in sorted(statuses.items(), key=str)},
+            'rps': round(rps, 1),
+            'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        })
+    for run in runs:
+        run['speedup'] = round(run['rps'] / runs[0]['rps'], 2) if runs[0]['rps'] else None
+    return {
+        'revision': _git_revision(),
+        'created_at': timezone.now().isoformat(),
+        'cpus': cpu_count(),
+        'target': label,
+        'concurrency': concurrency,
+        'duration_s': duration,
+        'load_processes': processes,
+        'sync_view_threads': settings.SYNC_VIEW_THREADS if sync_threads is None else sync_threads,
+        'runs': runs,
+    }
@@ -0,0 +1,74 @@
+"""
+Start-up import cost, measured with `python -X importtime`.
+
+`profile()` boots Django in a fresh interpreter (settings, apps, URLconf:
+what every uvicorn worker and management command pays) and parses the
+importtime report. `check()` compares the median total against
+settings.IMPORT_TIME_BUDGET_MS and lists LAZY_MODULES that were imported
+anyway: third-party SDKs that are only needed by a few requests and must
+stay behind their accessors (config.storage.cloudinary_sdk,
+config.http.twilio_client, users.firebase.firebase_auth,
+users.jwks.verify_google_id_token).
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+
+BOOT_STATEMENT = 'import django; django.setup(); import config.urls'
+LAZY_MODULES = ('firebase_admin', 'cloudinary', 'twilio', 'google.auth')
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class ImportProfile:
+    def __init__(self, modules):
+        # name -> (self µs, cumulative µs, nesting depth)
+        self.modules = modules
+
+    @property
+    def total_ms(self):
+        return sum(own for own, _, _ in self.modules.values()) / 1000
+
+    def imported(self, package):
+        return package in self.modules or any(name.startswith(package + '.') for name in self.modules)
+
+    def slowest(self, count=15, top_level=False):
+        """(name, cumulative ms) of the most expensive imports."""
+        rows = [
+            (name, cumulative / 1000)
+            for name, (_, cumulative, depth) in self.modules.items()
+            if not top_level or depth == 0
+        ]
+        return sorted(rows, key=lambda row: row[1], reverse=True)[:count]
+
+
+def profile(statement=BOOT_STATEMENT):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode:
+        raise RuntimeError(f'Boot failed:\n{result.stderr[-2000:]}')
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            modules[match[4]] = (int(match[1]), int(match[2]), len(match[3]) // 2)
+    return ImportProfile(modules)
+
+
+def check(budget_ms=None, runs=3, statement=BOOT_STATEMENT):
+    """
+    Profile `runs` cold boots; returns (median total ms, slowest profile,
+    LAZY_MODULES imported at boot, whether the budget holds).
+    """
+    budget_ms = settings.IMPORT_TIME_BUDGET_MS if budget_ms is None else budget_ms
+    profiles = sorted((profile(statement) for _ in range(runs)), key=lambda p: p.total_ms)
+    median_ms = statistics.median(p.total_ms for p in profiles)
+    eager = [package for package in LAZY_MODULES if profiles[-1].imported(package)]
+    return median_ms, profiles[-1], eager, median_ms <= budget_ms and not eager
@@ -0,0 +1,119 @@
+"""
+Logging plumbing: request-id correlation, JSON lines and a queue handler.
+
+RequestIdMiddleware (config.middleware) binds an id to each request, taken
+from a well-formed X-Request-ID header or generated, and returns it in the
+response header. RequestIdFilter puts it on every record as `request_id`, so
+all lines logged while handling a request, including lines from helper
+modules, can be grouped.
+
+QueueStreamHandler formats records in the calling thread and hands them to
+a background thread that does the write, so logging on a request path never
+blocks on stdout/stderr. When the queue is full, records are dropped and
+counted rather than stalling the request.
+
+Levels are set per module with LOG_LEVEL and LOG_LEVELS (see settings).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+
+_request_id = ContextVar('request_id', default=None)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def bind_request_id(value=None):
+    """Bind `value` (if well formed) or a fresh id; returns (id, token for reset_request_id)."""
+    if not value or not _VALID_REQUEST_ID.match(value):
+        value = uuid.uuid4().hex
+    return value, _request_id.set(value)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+def parse_levels(spec):
+    """'messaging=DEBUG,users.views=WARNING' -> {'messaging': 'DEBUG', 'users.views': 'WARNING'}."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get() or '-'
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are included as keys."""
+
+    converter = time.gmtime
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None) or _request_id.get(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class QueueStreamHandler(logging.handlers.QueueHandler):
+    """Writes formatted records to `stream` (stderr) from a background thread."""
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        target = logging.StreamHandler(stream or sys.stderr)
+        # prepare() has already formatted the record.
+        target.setFormatter(logging.Formatter('%(message)s'))
+        self.listener = logging.handlers.QueueListener(self.queue, target)
+        self.listener.start()
+        self._running = True
+        atexit.register(self.flush_and_stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush_and_stop(self):
+        """Write out queued records and stop the writer thread."""
+        if self._running:
+            self._running = False
+            self.listener.stop()
+
+    def close(self):
+        self.flush_and_stop()
+        super().close()
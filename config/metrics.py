@@ -0,0 +1,224 @@
+"""
+In-process request metrics in the Prometheus text format.
+
+RequestMetricsMiddleware (config.middleware) opens a RequestStats for each
+request; database queries, cache lookups (through the Instrumented* cache
+backends) and outbound provider calls (config.http listeners) are added to
+the stats of the request that made them. At the end of the request they are
+folded into the process-wide metrics below, which `/metrics` renders.
+
+Metrics are per process: with several workers, scrape each one or
+aggregate in Prometheus.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_stats', default=None)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts, total = self._values.get(labels, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[labels] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket'
+                       f'{_format_labels(self.labelnames, labels, [("le", bound)])} {cumulative}')
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}'
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request.', ('method', 'view', 'status'),
+)
+DB_QUERIES = Counter('http_db_queries_total', 'Database queries issued by requests.', ('view',))
+DB_SECONDS = Counter('http_db_seconds_total', 'Time requests spent in database queries.', ('view',))
+CACHE_REQUESTS = Counter('http_cache_requests_total', 'Cache lookups by requests.', ('view', 'result'))
+OUTBOUND_SECONDS = Counter(
+    'http_outbound_seconds_total', 'Time requests spent calling third-party services.', ('view',),
+)
+OUTBOUND_DURATION = Histogram(
+    'outbound_http_request_duration_seconds', 'Latency of third-party HTTP calls.',
+    ('service', 'method', 'status'),
+)
+
+REGISTRY = [REQUEST_DURATION, DB_QUERIES, DB_SECONDS, CACHE_REQUESTS, OUTBOUND_SECONDS, OUTBOUND_DURATION]
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    __slots__ = ('db_queries', 'db_seconds', 'cache_hits', 'cache_misses', 'cache_seconds',
+                 'outbound_calls', 'outbound_seconds')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_seconds = 0.0
+        self.outbound_calls = 0
+        self.outbound_seconds = 0.0
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() hook timing every query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.db_queries += 1
+
+    def server_timing(self, total):
+        """Value for the Server-Timing response header (durations in ms)."""
+        return ', '.join((
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"',
+            f'cache;dur={self.cache_seconds * 1000:.1f};desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'http;dur={self.outbound_seconds * 1000:.1f};desc="{self.outbound_calls} calls"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+    def record(self, method, view, status, total):
+        REQUEST_DURATION.observe((method, view, str(status)), total)
+        if self.db_queries:
+            DB_QUERIES.inc((view,), self.db_queries)
+            DB_SECONDS.inc((view,), self.db_seconds)
+        if self.cache_hits:
+            CACHE_REQUESTS.inc((view, 'hit'), self.cache_hits)
+        if self.cache_misses:
+            CACHE_REQUESTS.inc((view, 'miss'), self.cache_misses)
+        if self.outbound_calls:
+            OUTBOUND_SECONDS.inc((view,), self.outbound_seconds)
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_outbound(service, method, status, elapsed):
+    """config.http listener."""
+    OUTBOUND_DURATION.observe((service, method, str(status) if status is not None else 'error'), elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.outbound_calls += 1
+        stats.outbound_seconds += elapsed
+
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """Counts get/get_many hits and misses for the current request."""
+
+    def get(self, key, default=None, version=None):
+        stats = _current.get()
+        if stats is None:
+            return super().get(key, default, version)
+        start = time.perf_counter()
+        value = super().get(key, _MISSING, version)
+        stats.cache_seconds += time.perf_counter() - start
+        if value is _MISSING:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None):
+        stats = _current.get()
+        if stats is None:
+            return super().get_many(keys, version)
+        keys = list(keys)
+        start = time.perf_counter()
+        # The base get_many() may loop over get(); count the batch once.
+        token = _current.set(None)
+        try:
+            values = super().get_many(keys, version)
+        finally:
+            _current.reset(token)
+        stats.cache_seconds += time.perf_counter() - start
+        stats.cache_hits += len(values)
+        stats.cache_misses += len(keys) - len(values)
+        return values
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
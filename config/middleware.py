@@ -0,0 +1,88 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from config import http, log, metrics
+from config.nplusone import NPlusOneError, QueryPatternCollector, logger as nplusone_logger
+
+
+class RequestIdMiddleware:
+    """
+    Binds a request id for log correlation (config.log): the caller's
+    X-Request-ID when well formed, otherwise a new one. It is echoed in the
+    response header and available as request.request_id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.request_id, token = log.bind_request_id(request.headers.get(log.REQUEST_ID_HEADER))
+        try:
+            response = self.get_response(request)
+        finally:
+            log.reset_request_id(token)
+        response[log.REQUEST_ID_HEADER] = request.request_id
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-request latency, DB, cache and outbound HTTP accounting (see
+    config.metrics), reported in a Server-Timing header and at /metrics.
+    Removed from the stack entirely unless settings.METRICS_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        http.add_listener(metrics.record_outbound)
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        stats, token = metrics.start_request()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        total = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        stats.record(request.method, view, response.status_code, total)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = stats.server_timing(total)
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    Reports repeated query patterns per request (config.nplusone). With
+    NPLUSONE_MODE 'warn' they are logged, with 'raise' the request fails;
+    'off' (the default) removes the middleware from the stack.
+    """
+
+    def __init__(self, get_response):
+        self.mode = settings.NPLUSONE_MODE
+        if self.mode not in ('warn', 'raise'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryPatternCollector()
+        with collector.collect():
+            response = self.get_response(request)
+        findings = collector.findings()
+        if findings:
+            report = '\n'.join(str(finding) for finding in findings)
+            if self.mode == 'raise':
+                raise NPlusOneError(f'{request.method} {request.path}: repeated queries\n{report}')
+            nplusone_logger.warning("%s %s: repeated queries\n%s", request.method, request.path, report)
+        return response
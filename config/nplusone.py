@@ -0,0 +1,119 @@
+"""
+N+1 query detection.
+
+A QueryPatternCollector hooks every database connection (execute_wrapper)
+and groups the SQL run inside it by normalized template (literals and
+IN-lists collapsed) and by the project call stack that issued it. A template
+repeated `threshold` times or more from the same stack is almost always a
+per-row query inside a loop or a nested serializer.
+
+Use it
+- in tests: `with assert_no_n_plus_one(): ...` fails with the offending
+  queries and stacks;
+- on staging: NPlusOneMiddleware with NPLUSONE_MODE = 'warn' (log) or
+  'raise' (500, for CI smoke runs).
+
+Known, accepted patterns go in settings.NPLUSONE_ALLOWLIST: regexes matched
+against the SQL template and the formatted stack.
+"""
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 5
+MAX_STACK_DEPTH = 8
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_SKIP_PATHS = ('site-packages', 'dist-packages', '<frozen')
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """SQL with literals replaced by ? and IN (...) lists collapsed."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _IN_LIST_RE.sub('(...)', sql)
+
+
+def _project_stack():
+    base_dir = str(settings.BASE_DIR) + os.sep
+    stack = []
+    frame = sys._getframe(2)
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(base_dir) and filename != __file__
+                and not any(skip in filename for skip in _SKIP_PATHS)):
+            stack.append(f'{os.path.relpath(filename, base_dir)}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return tuple(stack)
+
+
+class Finding:
+    def __init__(self, template, stack, count):
+        self.template = template
+        self.stack = stack
+        self.count = count
+
+    def __str__(self):
+        location = '\n    '.join(self.stack) or '(no project frames)'
+        return f'{self.count}x {self.template}\n    {location}'
+
+
+class QueryPatternCollector:
+    def __init__(self, threshold=None, allowlist=None):
+        self.threshold = threshold or getattr(settings, 'NPLUSONE_THRESHOLD', DEFAULT_THRESHOLD)
+        patterns = getattr(settings, 'NPLUSONE_ALLOWLIST', ()) if allowlist is None else allowlist
+        self.allowlist = [re.compile(pattern) for pattern in patterns]
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.counts[(normalize_sql(sql), _project_stack())] += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def collect(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def _allowed(self, template, stack):
+        text = template + '\n' + '\n'.join(stack)
+        return any(pattern.search(text) for pattern in self.allowlist)
+
+    def findings(self):
+        return [
+            Finding(template, stack, count)
+            for (template, stack), count in self.counts.most_common()
+            if count >= self.threshold and not self._allowed(template, stack)
+        ]
+
+    def report(self):
+        return '\n'.join(str(finding) for finding in self.findings())
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold=None, allowlist=None):
+    """Fail with NPlusOneError if the block repeats a query pattern."""
+    collector = QueryPatternCollector(threshold, allowlist)
+    with collector.collect():
+        yield collector
+    findings = collector.findings()
+    if findings:
+        raise NPlusOneError(
+            f'Repeated queries (threshold {collector.threshold}):\n'
+            + '\n'.join(str(finding) for finding in findings)
+        )
@@ -0,0 +1,28 @@
+"""
+JSON parser backed by orjson (stdlib fallback); see config.renderers.
+"""
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from config.renderers import orjson
+
+# orjson turns integers beyond 64 bits into floats; leave those bodies to the stdlib.
+_LONG_DIGITS = re.compile(rb'\d{19,}')
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        raw = stream.read()
+        if not _LONG_DIGITS.search(raw):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass
+        # Stdlib path: big integers, and ParseError worded as before on bad input.
+        return super().parse(io.BytesIO(raw), media_type, parser_context)
@@ -0,0 +1,84 @@
+"""
+Sliding-window rate limits kept in the Django cache.
+
+Each limit allows `limit` events per `window` seconds per key. The window is
+approximated from two fixed buckets (the previous bucket's count weighted by
+how much of it still overlaps the window, plus the current bucket), so every
+check is one `get_many` and every hit one `incr`, whatever the traffic.
+Counters expire on their own; nothing touches the database.
+"""
+import math
+import time
+
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+
+class SlidingWindowLimit:
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _buckets(self, key, now):
+        bucket = int(now // self.window)
+        return (
+            f'ratelimit:{self.scope}:{key}:{bucket}',
+            f'ratelimit:{self.scope}:{key}:{bucket - 1}',
+            now - bucket * self.window,
+        )
+
+    def usage(self, key, now=None):
+        """Weighted number of events for `key` in the last `window` seconds."""
+        current, previous, elapsed = self._buckets(key, now or time.time())
+        counts = cache.get_many([current, previous])
+        overlap = 1 - elapsed / self.window
+        return counts.get(previous, 0) * overlap + counts.get(current, 0)
+
+    def retry_after(self, key, now=None):
+        """Seconds until `key` is back under the limit (0 if it already is)."""
+        now = now or time.time()
+        current, previous, elapsed = self._buckets(key, now)
+        counts = cache.get_many([current, previous])
+        in_current, in_previous = counts.get(current, 0), counts.get(previous, 0)
+        if in_previous * (1 - elapsed / self.window) + in_current < self.limit:
+            return 0
+        if in_previous and in_current < self.limit:
+            # Wait for enough of the previous bucket to slide out of the window.
+            overlap_needed = (self.limit - in_current) / in_previous
+            return max(math.ceil((1 - overlap_needed) * self.window - elapsed), 1)
+        # The current bucket alone is full: wait until it becomes the previous one
+        # and has slid out far enough.
+        return max(math.ceil(self.window - elapsed), 1)
+
+    def exceeded(self, key):
+        return self.usage(key) >= self.limit
+
+    def hit(self, key):
+        current, _, _ = self._buckets(key, time.time())
+        # Buckets are read for two windows: as current, then as previous.
+        if not cache.add(current, 1, self.window * 2):
+            try:
+                cache.incr(current)
+            except ValueError:
+                # Expired between add() and incr().
+                cache.set(current, 1, self.window * 2)
+
+    def check(self, key):
+        """Raise Throttled if `key` is over the limit."""
+        if self.exceeded(key):
+            raise Throttled(wait=self.retry_after(key))
+
+    def consume(self, key):
+        """check() and, if allowed, count one event."""
+        self.check(key)
+        self.hit(key)
+
+
+def client_ip(request):
+    """
+    The client address, as DRF throttles see it (honours
+    REST_FRAMEWORK['NUM_PROXIES'] for X-Forwarded-For).
+    """
+    return BaseThrottle().get_ident(request)
@@ -0,0 +1,42 @@
+"""
+JSON renderer backed by orjson, with the stdlib encoder as fallback.
+
+FastJSONRenderer is a drop-in for rest_framework.renderers.JSONRenderer: same
+media type and format (content negotiation is unchanged), same compact UTF-8
+output and the same encoding of non-JSON types. Floats are the exception:
+they decode to the same values, but exponents are written without padding or
+'+' (1e-7, 1e16 where the stdlib writes 1e-07, 1e+16), and NaN/Infinity
+become null where DRF's strict encoder raises ValueError. Everything orjson cannot
+encode natively goes through DRF's encoder (`default=`); datetimes are routed
+there too so they keep DRF's millisecond/"Z" format. Requests for indented
+output, and payloads orjson rejects (e.g. integers beyond 64 bits), are
+rendered by the stdlib path. Without orjson installed it *is* the stdlib
+renderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+_drf_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_drf_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safety escaping as JSONRenderer.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
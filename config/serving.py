@@ -0,0 +1,164 @@
+"""
+Serving profile: uvicorn worker count and the thread pool for sync views.
+
+`manage.py serve` starts one uvicorn worker process per usable CPU (the
+affinity mask capped by a cgroup CPU quota) unless WEB_CONCURRENCY says
+otherwise. Each worker is one event loop, so more processes are what lets
+Python code use more cores. Rate limits and other cached state must then be
+shared, so several workers require a shared (Redis) cache; on the per-process
+LocMem cache the default is one worker and more are refused.
+
+Django's ASGI handler runs the sync parts of every HTTP request (middleware,
+DRF views, the ORM) in a thread of its own: it opens a ThreadSensitiveContext
+per request and asgiref gives each context a new single-thread executor. Two
+consequences: the number of threads, and with them database connections,
+grows with the number of requests in flight, and a persistent connection
+(CONN_MAX_AGE) is never reused because the thread that owns it ends with its
+request. SyncThreadPool keeps SYNC_VIEW_THREADS long-lived threads per worker
+and leases one to each request for its whole duration, so sync code keeps
+its thread-sensitive guarantee, a worker holds at most that many
+connections, and they are reused across requests (CONN_HEALTH_CHECKS drops
+the ones the server closed). Requests beyond the pool size wait for a thread
+on the event loop. SYNC_VIEW_THREADS = 0 restores Django's behaviour.
+
+A request holds its thread until the response is complete, including while
+a streaming export is sent to a slow client; the export's server-side cursor
+lives on that thread's connection, so the thread cannot be released earlier.
+Such routes, and the health checks that must answer while views are busy,
+get their own small lanes (SYNC_VIEW_LANES: path prefix -> threads), so they
+neither starve nor are starved by ordinary requests.
+"""
+import asyncio
+import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import asgiref
+from asgiref.sync import SyncToAsync, ThreadSensitiveContext
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# SyncThreadPool relies on how asgiref maps a ThreadSensitiveContext to its
+# executor (SyncToAsync.context_to_thread_executor) and on the context calling
+# shutdown() on exit. Versions outside [low, high) fall back to Django's
+# thread-per-request behaviour until they have been checked.
+TESTED_ASGIREF = ((3, 8), (3, 9))
+
+
+def cpu_count():
+    """CPUs this process may use: the affinity mask, capped by a cgroup v2 CPU quota."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as fh:
+            quota, period = fh.read().split()
+        if quota != 'max':
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def shared_cache():
+    """Whether the default cache is shared between processes (not LocMem)."""
+    return not settings.CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+
+def worker_count():
+    """WEB_CONCURRENCY, else one per usable CPU; one when the cache is per process."""
+    if settings.WEB_CONCURRENCY:
+        return settings.WEB_CONCURRENCY
+    return cpu_count() if shared_cache() else 1
+
+
+class _PooledThread(ThreadPoolExecutor):
+    def __init__(self, name):
+        super().__init__(max_workers=1, thread_name_prefix=name)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        # Called by ThreadSensitiveContext when the request ends; the thread
+        # goes back to the pool instead.
+        pass
+
+    def close(self):
+        super().shutdown(wait=False)
+
+
+class _Lane:
+    def __init__(self, name, size):
+        self.threads = [_PooledThread(f'{name}-{i}') for i in range(size)]
+        # LIFO: the most recently used threads (and their connections) stay warm.
+        self.idle = asyncio.LifoQueue()
+        for thread in self.threads:
+            self.idle.put_nowait(thread)
+
+    def close(self):
+        for thread in self.threads:
+            thread.close()
+
+
+class SyncThreadPool:
+    """
+    ASGI wrapper leasing a long-lived thread to each HTTP request: from the
+    lane whose path prefix matches (`lanes`: {prefix: size}), else from the
+    `size` default threads.
+    """
+
+    def __init__(self, app, size, lanes=None):
+        self.app = app
+        self.default = _Lane('sync-view', size)
+        # Longest prefix first, so the most specific lane wins.
+        self.lanes = [
+            (prefix, _Lane(f'sync-{prefix.strip("/").replace("/", "-") or "root"}', lane_size))
+            for prefix, lane_size in sorted((lanes or {}).items(), key=lambda item: -len(item[0]))
+        ]
+
+    def lane(self, path):
+        for prefix, lane in self.lanes:
+            if path.startswith(prefix):
+                return lane
+        return self.default
+
+    def close(self):
+        for lane in [self.default, *(lane for _, lane in self.lanes)]:
+            lane.close()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or SyncToAsync.thread_sensitive_context.get(None) is not None:
+            return await self.app(scope, receive, send)
+        lane = self.lane(scope.get('path', ''))
+        thread = await lane.idle.get()
+        try:
+            # Django's own ThreadSensitiveContext nests inside this one and
+            # does nothing, so the request's sync code runs on `thread`.
+            async with ThreadSensitiveContext() as context:
+                SyncToAsync.context_to_thread_executor[context] = thread
+                return await self.app(scope, receive, send)
+        finally:
+            lane.idle.put_nowait(thread)
+
+
+def asgiref_supported():
+    """Whether the installed asgiref is a version SyncThreadPool was tested with."""
+    try:
+        version = tuple(int(part) for part in asgiref.__version__.split('.')[:2])
+    except ValueError:
+        return False
+    return (TESTED_ASGIREF[0] <= version < TESTED_ASGIREF[1]
+            and hasattr(SyncToAsync, 'context_to_thread_executor')
+            and hasattr(SyncToAsync, 'thread_sensitive_context'))
+
+
+def with_sync_thread_pool(app, size=None, lanes=None):
+    size = settings.SYNC_VIEW_THREADS if size is None else size
+    if size <= 0:
+        return app
+    if not asgiref_supported():
+        logger.warning('asgiref %s is outside the tested range %s; sync views use a thread per request',
+                       asgiref.__version__, TESTED_ASGIREF)
+        return app
+    return SyncThreadPool(app, size, settings.SYNC_VIEW_LANES if lanes is None else lanes)
@@ -16,9 +16,8 @@ from datetime import timedelta
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 import dj_database_url
-import firebase_admin
-from firebase_admin import credentials
-from rest_framework.permissions import AllowAny
+
+from config.log import parse_levels as parse_log_levels
 
 
 
@@ -68,6 +67,9 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    'config.middleware.RequestIdMiddleware',
+    'config.middleware.RequestMetricsMiddleware',
+    'config.middleware.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -79,6 +81,40 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware'
 ]
 
+# Request metrics (config.metrics): Server-Timing headers and /metrics for
+# Prometheus. When disabled the middleware removes itself from the stack.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# N+1 query detection (config.nplusone): 'off', 'warn' (log) or 'raise'.
+# A query template repeated NPLUSONE_THRESHOLD times from the same call stack
+# within one request is reported unless it matches an allowlist regex.
+NPLUSONE_MODE = os.getenv('NPLUSONE_MODE', 'off')
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+NPLUSONE_ALLOWLIST = []
+
+# Instrumented backends count hits/misses per request when metrics are enabled.
+# The cache holds rate-limit windows, upload dedup records and sign-in key
+# sets, so production shares one Redis cache across all worker processes
+# (same server as CHANNEL_LAYERS unless CACHE_URL says otherwise). An empty
+# CACHE_URL selects a per-process LocMem cache; `serve` then refuses to start
+# more than one worker.
+CACHE_URL = os.getenv('CACHE_URL', '' if DEBUG else os.getenv('REDIS_URL', ''))
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'config.metrics.InstrumentedRedisCache',
+            'LOCATION': CACHE_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'config.metrics.InstrumentedLocMemCache',
+        },
+    }
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -127,10 +163,22 @@ else:
     DATABASES = {
         'default': dj_database_url.config(
             default=os.getenv('DATABASE_URL'),
-            conn_max_age=600
+            conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', 600)),
         )
     }
 
+# Persistent connections are owned by the sync-view threads (config.serving,
+# SYNC_VIEW_THREADS); health checks replace the ones the server has closed.
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if 'postgresql' in DATABASES['default'].get('ENGINE', ''):
+    DATABASES['default'].setdefault('OPTIONS', {})['connect_timeout'] = int(os.getenv('DB_CONNECT_TIMEOUT', 5))
+
+# Behind PgBouncer in transaction pooling mode a named cursor can outlive the
+# server connection it was opened on. Keep the database TimeZone at UTC there:
+# per-session SET TIME ZONE does not survive transaction pooling either.
+if os.getenv('DB_PGBOUNCER', 'False') == 'True':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -190,6 +238,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed when installed; same media types as DRF's JSON classes
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'config.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'PAGE_SIZE_QUERY_PARAM': 'page_size',
@@ -201,28 +259,46 @@ REST_FRAMEWORK = {
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 os.makedirs(LOGS_DIR, exist_ok=True)
 
+# Structured logging (config.log): JSON lines in production, readable text
+# with DEBUG, every record tagged with the request id. Console output is
+# written by a background thread. LOG_LEVEL sets the level of the project
+# apps; LOG_LEVELS overrides single modules, e.g.
+# LOG_LEVELS="messaging.consumers=DEBUG,users.views=WARNING".
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text' if DEBUG else 'json')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'config.log.RequestIdFilter',
+        },
+    },
     'formatters': {
         'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
+            'format': '{levelname} {asctime} {name} [{request_id}] {message}',
             'style': '{',
         },
         'simple': {
-            'format': '{levelname} {message}',
+            'format': '{levelname} [{request_id}] {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'config.log.JSONFormatter',
+        },
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose' if DEBUG else 'simple',
+            'class': 'config.log.QueueStreamHandler',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
+            'filters': ['request_id'],
         },
         'file': {
             'class': 'logging.FileHandler',
             'filename': os.path.join(LOGS_DIR, 'django.log'),
             'formatter': 'verbose',
+            'filters': ['request_id'],
         },
     },
     'root': {
@@ -240,13 +316,18 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': False,
         },
-        'users': {
-            'handlers': ['console'],
-            'level': 'DEBUG' if DEBUG else 'INFO',
-            'propagate': False,
+        **{
+            app: {
+                'handlers': ['console'],
+                'level': LOG_LEVEL,
+                'propagate': False,
+            }
+            for app in ('config', 'users', 'listings', 'messaging', 'reporting')
         },
     },
 }
+for _logger, _level in parse_log_levels(os.getenv('LOG_LEVELS', '')).items():
+    LOGGING['loggers'].setdefault(_logger, {})['level'] = _level
 
 CORS_ALLOW_ALL_ORIGINS = DEBUG
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if not DEBUG else []
@@ -262,6 +343,26 @@ EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 20))
+
+# Email outbox (users.mail). With SEND_ON_COMMIT the web process drains the
+# queue on a background thread; `send_queued_email --loop` can run as a worker.
+EMAIL_OUTBOX_SEND_ON_COMMIT = os.getenv('EMAIL_OUTBOX_SEND_ON_COMMIT', 'True') == 'True'
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))
+# Days sent/failed rows (bodies already blanked) are kept before purging.
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv('EMAIL_OUTBOX_RETENTION_DAYS', 7))
+
+# One-time codes (users.otp): lifetime in seconds, and sliding-window limits
+# as (events, window seconds). issue_* count codes sent, verify_* wrong codes.
+OTP_TTL = int(os.getenv('OTP_TTL', 600))
+OTP_RATE_LIMITS = {
+    'issue_user': (3, 600),
+    'issue_ip': (20, 3600),
+    'verify_user': (5, 600),
+    'verify_ip': (30, 3600),
+}
 
 # Twilio settings
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
@@ -310,14 +411,56 @@ APPLE_PUBLIC_KEY_URL = 'https://appleid.apple.com/auth/keys'
 CLOUDINARY_CLOUD_NAME = os.getenv('CLOUDINARY_CLOUD_NAME')
 CLOUDINARY_API_KEY = os.getenv('CLOUDINARY_API_KEY')
 CLOUDINARY_API_SECRET = os.getenv('CLOUDINARY_API_SECRET')
+# Where uploaded images go: config.storage.CloudinaryStorage, or
+# config.storage.FileSystemStorage (MEDIA_ROOT) for tests/local development
+IMAGE_STORAGE_BACKEND = os.getenv('IMAGE_STORAGE_BACKEND', 'config.storage.CloudinaryStorage')
 
 # Didit.me API settings
 DIDIT_API_KEY = os.getenv('DIDIT_API_KEY', '')
 DIDIT_VERIFICATION_URL = os.getenv('DIDIT_VERIFICATION_URL', 'https://verification.didit.me/v2/id-verification/')
 DIDIT_PHONE_SEND_URL = 'https://verification.didit.me/v2/phone/send/'
 DIDIT_PHONE_CHECK_URL = 'https://verification.didit.me/v2/phone/check/'
+DIDIT_SESSION_DECISION_URL = 'https://verification.didit.me/v2/session/{session_id}/decision/'
+DIDIT_WEBHOOK_SECRET = os.getenv('DIDIT_WEBHOOK_SECRET', '')
+# Seconds a stored session status is trusted before check_verification_status
+# asks Didit again (in the background)
+DIDIT_STATUS_MAX_AGE = int(os.getenv('DIDIT_STATUS_MAX_AGE', 60))
+
+# Per-provider overrides for config.http.ServiceClient (timeout, retries,
+# pool_maxsize, failure_threshold, reset_timeout, ...)
+HTTP_CLIENTS = {}
+
+# Budget for the imports of a cold Django boot (settings, apps, URLconf),
+# enforced by `manage.py check_import_time` (config.importtime).
+IMPORT_TIME_BUDGET_MS = int(os.getenv('IMPORT_TIME_BUDGET_MS', 900))
+
+# Seconds the /health/ready channel-layer round trip may take (config.health).
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', 2))
+
+# Serving profile (config.serving, `manage.py serve`): uvicorn worker
+# processes (0: one per usable CPU) and long-lived threads per worker for
+# sync views, which bounds that worker's database connections (0: a new
+# thread per request, Django's default).
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 0))
+SYNC_VIEW_THREADS = int(os.getenv('SYNC_VIEW_THREADS', 8))
+# Separate threads for routes that must not wait behind views (health checks)
+# or that hold a thread for a whole streamed response (reporting exports).
+SYNC_VIEW_LANES = {
+    '/health/': 1,
+    '/metrics': 1,
+    '/api/admin/metrics/export/': int(os.getenv('SYNC_EXPORT_THREADS', 2)),
+}
+
+# Reporting: raw EventLog rows older than this are rolled up by `compact_eventlog`
+EVENTLOG_RETENTION_DAYS = int(os.getenv('EVENTLOG_RETENTION_DAYS', 90))
+# DAU/WAU/MAU sketches (reporting.sketches) are buffered per process and merged
+# on a background thread after commit; False leaves them buffered until
+# flush_activity() is called.
+ACTIVITY_SKETCH_FLUSH_ON_COMMIT = os.getenv('ACTIVITY_SKETCH_FLUSH_ON_COMMIT', 'True') == 'True'
 
 # Configure WhiteNoise
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
-# FIREBASE_CREDENTIAL = credentials.Certificate(os.path.join(BASE_DIR, 'adrash-firebase.json'))
+# Firebase phone verification (users.firebase): service-account JSON, loaded on
+# first use. FIREBASE_CREDENTIAL (a firebase_admin credential object) wins if set.
+FIREBASE_CREDENTIAL_FILE = os.getenv('FIREBASE_CREDENTIAL_FILE', '')
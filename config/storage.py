@@ -0,0 +1,287 @@
+"""
+Image storage backends and upload helpers.
+
+`get_storage()` returns the backend named by settings.IMAGE_STORAGE_BACKEND:
+CloudinaryStorage in production, FileSystemStorage (MEDIA_ROOT) for tests and
+local development. Images are downscaled and re-encoded locally before upload
+(`prepare_image`). `upload_images` uploads a batch concurrently with per-file
+results and skips content that is already stored.
+
+Two kinds of public_id are used. Named slots such as a user's profile picture
+are overwritten in place; re-uploading the bytes a slot already holds is a
+no-op. Files uploaded without a public_id are content-addressed: they are
+stored once under uploads/<sha256>, and every later upload of the same bytes
+reuses that URL, whoever sends it. Immutable files (message attachments) use
+the second kind, so the same file sent in many messages is stored once.
+"""
+import hashlib
+import io
+import logging
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage as DjangoFileSystemStorage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Longest side of uploaded images; larger ones are scaled down.
+MAX_IMAGE_DIMENSION = 2048
+JPEG_QUALITY = 85
+# Files smaller than this are uploaded as-is unless they exceed the dimension limit.
+REENCODE_MIN_BYTES = 512 * 1024
+UPLOAD_WORKERS = 4
+
+
+class ImageStorage(ABC):
+    @abstractmethod
+    def upload(self, file, public_id=None):
+        """Store `file` under `public_id` (overwriting) and return its URL."""
+
+    @abstractmethod
+    def delete(self, public_id):
+        """Remove whatever is stored under `public_id`."""
+
+
+_cloudinary = None
+
+
+def cloudinary_sdk():
+    """
+    The cloudinary package (with .uploader and .utils loaded), configured
+    from settings on first use rather than when this module is imported.
+    """
+    global _cloudinary
+    if _cloudinary is None:
+        import cloudinary
+        import cloudinary.uploader
+        import cloudinary.utils
+
+        cloudinary.config(
+            cloud_name=settings.CLOUDINARY_CLOUD_NAME,
+            api_key=settings.CLOUDINARY_API_KEY,
+            api_secret=settings.CLOUDINARY_API_SECRET,
+            secure=True,
+        )
+        _cloudinary = cloudinary
+    return _cloudinary
+
+
+class CloudinaryStorage(ImageStorage):
+    def upload(self, file, public_id=None):
+        return cloudinary_sdk().uploader.upload(file, public_id=public_id)['secure_url']
+
+    def delete(self, public_id):
+        return cloudinary_sdk().uploader.destroy(public_id)
+
+
+class FileSystemStorage(ImageStorage):
+    """Stores images under MEDIA_ROOT, keyed by public_id."""
+
+    def __init__(self, location=None, base_url=None):
+        self.storage = DjangoFileSystemStorage(location=location, base_url=base_url)
+
+    def _name(self, file, public_id):
+        if public_id is None:
+            return os.path.basename(getattr(file, 'name', None) or 'upload')
+        extension = os.path.splitext(getattr(file, 'name', '') or '')[1]
+        if os.path.splitext(public_id)[1] == extension:
+            return public_id
+        return f'{public_id}{extension}'
+
+    def upload(self, file, public_id=None):
+        name = self._name(file, public_id)
+        if self.storage.exists(name):
+            self.storage.delete(name)
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        content = file if hasattr(file, 'chunks') else ContentFile(file.read())
+        return self.storage.url(self.storage.save(name, content))
+
+    def delete(self, public_id):
+        directory, prefix = os.path.split(public_id)
+        try:
+            _, files = self.storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            if os.path.splitext(name)[0] == prefix:
+                self.storage.delete(os.path.join(directory, name))
+
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        backend = getattr(settings, 'IMAGE_STORAGE_BACKEND', 'config.storage.CloudinaryStorage')
+        _storage = import_string(backend)()
+    return _storage
+
+
+@receiver(setting_changed)
+def _reset_storage(setting, **kwargs):
+    global _storage
+    if setting in ('IMAGE_STORAGE_BACKEND', 'MEDIA_ROOT', 'MEDIA_URL'):
+        _storage = None
+
+
+def prepare_image(file, max_dimension=MAX_IMAGE_DIMENSION, quality=JPEG_QUALITY):
+    """
+    Downscale an image whose longest side exceeds `max_dimension` and
+    re-encode large ones (JPEG, or PNG when there is transparency), applying
+    the EXIF orientation. Returns a file-like object named like `file`; files
+    that are small enough or are not images come back unchanged.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    size = getattr(file, 'size', None)
+    try:
+        file.seek(0)
+        image = Image.open(file)
+        width, height = image.size
+    except (UnidentifiedImageError, OSError, AttributeError):
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        return file
+
+    if getattr(image, 'is_animated', False) or (
+            max(width, height) <= max_dimension and (size is None or size < REENCODE_MIN_BYTES)):
+        file.seek(0)
+        return file
+
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    output = io.BytesIO()
+    base_name = os.path.splitext(os.path.basename(getattr(file, 'name', None) or 'image'))[0]
+    if has_alpha:
+        image.save(output, format='PNG', optimize=True)
+        name = f'{base_name}.png'
+    else:
+        image.convert('RGB').save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+        name = f'{base_name}.jpg'
+
+    if size is not None and output.tell() >= size and max(width, height) <= max_dimension:
+        # Re-encoding did not help; keep the original bytes.
+        file.seek(0)
+        return file
+    logger.debug("Re-encoded %s %dx%d (%s bytes) -> %dx%d (%d bytes)",
+                 name, width, height, size, image.width, image.height, output.tell())
+    output.seek(0)
+    return ContentFile(output.getvalue(), name=name)
+
+
+# Shared by all requests so concurrent uploads stay bounded process-wide.
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='image-upload')
+
+HASH_CHUNK_SIZE = 64 * 1024
+# How long an upload record (slot or content hash -> url) is trusted for dedup.
+UPLOAD_RECORD_TIMEOUT = 30 * 24 * 3600
+
+
+class UploadResult:
+    """Outcome of one file in a batch upload."""
+
+    def __init__(self, public_id, url=None, error=None, deduplicated=False):
+        self.public_id = public_id
+        self.url = url
+        self.error = error
+        self.deduplicated = deduplicated
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        outcome = f'error={self.error!r}' if self.error else f'url={self.url!r}'
+        return f'<UploadResult {self.public_id} {outcome}{" (deduplicated)" if self.deduplicated else ""}>'
+
+
+def content_hash(file):
+    """SHA-256 of a file-like object, read in chunks; leaves it rewound."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    if hasattr(file, 'chunks'):
+        for chunk in file.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _record_key(public_id):
+    return f'image-upload:{public_id}'
+
+
+def forget_upload(public_id):
+    cache.delete(_record_key(public_id))
+
+
+def _upload_one(file, public_id):
+    """
+    Upload unless the content is already stored: under `public_id` for a
+    named slot, or anywhere for content-addressed files (no public_id), whose
+    record is keyed by the content hash.
+    """
+    digest = content_hash(file)
+    if public_id is None:
+        public_id = f'uploads/{digest}'
+    record = cache.get(_record_key(public_id))
+    if record and record['hash'] == digest:
+        return UploadResult(public_id, record['url'], deduplicated=True)
+    url = get_storage().upload(prepare_image(file), public_id)
+    cache.set(_record_key(public_id), {'hash': digest, 'url': url}, UPLOAD_RECORD_TIMEOUT)
+    return UploadResult(public_id, url)
+
+
+def _safe_upload(file, public_id):
+    try:
+        if isinstance(file, (str, os.PathLike)):
+            if not os.path.exists(file):
+                # Remote URL: let the backend fetch it.
+                return UploadResult(public_id, get_storage().upload(file, public_id))
+            with open(file, 'rb') as handle:
+                return _upload_one(File(handle, name=os.path.basename(file)), public_id)
+        if isinstance(file, (bytes, bytearray)):
+            file = ContentFile(bytes(file), name=os.path.basename(public_id or 'upload'))
+        return _upload_one(file, public_id)
+    except Exception as e:
+        logger.warning("Upload of %s failed: %s", public_id or getattr(file, 'name', file), e)
+        return UploadResult(public_id, error=e)
+
+
+def upload_images(files, public_ids=None):
+    """
+    Upload `files` (file objects, bytes or paths) concurrently on the shared
+    upload pool and return one UploadResult per file, in order. Failures are
+    reported per file rather than raised. Files without a public_id are
+    stored content-addressed, and content that is already stored (in the same
+    slot, or anywhere for content-addressed files) is not uploaded again; the
+    result carries the stored URL and `deduplicated`.
+    """
+    if public_ids is None:
+        public_ids = [None] * len(files)
+    jobs = list(zip(files, public_ids))
+    if len(jobs) <= 1:
+        return [_safe_upload(file, public_id) for file, public_id in jobs]
+    futures = [_executor.submit(_safe_upload, file, public_id) for file, public_id in jobs]
+    return [future.result() for future in futures]
+
+
+def upload_all(files, public_ids=None):
+    """upload_images for callers that need every file: URLs, or the first error."""
+    results = upload_images(files, public_ids)
+    for result in results:
+        if not result.ok:
+            raise result.error
+    return [result.url for result in results]
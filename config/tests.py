@@ -0,0 +1,454 @@
+import asyncio
+import io
+import json
+import re
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from users.models import CustomUser, IdType
+
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+
+
+class FastJSONTests(SimpleTestCase):
+    def test_output_matches_stock_renderer(self):
+        from datetime import date, datetime as dt, timedelta
+        from decimal import Decimal
+        from uuid import UUID
+
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+
+        data = {
+            'price': Decimal('12.50'),
+            'at': dt(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.get_fixed_timezone(0)),
+            'day': date(2025, 1, 2),
+            'elapsed': timedelta(seconds=90),
+            'id': UUID('12345678-1234-5678-1234-567812345678'),
+            'label': gettext_lazy('Email Verification'),
+            'text': 'caf\u00e9 \u2028',
+            'big': 2 ** 70,
+            1: [None, True, 1.5],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_float_differences_from_stock_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+
+        data = {'small': 1e-07, 'large': 1e16, 'plain': 0.1}
+        fast, stock = FastJSONRenderer().render(data), JSONRenderer().render(data)
+        self.assertEqual(fast, b'{"small":1e-7,"large":1e16,"plain":0.1}')
+        self.assertEqual(stock, b'{"small":1e-07,"large":1e+16,"plain":0.1}')
+        self.assertEqual(json.loads(fast), json.loads(stock))
+
+        # Non-finite floats: null here, an error from DRF's strict encoder.
+        for value in (float('nan'), float('inf'), float('-inf')):
+            self.assertEqual(FastJSONRenderer().render({'x': value}), b'{"x":null}')
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'x': value})
+
+    def test_parser(self):
+        self.assertEqual(FastJSONParser().parse(io.BytesIO('{"a": [1, "\u00e9"]}'.encode())), {'a': [1, '\u00e9']})
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(b'{"n": 123456789012345678901234}')),
+                         {'n': 123456789012345678901234})
+        from rest_framework.exceptions import ParseError
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"a": '))
+
+
+class EnvelopeTests(TestCase):
+    """The in-place envelope renders exactly like the old rebuilt Response."""
+
+    def setUp(self):
+        from rest_framework.test import APIRequestFactory
+
+        from config.utils import standard_response
+        from users.views import IdTypeViewSet
+
+        class RebuildingIdTypeViewSet(IdTypeViewSet):
+            def _standardize_response(self, response):
+                if hasattr(response, 'data'):
+                    return standard_response(data=response.data, status_code=response.status_code)
+                return response
+
+        self.viewsets = IdTypeViewSet, RebuildingIdTypeViewSet
+        self.factory = APIRequestFactory()
+        self.admin = CustomUser.objects.create_superuser(
+            email='envelope@example.com', username='envelope', phone_number='15550000006', password='x',
+        )
+        for name in ('Passport', 'National ID'):
+            IdType.objects.create(name=name, description=f'{name} document')
+
+    def render(self, viewset, method, actions, path, data=None, **kwargs):
+        from rest_framework.test import force_authenticate
+
+        request = getattr(self.factory, method)(path, data, format='json')
+        force_authenticate(request, self.admin)
+        response = viewset.as_view(actions)(request, **kwargs)
+        response.render()
+        return response.status_code, response.content
+
+    def test_bytes_identical_to_rebuilt_response(self):
+        pk = IdType.objects.first().pk
+        calls = [
+            ('get', {'get': 'list'}, '/id-types/', None, {}),
+            ('get', {'get': 'retrieve'}, f'/id-types/{pk}/', None, {'pk': pk}),
+            ('post', {'post': 'create'}, '/id-types/', {'name': 'Visa'}, {}),
+            ('patch', {'patch': 'partial_update'}, f'/id-types/{pk}/', {'description': 'x'}, {'pk': pk}),
+            ('delete', {'delete': 'destroy'}, f'/id-types/{pk}/', None, {'pk': pk}),
+        ]
+        for method, actions, path, data, kwargs in calls:
+            with self.subTest(action=actions):
+                results = []
+                for viewset in self.viewsets:
+                    sid = transaction.savepoint()
+                    status_code, content = self.render(viewset, method, actions, path, data, **kwargs)
+                    transaction.savepoint_rollback(sid)
+                    # Sequences are not rolled back.
+                    results.append((status_code, re.sub(rb'"id":\d+', b'"id":0', content)))
+                self.assertEqual(results[0], results[1])
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        IdType.objects.create(name='Passport')
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape')
+    def test_server_timing_and_metrics_endpoint(self):
+        from config import metrics
+
+        response = self.client.get(reverse('id-type-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="2 queries", cache;.*total;dur=')
+
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",view="id-type-list",status="200",le="+Inf"}',
+                      body)
+        self.assertIn('http_db_queries_total{view="id-type-list"}', body)
+        self.assertIn('# TYPE outbound_http_request_duration_seconds histogram', body)
+
+        stats, token = metrics.start_request()
+        try:
+            cache.set('metrics-test', 1)
+            cache.get('metrics-test')
+            cache.get('metrics-missing')
+            cache.get_many(['metrics-test', 'metrics-missing'])
+            metrics.record_outbound('didit', 'POST', 200, 0.25)
+        finally:
+            metrics.end_request(token)
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 2))
+        self.assertEqual((stats.outbound_calls, stats.outbound_seconds), (1, 0.25))
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('id-type-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+class NPlusOneDetectorTests(TestCase):
+    def setUp(self):
+        from messaging.models import Conversation, Message
+
+        self.users = [
+            CustomUser.objects.create_user(
+                email=f'n1-{i}@example.com', username=f'n1-{i}', phone_number=f'1555100000{i}', password='x',
+            )
+            for i in range(2)
+        ]
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.set(self.users)
+        Message.objects.bulk_create(
+            Message(conversation=self.conversation, sender=self.users[i % 2], content=str(i)) for i in range(6)
+        )
+
+    def serialize(self, queryset):
+        from messaging.serializers import MessageSerializer
+
+        return MessageSerializer(queryset, many=True).data
+
+    def test_flags_per_row_queries_with_their_stack(self):
+        from config.nplusone import NPlusOneError, assert_no_n_plus_one
+
+        with self.assertRaises(NPlusOneError) as raised:
+            with assert_no_n_plus_one():
+                self.serialize(self.conversation.messages.all())
+        report = str(raised.exception)
+        self.assertIn('6x SELECT', report)
+        self.assertIn('"messaging_messageattachment"', report)
+        self.assertIn('config/tests.py:', report)
+
+        with assert_no_n_plus_one():
+            self.serialize(self.conversation.messages.select_related('sender__profile').prefetch_related('attachments'))
+        with assert_no_n_plus_one(allowlist=[r'FROM "(users_customuser|users_profile|messaging_messageattachment)"']):
+            self.serialize(self.conversation.messages.all())
+
+    def test_normalize_sql(self):
+        from config.nplusone import normalize_sql
+
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+    @override_settings(NPLUSONE_MODE='raise', NPLUSONE_THRESHOLD=2)
+    def test_middleware_raise_mode(self):
+        from config.nplusone import NPlusOneError
+
+        for name in ('Passport', 'Visa'):
+            IdType.objects.create(name=name)
+        self.client.get(reverse('id-type-list'))
+        with mock.patch('users.views.IdTypeViewSet.get_queryset',
+                        lambda view: [IdType.objects.get(pk=pk) for pk in IdType.objects.values_list('pk', flat=True)]):
+            with self.assertRaises(NPlusOneError):
+                self.client.get(reverse('id-type-list'))
+
+
+class StructuredLoggingTests(TestCase):
+    def test_request_id_header(self):
+        response = self.client.get(reverse('id-type-list'))
+        generated = response['X-Request-ID']
+        self.assertRegex(generated, r'^[0-9a-f]{32}$')
+
+        response = self.client.get(reverse('id-type-list'), HTTP_X_REQUEST_ID='edge-1234')
+        self.assertEqual(response['X-Request-ID'], 'edge-1234')
+        response = self.client.get(reverse('id-type-list'), HTTP_X_REQUEST_ID='bad id\n' * 20)
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_json_lines_carry_request_id_and_extra(self):
+        import logging
+
+        from config.log import JSONFormatter, RequestIdFilter, bind_request_id, reset_request_id
+
+        record = logging.makeLogRecord({
+            'name': 'users.views', 'levelno': logging.INFO, 'levelname': 'INFO',
+            'msg': 'Queued %s', 'args': ('email',), 'outbox_id': 7,
+        })
+        _, token = bind_request_id('req-1')
+        try:
+            RequestIdFilter().filter(record)
+        finally:
+            reset_request_id(token)
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry['message'], 'Queued email')
+        self.assertEqual(entry['request_id'], 'req-1')
+        self.assertEqual(entry['logger'], 'users.views')
+        self.assertEqual(entry['outbox_id'], 7)
+        self.assertTrue(entry['time'].endswith('Z'))
+
+    def test_queue_handler_writes_in_background_and_drops_when_full(self):
+        import logging
+
+        from config.log import QueueStreamHandler
+
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        logger = logging.getLogger('tests.queue_handler')
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            logger.warning('first %d', 1)
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        self.assertEqual(stream.getvalue(), 'WARNING first 1\n')
+
+        full = QueueStreamHandler(io.StringIO(), maxsize=1)
+        full.flush_and_stop()
+        for _ in range(3):
+            full.handle(logging.makeLogRecord({'msg': 'x'}))
+        self.assertEqual(full.dropped, 2)
+
+    def test_parse_levels(self):
+        from config.log import parse_levels
+
+        self.assertEqual(
+            parse_levels(' messaging.consumers=debug, users.views=WARNING,,broken'),
+            {'messaging.consumers': 'DEBUG', 'users.views': 'WARNING'},
+        )
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_sdks_stay_out_of_startup(self):
+        from config import importtime
+
+        profile = importtime.profile()
+        self.assertIn('config.urls', profile.modules)
+        self.assertGreater(profile.total_ms, 0)
+        for package in importtime.LAZY_MODULES:
+            self.assertFalse(profile.imported(package), f'{package} is imported at start-up')
+
+    @override_settings(FIREBASE_CREDENTIAL_FILE='')
+    def test_firebase_requires_credentials(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        from users.firebase import firebase_auth
+
+        with self.assertRaises(ImproperlyConfigured):
+            firebase_auth()
+
+
+class ReleaseAndReadinessTests(TestCase):
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+    def test_ready_when_database_and_channel_layer_reachable(self):
+        self.assertEqual(self.client.get(reverse('health-live')).json(), {'status': 'ok'})
+        response = self.client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['status'], 'ok')
+        self.assertTrue(body['checks']['database']['ok'])
+        self.assertTrue(body['checks']['channel_layer']['ok'])
+
+    @override_settings(
+        CHANNEL_LAYERS={'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': ['redis://127.0.0.1:1/0']},
+        }},
+        HEALTH_CHECK_TIMEOUT=1,
+    )
+    def test_unavailable_when_channel_layer_unreachable(self):
+        with self.assertLogs('config.health', 'WARNING'), self.assertLogs('django.request', 'ERROR'):
+            response = self.client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, 503)
+        body = response.json()
+        self.assertEqual(body['status'], 'unavailable')
+        self.assertTrue(body['checks']['database']['ok'])
+        self.assertFalse(body['checks']['channel_layer']['ok'])
+        self.assertIn('error', body['checks']['channel_layer'])
+
+    def test_release_checks_migrations_and_creates_superuser(self):
+        out = io.StringIO()
+        call_command('release', skip_static=True, verbosity=0, stdout=out)
+        self.assertIn('Release tasks complete', out.getvalue())
+        self.assertTrue(CustomUser.objects.filter(is_superuser=True).exists())
+
+    def test_release_fails_on_missing_migrations(self):
+        with mock.patch('django.core.management.commands.makemigrations.Command.handle',
+                        side_effect=SystemExit(1)):
+            with self.assertRaises(CommandError):
+                call_command('release', skip_static=True, skip_migrate=True, stdout=io.StringIO())
+
+
+class ServingProfileTests(SimpleTestCase):
+    def test_sync_thread_pool_bounds_and_reuses_threads(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        from config.serving import SyncThreadPool
+
+        seen = []
+
+        async def app(scope, receive, send):
+            first = await sync_to_async(threading.get_ident)()
+            await asyncio.sleep(0.01)
+            seen.append((first, await sync_to_async(threading.get_ident)()))
+
+        pool = SyncThreadPool(app, 3)
+
+        async def burst():
+            await asyncio.gather(*(pool({'type': 'http', 'path': '/api/'}, None, None) for _ in range(20)))
+
+        try:
+            async_to_sync(burst)()
+        finally:
+            pool.close()
+        self.assertEqual(len(seen), 20)
+        # A request keeps one thread throughout, and only the pool's threads are used.
+        self.assertTrue(all(first == second for first, second in seen))
+        self.assertLessEqual(len({first for first, _ in seen}), 3)
+        self.assertEqual(pool.default.idle.qsize(), 3)
+
+    def test_streaming_routes_cannot_starve_health_checks(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        from config.serving import SyncThreadPool
+
+        served = []
+
+        async def app(scope, receive, send):
+            await sync_to_async(lambda: None)()
+            if scope['path'].startswith('/export/'):
+                await receive()  # a slow client: holds its thread until released
+            served.append(scope['path'])
+
+        pool = SyncThreadPool(app, 2, lanes={'/export/': 1, '/health/': 1})
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def slow_client():
+                await release.wait()
+
+            exports = [asyncio.ensure_future(pool({'type': 'http', 'path': f'/export/{i}'}, slow_client, None))
+                       for i in range(3)]
+            await asyncio.wait_for(asyncio.gather(
+                pool({'type': 'http', 'path': '/health/ready'}, None, None),
+                pool({'type': 'http', 'path': '/api/feed'}, None, None),
+            ), timeout=5)
+            release.set()
+            await asyncio.gather(*exports)
+
+        try:
+            async_to_sync(scenario)()
+        finally:
+            pool.close()
+        self.assertEqual(served[:2], ['/health/ready', '/api/feed'])
+        self.assertEqual(sorted(served[2:]), ['/export/0', '/export/1', '/export/2'])
+
+    def test_untested_asgiref_falls_back_to_django_threads(self):
+        from config import serving
+
+        def app(scope, receive, send):
+            pass
+
+        with mock.patch.object(serving.asgiref, '__version__', '4.0.0'), self.assertLogs('config.serving', 'WARNING'):
+            self.assertIs(serving.with_sync_thread_pool(app, 4), app)
+        pool = serving.with_sync_thread_pool(app, 4)
+        self.assertIsInstance(pool, serving.SyncThreadPool)
+        pool.close()
+
+    def test_worker_count(self):
+        from config.serving import cpu_count, worker_count
+
+        redis_cache = {'default': {'BACKEND': 'config.metrics.InstrumentedRedisCache',
+                                   'LOCATION': 'redis://127.0.0.1:6379/0'}}
+        local_cache = {'default': {'BACKEND': 'config.metrics.InstrumentedLocMemCache'}}
+        self.assertGreaterEqual(cpu_count(), 1)
+        with override_settings(WEB_CONCURRENCY=0, CACHES=redis_cache):
+            self.assertEqual(worker_count(), cpu_count())
+        with override_settings(WEB_CONCURRENCY=0, CACHES=local_cache):
+            self.assertEqual(worker_count(), 1)
+        with override_settings(WEB_CONCURRENCY=3):
+            self.assertEqual(worker_count(), 3)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'config.metrics.InstrumentedLocMemCache'}})
+    def test_serve_refuses_several_workers_on_a_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'shared cache'):
+            call_command('serve', workers=2, stdout=io.StringIO())
+
+    def test_database_connections_are_health_checked(self):
+        from django.conf import settings
+
+        self.assertTrue(settings.DATABASES['default']['CONN_HEALTH_CHECKS'])
+
+    def test_serving_benchmark(self):
+        from config import httpload
+
+        report = httpload.scaling(workers=[1], path='/health/live', concurrency=4, duration=1, warmup=0)
+        run = report['runs'][0]
+        self.assertEqual(run['workers'], 1)
+        self.assertGreater(run['requests'], 0)
+        self.assertEqual(run['errors'], 0)
+        self.assertEqual(run['speedup'], 1.0)
@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.views import liveness_view, metrics_view, readiness_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('rest_framework.urls')),
@@ -26,5 +28,8 @@ urlpatterns = [
     path('api/listings/', include('listings.urls')),
     path('api/messaging/', include('messaging.urls')),
     path('api/admin/', include('reporting.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('health/live', liveness_view, name='health-live'),
+    path('health/ready', readiness_view, name='health-ready'),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
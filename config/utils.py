@@ -1,14 +1,19 @@
+import re
+from functools import lru_cache
+
 from rest_framework.response import Response
-import cloudinary
-import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
 
+from config.storage import (
+    cloudinary_sdk, forget_upload, get_storage, upload_all, upload_images as storage_upload_images,
+)
 
-def standard_response(data=None, status_code=200, message=None, error=None, meta=None):
+
+def envelope(data=None, status_code=200, message=None, error=None, meta=None):
     """
     Backward-compatible envelope:
     - Keeps old keys EXACTLY: status (string), error (list), data (object), status_code (int)
     - Adds new keys: success (bool), message (str), error_obj (dict), meta (dict)
+    `data` is referenced, not copied.
     """
     # Legacy behavior: keep `error` as a LIST exactly as before
     if error is None:
@@ -37,50 +42,82 @@ def standard_response(data=None, status_code=200, message=None, error=None, meta
         "status_code": status_code,
         "error": legacy_error_list,  # ← keep as LIST
     }
-    return Response(payload, status=status_code)
-
-
-from django.conf import settings
+    return payload
 
 
-CLOUDINARY_CLOUD_NAME = settings.CLOUDINARY_CLOUD_NAME
-CLOUDINARY_API_KEY = settings.CLOUDINARY_API_KEY    
-CLOUDINARY_API_SECRET = settings.CLOUDINARY_API_SECRET
+def standard_response(data=None, status_code=200, message=None, error=None, meta=None):
+    """A Response carrying envelope(...)."""
+    return Response(envelope(data, status_code, message, error, meta), status=status_code)
 
-# Configuration       
-cloudinary.config( 
-    cloud_name = CLOUDINARY_CLOUD_NAME, 
-    api_key = CLOUDINARY_API_KEY, 
-    api_secret = CLOUDINARY_API_SECRET,
-    secure=True
-)
 
 def upload_image(image_path, public_id=None):
-    upload_result = cloudinary.uploader.upload(image_path, public_id=public_id)
-    print(upload_result)
-    return upload_result["secure_url"]
+    return upload_all([image_path], [public_id])[0]
 
-# upload multiple files at once
+# upload multiple files at once; returns one config.storage.UploadResult per file
 def upload_images(image_paths, public_ids=None):
-    if public_ids is None:
-        public_ids = [None] * len(image_paths)
-    
-    upload_results = []
-    for image_path, public_id in zip(image_paths, public_ids):
-        upload_result = cloudinary.uploader.upload(image_path, public_id=public_id)
-        upload_results.append(upload_result["secure_url"])
-    
-    return upload_results
+    return storage_upload_images(image_paths, public_ids)
 
 def delete_image(public_id):
-    return cloudinary.uploader.destroy(public_id)
+    forget_upload(public_id)
+    return get_storage().delete(public_id)
 
-def optimized_image_url(public_id):
-    optimized_url, _ = cloudinary_url(public_id, fetch_format="auto", quality="auto")
+def optimized_image_url(public_id, **options):
+    optimized_url, _ = cloudinary_sdk().utils.cloudinary_url(public_id, fetch_format="auto", quality="auto",
+                                                             **options)
     return optimized_url
 
-def auto_crop_url(public_id, width=500, height=500):
-    crop_url, _ = cloudinary_url(public_id, width=width, height=height, crop="auto", gravity="auto")
+def auto_crop_url(public_id, width=500, height=500, **options):
+    crop_url, _ = cloudinary_sdk().utils.cloudinary_url(public_id, width=width, height=height, crop="auto",
+                                                        gravity="auto", fetch_format="auto", quality="auto",
+                                                        **options)
     return crop_url
 
 
+# Derivative sizes clients can ask for with ?image_sizes=thumbnail,medium
+IMAGE_SIZES = {
+    'thumbnail': (150, 150),
+    'medium': (600, 600),
+}
+IMAGE_SIZES_PARAM = 'image_sizes'
+
+# .../image/upload/[transformations/]v<version>/<public_id>.<format>
+CLOUDINARY_URL_RE = re.compile(
+    r'^https?://res\.cloudinary\.com/(?P<cloud_name>[^/]+)/image/upload/(?:[^/]*,[^/]*/|[a-z]_[^/]+/)*'
+    r'v(?P<version>\d+)/(?P<public_id>.+?)(?:\.[A-Za-z0-9]+)?$'
+)
+
+
+@lru_cache(maxsize=4096)
+def derived_image_url(public_id, version, size, cloud_name=None):
+    """URL of `size` ('original' = optimized format/quality only), memoized per (public_id, version, size)."""
+    options = {'version': version, 'cloud_name': cloud_name} if cloud_name else {'version': version}
+    if size == 'original':
+        return optimized_image_url(public_id, **options)
+    width, height = IMAGE_SIZES[size]
+    return auto_crop_url(public_id, width=width, height=height, **options)
+
+
+def requested_image_sizes(request):
+    """Sizes named in ?image_sizes= (comma separated), defaulting to all."""
+    raw = request.query_params.get(IMAGE_SIZES_PARAM) if request is not None else None
+    if not raw:
+        return tuple(IMAGE_SIZES)
+    return tuple(size for size in raw.split(',') if size in IMAGE_SIZES or size == 'original')
+
+
+def image_variants(url, sizes):
+    """
+    {size: url} for a stored Cloudinary image URL. URLs from other storages
+    have no derivatives and are returned unchanged for every size.
+    """
+    if not url:
+        return None
+    match = CLOUDINARY_URL_RE.match(url)
+    if not match:
+        return {size: url for size in sizes}
+    return {
+        size: derived_image_url(match['public_id'], match['version'], size, match['cloud_name'])
+        for size in sizes
+    }
+
+
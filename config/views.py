@@ -1,5 +1,11 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
 from rest_framework import viewsets
-from .utils import standard_response
+
+from . import health, metrics
+from .utils import envelope
 
 
 class StandardResponseViewSet(viewsets.ModelViewSet):
@@ -8,11 +14,10 @@ class StandardResponseViewSet(viewsets.ModelViewSet):
     """
 
     def _standardize_response(self, response):
+        # Wrap in place: the envelope references the existing data and the
+        # response keeps its headers; nothing is copied or rebuilt.
         if hasattr(response, 'data'):
-            return standard_response(
-                data=response.data,
-                status_code=response.status_code
-            )
+            response.data = envelope(data=response.data, status_code=response.status_code)
         return response
 
     def list(self, request, *args, **kwargs):
@@ -38,3 +43,28 @@ class StandardResponseViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         response = super().destroy(request, *args, **kwargs)
         return self._standardize_response(response)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. 404 unless METRICS_ENABLED; when METRICS_TOKEN
+    is set the scraper must send it as a Bearer token.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, settings.METRICS_TOKEN):
+            return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def liveness_view(request):
+    """The process is up and serving; no backing service is touched."""
+    return JsonResponse({'status': 'ok'})
+
+
+def readiness_view(request):
+    """200 once the database and channel layer are reachable, 503 otherwise."""
+    ready, checks = health.readiness()
+    return JsonResponse({'status': 'ok' if ready else 'unavailable', 'checks': checks}, status=200 if ready else 503)
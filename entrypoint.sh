@@ -1,21 +1,21 @@
 #!/bin/sh
+set -e
 
-# Run migrations
-echo "Running migrations..."
-python manage.py makemigrations
-python manage.py migrate
+# Migrations, the superuser and static files belong to the release phase
+# (`python manage.py release`), run once per deploy, not on every start.
+# RUN_RELEASE=True runs it here for single-instance setups (docker compose).
+if [ "$RUN_RELEASE" = "True" ]; then
+    echo "Running release tasks..."
+    python manage.py release --skip-static
+fi
 
-# Create superuser
-echo "Creating superuser..."
-python manage.py create_superuser
+# A compose `command:` (e.g. uvicorn --reload) replaces the default server.
+if [ "$#" -gt 0 ]; then
+    exec "$@"
+fi
 
-# Collect static files
-echo "Collecting static files..."
-python manage.py collectstatic --noinput --clear
-
-# Start Uvicorn
+# Start Uvicorn: one worker per usable CPU unless WEB_CONCURRENCY is set
 echo "Starting Uvicorn ..."
-exec uvicorn config.asgi:application --host 0.0.0.0 --port 8000 --ws-max-size 2097152 
+exec python manage.py serve --host 0.0.0.0 --port 8000
 
 # daphne -b 0.0.0.0 -p 8000 config.asgi:application
-# uvicorn config.asgi:application --host 0.0.0.0 --port 8000 --ws-max-size 2097152 
\ No newline at end of file
@@ -0,0 +1,123 @@
+import datetime
+import io
+import json
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from config.parsers import FastJSONParser
+from config.renderers import FastJSONRenderer, orjson
+from config.utils import standard_response
+from listings.models import LocationData, TravelListing
+from listings.serializers import TravelListingSerializer
+from messaging.models import Conversation, Message, MessageAttachment
+from messaging.serializers import MessageSerializer
+
+User = get_user_model()
+
+PREFIX = 'benchjson'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares DRF\'s JSONRenderer/JSONParser with config.renderers.FastJSONRenderer and '
+        'config.parsers.FastJSONParser on real serializer output (a listing feed and a '
+        'message history, wrapped in standard_response). Synthetic rows are created in a '
+        'transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=200)
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; FastJSONRenderer uses the stdlib'))
+        with transaction.atomic():
+            payloads = self.build_payloads(options['listings'], options['messages'])
+            transaction.set_rollback(True)
+
+        for label, data in payloads.items():
+            stock = JSONRenderer().render(data)
+            fast = FastJSONRenderer().render(data)
+            if json.loads(stock) != json.loads(fast):
+                self.stderr.write(self.style.ERROR(f'{label}: renderers disagree'))
+            self.stdout.write(f'\n{label} ({len(stock) / 1024:.0f} KiB, identical bytes: {stock == fast})')
+            self.report('render JSONRenderer', options['repeat'], lambda: JSONRenderer().render(data))
+            self.report('render FastJSONRenderer', options['repeat'], lambda: FastJSONRenderer().render(data))
+            self.report('parse JSONParser', options['repeat'], lambda: JSONParser().parse(io.BytesIO(stock)))
+            self.report('parse FastJSONParser', options['repeat'], lambda: FastJSONParser().parse(io.BytesIO(stock)))
+
+    def build_payloads(self, listing_count, message_count):
+        users = [
+            User.objects.create_user(
+                email=f'{PREFIX}{i}@example.com', username=f'{PREFIX}{i}',
+                phone_number=f'8{i:013d}', password=None,
+            )
+            for i in range(20)
+        ]
+        pickup = LocationData.objects.create(name='Douala', country='Cameroon', country_code='CM')
+        destination = LocationData.objects.create(name='Paris', country='France', country_code='FR')
+        today = datetime.date.today()
+        TravelListing.objects.bulk_create(
+            TravelListing(
+                user=users[i % len(users)],
+                pickup_location=pickup,
+                destination_location=destination,
+                travel_date=today + datetime.timedelta(days=i % 60),
+                travel_time=datetime.time(9, 30),
+                maximum_weight_in_kg=Decimal('23.50'),
+                notes='Bench listing ' * 5,
+                price_per_kg=Decimal('12.75'),
+                price_per_document=Decimal('5.00'),
+                price_per_phone=Decimal('15.00'),
+            )
+            for i in range(listing_count)
+        )
+        listings = (
+            TravelListing.objects.filter(user__in=users)
+            .select_related('user__profile', 'pickup_location', 'destination_location',
+                            'pickup_region__country', 'destination_region__country')
+            .order_by('-created_at')
+        )
+
+        conversation = Conversation.objects.create()
+        conversation.participants.set(users[:2])
+        messages = Message.objects.bulk_create(
+            Message(conversation=conversation, sender=users[i % 2], content=f'Message {i} ' * 8)
+            for i in range(message_count)
+        )
+        MessageAttachment.objects.bulk_create(
+            MessageAttachment(
+                message=message, file_name='photo.jpg', file_type='image/jpeg',
+                file_url=f'https://res.cloudinary.com/demo/image/upload/v1/message_attachments/{message.pk}/photo.jpg',
+            )
+            for message in messages[::10]
+        )
+        history = (
+            Message.objects.filter(conversation=conversation)
+            .select_related('sender__profile').prefetch_related('attachments').order_by('created_at')
+        )
+        return {
+            'listing feed': standard_response(data=TravelListingSerializer(listings, many=True).data).data,
+            'message history': standard_response(data=MessageSerializer(history, many=True).data).data,
+        }
+
+    def report(self, label, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f'{label:>26}: mean {statistics.mean(timings):.3f} ms, '
+            f'p50 {timings[len(timings) // 2]:.3f} ms, p95 {timings[int(len(timings) * 0.95)]:.3f} ms'
+        )
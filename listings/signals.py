@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_init, pre_delete
 from django.dispatch import receiver
-from .models import TravelListing, Alert
+from .models import TravelListing, Alert, PackageRequest, Review
+from users import stats
 from django.contrib.auth import get_user_model
 from messaging.utils import send_notification_to_user
 from messaging.models import Notification
@@ -15,8 +16,6 @@ def notify_alerts_on_travel_listing(sender, instance, created, **kwargs):
     if not created:
         return
 
-    print(f" {instance.id} - {instance.destination_location} ")
-
     alerts = Alert.objects.filter(
         pickup_location__country=instance.pickup_location.country if instance.pickup_location else "",
         destination_location__country=instance.destination_location.country if instance.destination_location else "",
@@ -39,3 +38,66 @@ def notify_alerts_on_travel_listing(sender, instance, created, **kwargs):
         )
         serializer = NotificationSerializer(notification)
         send_notification_to_user(user.id, serializer.data)
+
+
+# ---- Profile statistics (see users.stats) ----
+
+@receiver(post_save, sender=TravelListing)
+def count_trip_created(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(stats.profile_of(instance.user_id), total_trips_created=1)
+
+
+@receiver(pre_delete, sender=TravelListing)
+def count_trip_deleted(sender, instance, **kwargs):
+    stats.bump(stats.profile_of(instance.user_id), total_trips_created=-1)
+
+
+@receiver(post_init, sender=PackageRequest)
+def remember_package_request_status(sender, instance, **kwargs):
+    instance._stats_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=PackageRequest)
+def count_package_request_saved(sender, instance, created, **kwargs):
+    owner = stats.owner_of(instance.travel_listing_id)
+    if created:
+        stats.bump(stats.profile_of(instance.user_id), total_offer_sent=1)
+        stats.bump(owner, total_offer_received=1)
+    was_completed = not created and instance._stats_status == 'completed'
+    is_completed = instance.status == 'completed'
+    if is_completed != was_completed:
+        stats.bump(owner, total_completed_deliveries=1 if is_completed else -1)
+    instance._stats_status = instance.status
+
+
+@receiver(pre_delete, sender=PackageRequest)
+def count_package_request_deleted(sender, instance, **kwargs):
+    # pre_delete so the listing still exists when the request is removed by a
+    # cascade from TravelListing.
+    owner = stats.owner_of(instance.travel_listing_id)
+    stats.bump(stats.profile_of(instance.user_id), total_offer_sent=-1)
+    deltas = {'total_offer_received': -1}
+    if instance._stats_status == 'completed':
+        deltas['total_completed_deliveries'] = -1
+    stats.bump(owner, **deltas)
+
+
+@receiver(post_init, sender=Review)
+def remember_review_rate(sender, instance, **kwargs):
+    instance._stats_rate = instance.__dict__.get('rate')
+
+
+@receiver(post_save, sender=Review)
+def count_review_saved(sender, instance, created, **kwargs):
+    owner = stats.owner_of(instance.travel_listing_id)
+    if created:
+        stats.add_rating(owner, instance.rate)
+    else:
+        stats.change_rating(owner, instance._stats_rate, instance.rate)
+    instance._stats_rate = instance.rate
+
+
+@receiver(pre_delete, sender=Review)
+def count_review_deleted(sender, instance, **kwargs):
+    stats.remove_rating(stats.owner_of(instance.travel_listing_id), instance._stats_rate)
@@ -1,3 +1,106 @@
+import datetime
+import importlib
+import io
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
 from django.test import TestCase
 
-# Create your tests here.
+from users.models import CustomUser, Profile
+
+from .models import PackageRequest, Review, TravelListing
+
+
+class ProfileStatsTests(TestCase):
+    def setUp(self):
+        self.traveller, self.sender, self.other = [
+            CustomUser.objects.create_user(
+                username=f'stats{n}', email=f'stats{n}@example.com', phone_number=f'155500020{n:02d}', password='x',
+            )
+            for n in range(3)
+        ]
+
+    def trip(self):
+        return TravelListing.objects.create(
+            user=self.traveller, travel_date=datetime.date(2026, 11, 1), travel_time=datetime.time(9),
+            maximum_weight_in_kg=Decimal('20'), price_per_kg=Decimal('10'),
+        )
+
+    def stats(self, user):
+        return Profile.objects.values(
+            'total_trips_created', 'total_offer_sent', 'total_offer_received',
+            'total_completed_deliveries', 'total_rating_received', 'average_rating',
+        ).get(user=user)
+
+    def test_counters_follow_the_lifecycle(self):
+        trip = self.trip()
+        request = PackageRequest.objects.create(user=self.sender, travel_listing=trip)
+        PackageRequest.objects.create(user=self.other, travel_listing=trip)
+        request.status = 'completed'
+        request.save()
+        request.save()  # no status change: counted once
+        self.assertEqual(self.stats(self.traveller)['total_trips_created'], 1)
+        self.assertEqual(self.stats(self.traveller)['total_offer_received'], 2)
+        self.assertEqual(self.stats(self.traveller)['total_completed_deliveries'], 1)
+        self.assertEqual(self.stats(self.sender)['total_offer_sent'], 1)
+
+        # A fresh instance remembers the loaded status too.
+        reloaded = PackageRequest.objects.get(pk=request.pk)
+        reloaded.status = 'accepted'
+        reloaded.save()
+        self.assertEqual(self.stats(self.traveller)['total_completed_deliveries'], 0)
+
+        # Deleting the listing cascades to its requests, which are uncounted first.
+        trip.delete()
+        traveller = self.stats(self.traveller)
+        self.assertEqual((traveller['total_trips_created'], traveller['total_offer_received']), (0, 0))
+        self.assertEqual(self.stats(self.sender)['total_offer_sent'], 0)
+
+    def test_rating_average_is_kept_incrementally(self):
+        trip = self.trip()
+        requests = [PackageRequest.objects.create(user=user, travel_listing=trip) for user in (self.sender, self.other)]
+        first = Review.objects.create(travel_listing=trip, package_request=requests[0], reviewer=self.sender, rate=5)
+        Review.objects.create(travel_listing=trip, package_request=requests[1], reviewer=self.other, rate=2)
+        self.assertEqual(self.stats(self.traveller)['total_rating_received'], 2)
+        self.assertAlmostEqual(self.stats(self.traveller)['average_rating'], 3.5)
+
+        first.rate = 3
+        first.save()
+        self.assertAlmostEqual(self.stats(self.traveller)['average_rating'], 2.5)
+        first.delete()
+        self.assertEqual(self.stats(self.traveller)['total_rating_received'], 1)
+        self.assertAlmostEqual(self.stats(self.traveller)['average_rating'], 2.0)
+
+    def test_reconcile_repairs_drift(self):
+        trip = self.trip()
+        PackageRequest.objects.create(user=self.sender, travel_listing=trip)
+        # Queryset updates bypass the signals.
+        PackageRequest.objects.update(status='completed')
+        Profile.objects.filter(user=self.sender).update(total_offer_sent=7)
+        expected_traveller = {**self.stats(self.traveller), 'total_completed_deliveries': 1}
+        expected_sender = {**self.stats(self.sender), 'total_offer_sent': 1}
+
+        out = io.StringIO()
+        call_command('reconcile_profile_stats', stdout=out)
+        self.assertIn('2 profiles corrected', out.getvalue())
+        self.assertEqual(self.stats(self.traveller), expected_traveller)
+        self.assertEqual(self.stats(self.sender), expected_sender)
+
+        call_command('reconcile_profile_stats', stdout=out)
+        self.assertIn('0 profiles corrected', out.getvalue())
+
+    def test_migration_backfills_existing_counters(self):
+        PackageRequest.objects.create(user=self.sender, travel_listing=self.trip())
+        # Values left over from before the counters were maintained by signals.
+        Profile.objects.update(total_trips_created=5, total_offer_sent=0, total_offer_received=9)
+
+        migration = importlib.import_module('users.migrations.0022_reconcile_profile_stats')
+        state = MigrationExecutor(connection).loader.project_state(('users', '0022_reconcile_profile_stats'))
+        migration.reconcile_profile_stats(state.apps, None)
+        traveller, sender = self.stats(self.traveller), self.stats(self.sender)
+        self.assertEqual((traveller['total_trips_created'], traveller['total_offer_received']), (1, 1))
+        self.assertEqual(sender['total_offer_sent'], 1)
+        self.assertEqual(self.stats(self.other)['total_trips_created'], 0)
+
@@ -19,6 +19,9 @@ from messaging.serializers import NotificationSerializer
 from messaging.utils import send_notification_to_user
 from listings.models import TransportType, PackageType
 from reporting.models import EventLog
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # Create your views here.
@@ -361,8 +364,8 @@ class PackageRequestViewSet(StandardResponseViewSet):
                     'message': message_dict
                 }
             )
-        except Exception as e:
-            print(f"Channel send failed: {e}")
+        except Exception:
+            logger.warning("Channel send to conversation %s failed", conversation.id, exc_info=True)
 
         return instance, conversation, message  # 👈 Return them for create()
 
@@ -1,17 +1,26 @@
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
 import base64
-from config.utils import upload_image
+from config.utils import upload_image, image_variants, IMAGE_SIZES
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
         self.room_group_name = f'chat_{self.conversation_id}'
-        print("Connected now 11111111111111111111111111")
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated or not await self.is_participant():
+            logger.info("Refused chat socket for user %s in conversation %s",
+                        getattr(user, 'pk', None), self.conversation_id)
+            await self.close()
+            return
+        logger.debug("Chat socket for user %s joined conversation %s", user.pk, self.conversation_id)
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -22,7 +31,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         # Leave room group
-        print("Disconnected now 222222222222222222222222222")
+        logger.debug("Chat socket left conversation %s (code %s)", self.conversation_id, close_code)
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
@@ -32,7 +41,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
         try:
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type')
-            print(message_type)
             if message_type == 'message':
                 content = text_data_json.get('content')
                 attachments = text_data_json.get('attachments', [])
@@ -58,19 +66,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
                         'is_typing': text_data_json.get('is_typing', False)
                     }
                 )
-        except Exception as e:
-            import traceback
-            print("Exception in receive:", e)
-            traceback.print_exc()
-            # Send error to client
+        except Exception:
+            logger.exception("Error handling chat frame in conversation %s", self.conversation_id)
+            # Send error to client; details stay in the log.
             await self.send(text_data=json.dumps({
                 'type': 'error',
-                'message': f'Error: {str(e)}'
+                'message': 'Could not process the message'
             }))
 
     async def chat_message(self, event):
         # Send message to WebSocket
-        print("the event message is", event['message'])
         await self.send(text_data=json.dumps({
             'type': 'message',
             'message': event['message']
@@ -85,32 +90,32 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'is_typing': event['is_typing']
         }))
 
+    @database_sync_to_async
+    def is_participant(self):
+        from .models import Conversation
+
+        return Conversation.objects.filter(id=self.conversation_id, participants=self.scope['user']).exists()
+
     @database_sync_to_async
     def save_message(self, content, attachments):
         # Import models here to avoid circular imports
         from .models import Conversation, Message, MessageAttachment
-        
-        conversation = Conversation.objects.get(id=self.conversation_id)
+
+        # Checked again on every message: the user may have left the conversation.
+        conversation = Conversation.objects.get(id=self.conversation_id, participants=self.scope['user'])
         message = Message.objects.create(
             conversation=conversation,
             sender=self.scope['user'],
             content=content
         )
-        print("========================================")
-        print(attachments)
-        print("========================================")
         # Handle attachments
         for attachment in attachments:
             file_data = base64.b64decode(attachment['data'])
             file_name = attachment['name']
             file_type = attachment['type']
-            print("+++++++++++++++++++++++++++++++++++++")
-            print(file_data)
-            print(file_name)
-            print(file_type)
-            print("++++++++++++++++++++++++++++++++++++++")
-            file_url = upload_image(file_data, public_id=f'message_attachments/{message.id}/{file_name}')
-            print("File URL after upload:", file_url)
+            file_url = upload_image(ContentFile(file_data, name=file_name))
+            logger.debug("Uploaded attachment %s (%s, %d bytes) for message %s",
+                         file_name, file_type, len(file_data), message.id)
             MessageAttachment.objects.create(
                 message=message,
                 # file=ContentFile(file_data, name=file_name),
@@ -135,12 +140,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     'file_name': att.file_name,
                     'file_type': att.file_type,
                     'file_url': att.file_url,
+                    'file_urls': image_variants(att.file_url, tuple(IMAGE_SIZES))
+                    if (att.file_type or '').startswith('image/') else None,
                 }
                 for att in message.attachments.all()
             ]
-        } 
-
-        print("Returning message dict:", result)
+        }
         return result
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -180,31 +185,3 @@ class PingConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data=None, bytes_data=None):
         await self.send(text_data=text_data or json.dumps({"pong": True}))
-
-import json, traceback
-from channels.generic.websocket import AsyncWebsocketConsumer
-
-class ChatConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        try:
-            self.conversation_id = self.scope["url_route"]["kwargs"]["conversation_id"]
-            self.group_name = f"chat_{self.conversation_id}"
-
-            # Try group_add (this hits channel layer: Redis in prod)
-            await self.channel_layer.group_add(self.group_name, self.channel_name)
-
-            await self.accept()
-            await self.send(text_data=json.dumps({
-                "connected": True,
-                "conversation_id": self.conversation_id,
-                "user_id": getattr(self.scope.get("user"), "id", None),
-                "is_auth": getattr(self.scope.get("user"), "is_authenticated", False),
-            }))
-        except Exception:
-            traceback.print_exc()
-            # Fail gracefully so client sees the close instead of spin
-            try:
-                await self.close(code=4002)
-            except Exception:
-                pass
-
@@ -0,0 +1,290 @@
+"""
+WebSocket load generator for ChatConsumer and NotificationConsumer.
+
+Simulated clients are Channels WebsocketCommunicators connected to the real
+websocket stack (JWT query-string auth, URL routing, consumers), all in one
+event loop. Each conversation gets `clients_per_conversation` participants;
+every participant sends chat messages and typing events, and optionally
+holds a notification socket that receives notifications published through
+the channel layer, the way messaging.utils does.
+
+Every frame carries a sequence number (the chat message content, the
+notification payload) or arrives in per-sender order (typing events), so
+each delivery is matched to its send time: the report has end-to-end
+fan-out latency percentiles per frame type, delivered/expected frames,
+throughput, connect times and process memory (RSS; tracemalloc on request).
+
+The channel layer is swapped for the run:
+- 'memory': channels.layers.InMemoryChannelLayer;
+- 'redis': channels_redis.core.RedisChannelLayer, as deployed;
+- 'redis-pubsub': channels_redis.pubsub.RedisPubSubChannelLayer.
+The Redis layers need a Redis-compatible server at `redis_url` (redis-server,
+Valkey, KeyDB or Dragonfly started locally); keys use the 'wsload' prefix.
+
+Chat messages are saved by the consumer like real ones; the synthetic users
+and conversations are deleted afterwards unless `keep` is set.
+"""
+import asyncio
+import itertools
+import json
+import os
+import resource
+import time
+import tracemalloc
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.benchmark import percentile
+
+from .models import Conversation
+
+User = get_user_model()
+
+PREFIX = 'benchws'
+LAYER_PREFIX = 'wsload'
+DEFAULT_REDIS_URL = 'redis://127.0.0.1:6379/0'
+
+
+def channel_layer_settings(layer, redis_url=DEFAULT_REDIS_URL):
+    if layer == 'memory':
+        return {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 1000}}}
+    backends = {
+        'redis': 'channels_redis.core.RedisChannelLayer',
+        'redis-pubsub': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+    }
+    if layer not in backends:
+        raise ValueError(f'Unknown channel layer {layer!r}')
+    return {'default': {
+        'BACKEND': backends[layer],
+        'CONFIG': {'hosts': [redis_url], 'prefix': LAYER_PREFIX, 'capacity': 1000},
+    }}
+
+
+def rss_kib():
+    """Current resident set size (peak size where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _latency_summary(values):
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(max(values), 3),
+    }
+
+
+@transaction.atomic
+def create_fixtures(conversations, clients_per_conversation):
+    """Users and conversations for the run; returns [(conversation_id, [user, ...]), ...]."""
+    users = User.objects.bulk_create([
+        User(username=f'{PREFIX}{i}', email=f'{PREFIX}{i}@example.com', phone_number=f'6{i:013d}', password='!')
+        for i in range(conversations * clients_per_conversation)
+    ])
+    rooms = Conversation.objects.bulk_create([Conversation() for _ in range(conversations)])
+    Participants = Conversation.participants.through
+    groups = [users[i::conversations] for i in range(conversations)]
+    Participants.objects.bulk_create([
+        Participants(conversation_id=room.pk, customuser_id=user.pk)
+        for room, members in zip(rooms, groups)
+        for user in members
+    ])
+    return [(room.pk, members) for room, members in zip(rooms, groups)]
+
+
+def delete_fixtures():
+    users = User.objects.filter(username__startswith=PREFIX)
+    Conversation.objects.filter(participants__in=users).distinct().delete()
+    users.delete()
+
+
+class LoadRun:
+    def __init__(self, application, rooms, messages, typing, notifications, interval, timeout, connect_batch):
+        self.application = application
+        self.rooms = rooms
+        self.messages = messages
+        self.typing = typing
+        self.notifications = notifications
+        self.interval = interval
+        self.timeout = timeout
+        self.connect_batch = connect_batch
+        self.sequence = itertools.count()
+        self.sent_at = {}
+        self.typing_sent_at = {}
+        self.latencies = {'message': [], 'typing': [], 'notification': []}
+        self.connect_ms = []
+        self.errors = []
+        self.delivered = 0
+        self.lost = 0
+
+    async def connect(self, path, token):
+        communicator = WebsocketCommunicator(self.application, f'{path}?token={token}')
+        start = time.perf_counter()
+        connected, _ = await communicator.connect(timeout=self.timeout)
+        self.connect_ms.append((time.perf_counter() - start) * 1000)
+        if not connected:
+            self.errors.append(f'{path}: connection refused')
+            return None
+        return communicator
+
+    async def connect_all(self, targets):
+        """Connect (path, token) targets, `connect_batch` at a time."""
+        communicators = []
+        for i in range(0, len(targets), self.connect_batch):
+            communicators += await asyncio.gather(*(
+                self.connect(path, token) for path, token in targets[i:i + self.connect_batch]
+            ))
+        return communicators
+
+    async def receive(self, communicator, expected):
+        typing_seen = {}
+        for received in range(expected):
+            try:
+                frame = json.loads(await communicator.receive_from(timeout=self.timeout))
+            except asyncio.TimeoutError:
+                self.lost += expected - received
+                return
+            now = time.perf_counter()
+            self.delivered += 1
+            kind = frame.get('type')
+            if kind == 'message':
+                self.latencies['message'].append((now - self.sent_at[int(frame['message']['content'])]) * 1000)
+            elif kind == 'typing':
+                index = typing_seen.get(frame['user_id'], 0)
+                typing_seen[frame['user_id']] = index + 1
+                self.latencies['typing'].append((now - self.typing_sent_at[frame['user_id']][index]) * 1000)
+            elif kind == 'notification':
+                self.latencies['notification'].append((now - self.sent_at[frame['notification']['seq']]) * 1000)
+            else:
+                self.errors.append(str(frame)[:200])
+
+    async def chat_sender(self, communicator, user_id):
+        sent_typing = self.typing_sent_at.setdefault(user_id, [])
+        for i in range(max(self.messages, self.typing)):
+            if i < self.typing:
+                sent_typing.append(time.perf_counter())
+                await communicator.send_to(text_data=json.dumps({'type': 'typing', 'is_typing': i % 2 == 0}))
+            if i < self.messages:
+                seq = next(self.sequence)
+                self.sent_at[seq] = time.perf_counter()
+                await communicator.send_to(text_data=json.dumps({'type': 'message', 'content': str(seq)}))
+            await asyncio.sleep(self.interval)
+
+    async def notification_sender(self, user_ids):
+        layer = get_channel_layer()
+        for _ in range(self.notifications):
+            for user_id in user_ids:
+                seq = next(self.sequence)
+                self.sent_at[seq] = time.perf_counter()
+                await layer.group_send(f'notifications_{user_id}', {
+                    'type': 'user_notification',
+                    'notification': {'seq': seq, 'user': user_id, 'message': 'Load test notification'},
+                })
+            await asyncio.sleep(self.interval)
+
+    async def run(self):
+        rss_start = rss_kib()
+        tokens = {user.pk: str(AccessToken.for_user(user)) for _, members in self.rooms for user in members}
+        chat_targets = [
+            (f'/ws/chat/{room_id}/', tokens[user.pk], user.pk, len(members))
+            for room_id, members in self.rooms
+            for user in members
+        ]
+        start = time.perf_counter()
+        chat = await self.connect_all([(path, token) for path, token, _, _ in chat_targets])
+        notification = []
+        if self.notifications:
+            notification = await self.connect_all([('/ws/notifications/', token) for token in tokens.values()])
+        connect_seconds = time.perf_counter() - start
+        rss_connected = rss_kib()
+
+        # Every chat frame reaches all participants, the sender included.
+        expectations = [
+            (communicator, members * (self.messages + self.typing))
+            for communicator, (_, _, _, members) in zip(chat, chat_targets) if communicator
+        ] + [(communicator, self.notifications) for communicator in notification if communicator]
+        expected = sum(count for _, count in expectations)
+        receivers = [self.receive(communicator, count) for communicator, count in expectations]
+        senders = [
+            self.chat_sender(communicator, user_id)
+            for communicator, (_, _, user_id, _) in zip(chat, chat_targets) if communicator
+        ]
+        if self.notifications:
+            senders.append(self.notification_sender(list(tokens)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*receivers, *senders)
+        duration = time.perf_counter() - start
+        rss_peak = rss_kib()
+
+        await asyncio.gather(*(communicator.disconnect() for communicator in chat + notification if communicator))
+        layer = get_channel_layer()
+        close = getattr(layer, 'close_pools', None) or getattr(layer, 'flush')
+        await close()
+
+        clients = sum(1 for communicator in chat + notification if communicator)
+        return {
+            'clients': clients,
+            'connect': {
+                'seconds': round(connect_seconds, 3),
+                'refused': len(chat) + len(notification) - clients,
+                **{key: value for key, value in _latency_summary(self.connect_ms).items() if key != 'count'},
+            },
+            'frames': {'expected': expected, 'delivered': self.delivered, 'lost': self.lost},
+            'duration_s': round(duration, 3),
+            'throughput_fps': round(self.delivered / duration, 1) if duration else None,
+            'latency': {kind: _latency_summary(values) for kind, values in self.latencies.items()},
+            'memory': {
+                'rss_start_kib': rss_start,
+                'rss_connected_kib': rss_connected,
+                'rss_end_kib': rss_peak,
+                'per_client_kib': round((rss_connected - rss_start) / clients, 1) if clients else None,
+            },
+            'errors': self.errors[:20],
+        }
+
+
+def run(conversations=100, clients_per_conversation=2, messages=10, typing=2, notifications=5,
+        layer='memory', redis_url=DEFAULT_REDIS_URL, interval=0.0, timeout=30.0, connect_batch=200,
+        trace_memory=False, keep=False):
+    """Run one load test (see the module docstring) and return the JSON-ready report."""
+    from asgiref.sync import async_to_sync
+
+    from config.asgi import get_websocket_application
+
+    rooms = create_fixtures(conversations, clients_per_conversation)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with override_settings(CHANNEL_LAYERS=channel_layer_settings(layer, redis_url)):
+            load = LoadRun(get_websocket_application(), rooms, messages, typing, notifications,
+                           interval, timeout, connect_batch)
+            report = async_to_sync(load.run)()
+        if trace_memory:
+            report['memory']['tracemalloc_peak_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        if not keep:
+            delete_fixtures()
+    return {
+        'layer': layer,
+        'conversations': conversations,
+        'clients_per_conversation': clients_per_conversation,
+        'messages_per_client': messages,
+        'typing_per_client': typing,
+        'notifications_per_user': notifications,
+        **report,
+    }
@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from messaging import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests ChatConsumer and NotificationConsumer with simulated WebSocket clients and '
+        'reports fan-out latency, throughput and memory as JSON (see messaging.loadtest).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=100)
+        parser.add_argument('--clients-per-conversation', type=int, default=2)
+        parser.add_argument('--messages', type=int, default=10, help='Chat messages sent by each client.')
+        parser.add_argument('--typing', type=int, default=2, help='Typing events sent by each client.')
+        parser.add_argument('--notifications', type=int, default=5,
+                            help='Notifications per user; 0 opens no notification sockets.')
+        parser.add_argument('--layer', choices=('memory', 'redis', 'redis-pubsub'), nargs='+', default=['memory'])
+        parser.add_argument('--redis-url', default=loadtest.DEFAULT_REDIS_URL)
+        parser.add_argument('--interval', type=float, default=0.0, help='Seconds between sends per client.')
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--connect-batch', type=int, default=200)
+        parser.add_argument('--tracemalloc', action='store_true', help='Also report traced allocations (slower).')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        reports = [
+            loadtest.run(
+                conversations=options['conversations'],
+                clients_per_conversation=options['clients_per_conversation'],
+                messages=options['messages'],
+                typing=options['typing'],
+                notifications=options['notifications'],
+                layer=layer,
+                redis_url=options['redis_url'],
+                interval=options['interval'],
+                timeout=options['timeout'],
+                connect_batch=options['connect_batch'],
+                trace_memory=options['tracemalloc'],
+            )
+            for layer in options['layer']
+        ]
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(reports, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+        else:
+            self.stdout.write(json.dumps(reports, indent=2))
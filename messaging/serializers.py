@@ -2,17 +2,48 @@ from rest_framework import serializers
 from .models import Conversation, Message, MessageAttachment, Notification
 from users.serializers import UserProfileSerializer
 from listings.serializers import TravelListingSerializer, PackageRequestSerializer
-from config.utils import upload_image
+from config.utils import upload_image, upload_images, image_variants, requested_image_sizes
+
+
+def attach_files(message, files):
+    """
+    Upload `files` concurrently and create an attachment for each one that
+    succeeded; the first upload error is raised afterwards.
+    """
+    if not files:
+        return []
+    # Content-addressed: the same file sent in several messages is stored once.
+    results = upload_images(files)
+    attachments = MessageAttachment.objects.bulk_create([
+        MessageAttachment(
+            message=message,
+            file_url=result.url,
+            file_name=file.name,
+            file_type=file.content_type
+        )
+        for file, result in zip(files, results) if result.ok
+    ])
+    for result in results:
+        if not result.ok:
+            raise result.error
+    return attachments
 
 
 class MessageAttachmentSerializer(serializers.ModelSerializer):
     file = serializers.FileField(write_only=True, required=False)
+    # {size: url} derivatives for image attachments; sizes chosen with ?image_sizes=
+    file_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = MessageAttachment
-        fields = ('id', 'file', 'file_name', 'file_url', 'file_type', 'created_at')
+        fields = ('id', 'file', 'file_name', 'file_url', 'file_urls', 'file_type', 'created_at')
         read_only_fields = ('file_name', 'file_url', 'file_type', 'created_at')
 
+    def get_file_urls(self, obj):
+        if not (obj.file_type or '').startswith('image/'):
+            return None
+        return image_variants(obj.file_url, requested_image_sizes(self.context.get('request')))
+
     def create(self, validated_data):
         file = validated_data.pop('file', None)
         # Set file_name and file_type automatically from the uploaded file
@@ -22,7 +53,7 @@ class MessageAttachmentSerializer(serializers.ModelSerializer):
         instance = MessageAttachment.objects.create(**validated_data)
 
         if file:
-            file_url = upload_image(file, public_id=f'message_attachments/{instance.message.id}/{file.name}')
+            file_url = upload_image(file)
             instance.file_url = file_url
             instance.save()
         return instance
@@ -35,7 +66,7 @@ class MessageAttachmentSerializer(serializers.ModelSerializer):
         if file:
             instance.file_name = file.name
             instance.file_type = getattr(file, 'content_type', '')
-            file_url = upload_image(file, public_id=f'message_attachments/{instance.message.id}/{file.name}')
+            file_url = upload_image(file)
             instance.file_url = file_url
 
         instance.save()
@@ -62,15 +93,7 @@ class MessageSerializer(serializers.ModelSerializer):
         message = Message.objects.create(**validated_data)
 
         # Handle file attachments
-        for file in uploaded_files:
-            file_url = upload_image(file, public_id=f'message_attachments/{message.id}/{file.name}')
-            MessageAttachment.objects.create(
-                message=message,
-                # file=file,
-                file_url=file_url,
-                file_name=file.name,
-                file_type=file.content_type
-            )
+        attach_files(message, uploaded_files)
 
         return message
 
@@ -80,16 +103,7 @@ class MessageSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
 
         # Handle file attachments
-        if uploaded_files:
-            for file in uploaded_files:
-                file_url = upload_image(file, public_id=f'message_attachments/{instance.id}/{file.name}')
-                MessageAttachment.objects.create(
-                    message=instance,
-                    # file=file,
-                    file_url=file_url,
-                    file_name=file.name,
-                    file_type=file.content_type
-                )
+        attach_files(instance, uploaded_files)
 
         instance.save()
         return instance
@@ -111,7 +125,7 @@ class ConversationSerializer(serializers.ModelSerializer):
     def get_last_message(self, obj):
         last_message = obj.messages.last()
         if last_message:
-            return MessageSerializer(last_message).data
+            return MessageSerializer(last_message, context=self.context).data
         return None
 
     def get_unread_count(self, obj):
@@ -1,3 +1,137 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import CustomUser
+
+from .consumers import ChatConsumer
+from .models import Conversation, Message, MessageAttachment
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerAccessTests(TransactionTestCase):
+    # TransactionTestCase: the consumer's database_sync_to_async calls close
+    # the connection, which TestCase's wrapping transaction does not survive.
+
+    def setUp(self):
+        self.member = CustomUser.objects.create_user(
+            username='member', email='member@example.com', phone_number='15550001001', password='x',
+        )
+        self.outsider = CustomUser.objects.create_user(
+            username='outsider', email='outsider@example.com', phone_number='15550001002', password='x',
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.member)
+
+    async def session(self, user, *frames):
+        """Connect as `user` (None: anonymous), send `frames`, return (connected, first reply)."""
+        from config.asgi import get_websocket_application
+
+        path = f'/ws/chat/{self.conversation.pk}/'
+        if user is not None:
+            path += f'?token={AccessToken.for_user(user)}'
+        communicator = WebsocketCommunicator(get_websocket_application(), path)
+        connected, _ = await communicator.connect()
+        reply = None
+        if connected and frames:
+            for frame in frames:
+                await communicator.send_to(text_data=json.dumps(frame))
+            reply = json.loads(await communicator.receive_from(timeout=5))
+        await communicator.disconnect()
+        return connected, reply
+
+    def test_anonymous_and_outsiders_are_refused(self):
+        for user in (None, self.outsider):
+            connected, _ = async_to_sync(self.session)(user)
+            self.assertFalse(connected)
+
+    def test_participant_can_chat(self):
+        connected, reply = async_to_sync(self.session)(self.member, {'type': 'message', 'content': 'hello'})
+        self.assertTrue(connected)
+        self.assertEqual(reply['type'], 'message')
+        self.assertEqual(reply['message']['content'], 'hello')
+        self.assertTrue(Message.objects.filter(conversation=self.conversation, sender=self.member).exists())
+
+    def test_attachments_are_uploaded(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        cache.clear()
+        image = io.BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(image, format='PNG')
+        attachment = {'name': 'dot.png', 'type': 'image/png', 'data': base64.b64encode(image.getvalue()).decode()}
+
+        frame = {'type': 'message', 'content': 'look', 'attachments': [attachment]}
+        with override_settings(MEDIA_ROOT=media_root, MEDIA_URL='/media/',
+                               IMAGE_STORAGE_BACKEND='config.storage.FileSystemStorage'):
+            connected, reply = async_to_sync(self.session)(self.member, frame)
+            # The same file in another message is stored once.
+            with mock.patch('config.storage.FileSystemStorage.upload') as upload:
+                _, again = async_to_sync(self.session)(self.member, frame)
+        self.assertTrue(connected)
+        self.assertEqual(reply['type'], 'message')
+        [sent] = reply['message']['attachments']
+        first, second = MessageAttachment.objects.order_by('pk')
+        self.assertEqual((sent['file_name'], sent['file_url']), ('dot.png', first.file_url))
+        self.assertTrue(first.file_url.startswith('/media/uploads/'))
+        with open(media_root + first.file_url[len('/media'):], 'rb') as fh:
+            self.assertEqual(fh.read(), image.getvalue())
+        upload.assert_not_called()
+        self.assertNotEqual(first.message_id, second.message_id)
+        self.assertEqual(again['message']['attachments'][0]['file_url'], first.file_url)
+        self.assertEqual(second.file_url, first.file_url)
+
+    def test_removed_participant_cannot_post(self):
+        conversation, member = self.conversation, self.member
+
+        @database_sync_to_async
+        def admit_then_remove(consumer):
+            # Admitted at connect, removed before the first message.
+            conversation.participants.remove(member)
+            return True
+
+        with mock.patch.object(ChatConsumer, 'is_participant', admit_then_remove), \
+                self.assertLogs('messaging.consumers', 'ERROR'):
+            connected, reply = async_to_sync(self.session)(self.member, {'type': 'message', 'content': 'late'})
+        self.assertTrue(connected)
+        self.assertEqual(reply, {'type': 'error', 'message': 'Could not process the message'})
+        self.assertFalse(Message.objects.exists())
+
+
+class WebSocketLoadTests(TransactionTestCase):
+    # Consumers reach the database through database_sync_to_async, which
+    # closes connections between calls; that needs real transactions.
+
+    def test_memory_layer_run_delivers_every_frame(self):
+        from messaging import loadtest
+        from messaging.models import Message
+
+        report = loadtest.run(conversations=3, clients_per_conversation=2, messages=2, typing=2,
+                              notifications=2, layer='memory', timeout=10, keep=True)
+        self.assertEqual(report['clients'], 12)
+        # 6 chat clients receive (2 messages + 2 typing) from each of 2 participants; 6 notification clients 2 each.
+        self.assertEqual(report['frames'], {'expected': 60, 'delivered': 60, 'lost': 0})
+        self.assertEqual(report['latency']['message']['count'], 24)
+        self.assertEqual(report['latency']['typing']['count'], 24)
+        self.assertEqual(report['latency']['notification']['count'], 12)
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(Message.objects.filter(sender__username__startswith=loadtest.PREFIX).count(), 12)
+
+        loadtest.delete_fixtures()
+        self.assertFalse(CustomUser.objects.filter(username__startswith=loadtest.PREFIX).exists())
+
+    def test_unknown_layer(self):
+        from messaging import loadtest
+
+        with self.assertRaises(ValueError):
+            loadtest.channel_layer_settings('kafka')
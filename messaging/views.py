@@ -75,10 +75,10 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
         page = self.paginate_queryset(messages)
         if page is not None:
-            serializer = MessageSerializer(page, many=True)
+            serializer = MessageSerializer(page, many=True, context={'request': request})
             return self.get_paginated_response(serializer.data)
 
-        serializer = MessageSerializer(messages, many=True)
+        serializer = MessageSerializer(messages, many=True, context={'request': request})
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
@@ -91,7 +91,7 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 conversation=conversation,
                 sender=request.user
             )
-            message_data = MessageSerializer(message).data
+            message_data = MessageSerializer(message, context={'request': request}).data
 
             # 🔔 Create a notification for every other participant in the conversation
             for participant in conversation.participants.exclude(id=request.user.id):
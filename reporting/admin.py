@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import EventLog
+from .models import EventLog, DailyEventAggregate
 
 admin.site.register(EventLog)
+admin.site.register(DailyEventAggregate)
 
 # Register your models here.
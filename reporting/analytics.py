@@ -0,0 +1,243 @@
+"""
+Cohort, retention and funnel analytics over users, listings and requests.
+
+Everything is bucketed by ISO week (Monday start) and computed with a handful
+of grouped queries. Weeks that can no longer change are stored in
+AnalyticsSnapshot and served from there on later calls:
+
+- a signup cohort is closed once RETENTION_WEEKS full weeks have passed;
+- a listing week's funnel is closed once FUNNEL_SETTLE_WEEKS have passed,
+  by which point its requests have been accepted/completed or abandoned.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DateField, Q
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from listings.models import TravelListing, PackageRequest
+from users.models import CustomUser
+from reporting.models import AnalyticsSnapshot
+
+RETENTION_WEEKS = 12
+FUNNEL_SETTLE_WEEKS = 8
+
+ACCEPTED_STATUSES = ['accepted', 'completed']
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def weeks_between(start, end):
+    """Monday dates of every week touching [start, end]."""
+    week = week_start(start)
+    weeks = []
+    while week <= end:
+        weeks.append(week)
+        week += timedelta(weeks=1)
+    return weeks
+
+
+def _day_bounds(start, end):
+    """Aware datetimes covering the days from `start` to `end` inclusive."""
+    tz = timezone.get_current_timezone()
+    lower = timezone.make_aware(datetime.combine(start, time.min), tz)
+    upper = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    return lower, upper
+
+
+def _bounds(start, end):
+    """Aware datetimes covering the whole weeks from `start` to `end`."""
+    return _day_bounds(week_start(start), week_start(end) + timedelta(days=6))
+
+
+def _week(field):
+    return TruncWeek(field, output_field=DateField())
+
+
+def _cached_weeks(metric, weeks, closed_before, compute):
+    """
+    Return {week: data} for `weeks`, reading closed weeks from AnalyticsSnapshot
+    and computing the rest with a single call to compute(first, last).
+    """
+    cached = {
+        snapshot.period_start: snapshot.data
+        for snapshot in AnalyticsSnapshot.objects.filter(metric=metric, period_start__in=weeks)
+    }
+    missing = [week for week in weeks if week not in cached]
+    if missing:
+        fresh = compute(missing[0], missing[-1])
+        AnalyticsSnapshot.objects.bulk_create(
+            [
+                AnalyticsSnapshot(metric=metric, period_start=week, data=fresh[week])
+                for week in missing if week < closed_before
+            ],
+            ignore_conflicts=True,
+        )
+        cached.update({week: fresh[week] for week in missing})
+    return cached
+
+
+def _compute_cohorts(first, last):
+    lower, upper = _bounds(first, last)
+    weeks = weeks_between(first, last)
+
+    signups = dict(
+        CustomUser.objects.filter(date_joined__gte=lower, date_joined__lt=upper)
+        .annotate(week=_week('date_joined'))
+        .values_list('week')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    # One UNION query: distinct (cohort week, active week, user) across listings
+    # and requests. UNION (not ALL) removes users active through both.
+    listing_activity = (
+        TravelListing.objects.filter(user__date_joined__gte=lower, user__date_joined__lt=upper)
+        .annotate(cohort=_week('user__date_joined'), week=_week('created_at'))
+        .values_list('cohort', 'week', 'user_id')
+        .order_by()
+    )
+    request_activity = (
+        PackageRequest.objects.filter(user__date_joined__gte=lower, user__date_joined__lt=upper)
+        .annotate(cohort=_week('user__date_joined'), week=_week('created_at'))
+        .values_list('cohort', 'week', 'user_id')
+        .order_by()
+    )
+    active = Counter()
+    for cohort, week, _user_id in listing_activity.union(request_activity).iterator():
+        offset = (week - cohort).days // 7
+        if 0 <= offset <= RETENTION_WEEKS:
+            active[(cohort, offset)] += 1
+
+    return {
+        week: {
+            'signups': signups.get(week, 0),
+            'retention': [active[(week, offset)] for offset in range(RETENTION_WEEKS + 1)],
+        }
+        for week in weeks
+    }
+
+
+def weekly_cohorts(start, end):
+    """
+    Weekly signup cohorts between `start` and `end` with the number of cohort
+    members who created a listing or request in each of the following weeks.
+    `retention[0]` is the signup week itself.
+    """
+    weeks = weeks_between(start, end)
+    closed_before = week_start(timezone.localdate()) - timedelta(weeks=RETENTION_WEEKS)
+    data = _cached_weeks('weekly_cohorts', weeks, closed_before, _compute_cohorts)
+    return [{'week': week, **data[week]} for week in weeks]
+
+
+def _request_counts():
+    return {
+        'requests': Count('id'),
+        'accepted': Count('id', filter=Q(status__in=ACCEPTED_STATUSES)),
+        'completed': Count('id', filter=Q(status='completed')),
+    }
+
+
+def _compute_funnel(first, last):
+    lower, upper = _bounds(first, last)
+    listings = dict(
+        TravelListing.objects.filter(created_at__gte=lower, created_at__lt=upper)
+        .annotate(week=_week('created_at'))
+        .values_list('week')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    requests = {
+        row.pop('week'): row
+        for row in PackageRequest.objects.filter(
+            travel_listing__created_at__gte=lower, travel_listing__created_at__lt=upper
+        )
+        .annotate(week=_week('travel_listing__created_at'))
+        .values('week')
+        .annotate(**_request_counts())
+        .order_by()
+    }
+    empty = {'requests': 0, 'accepted': 0, 'completed': 0}
+    return {
+        week: {'listings': listings.get(week, 0), **requests.get(week, empty)}
+        for week in weeks_between(first, last)
+    }
+
+
+def weekly_funnel(start, end):
+    """
+    listing -> request -> accepted -> completed counts per week of listing
+    creation. Requests are attributed to the week their listing was created.
+    """
+    weeks = weeks_between(start, end)
+    closed_before = week_start(timezone.localdate()) - timedelta(weeks=FUNNEL_SETTLE_WEEKS)
+    data = _cached_weeks('weekly_funnel', weeks, closed_before, _compute_funnel)
+    return [{'week': week, **data[week]} for week in weeks]
+
+
+ROUTE_FIELDS = ['pickup_location__country', 'pickup_location__name',
+                'destination_location__country', 'destination_location__name']
+
+
+def route_funnel(start, end, limit=50):
+    """
+    Funnel per pickup/destination route for listings created between `start`
+    and `end`, ordered by listing volume. Two grouped queries.
+    """
+    lower, upper = _day_bounds(start, end)
+    listings = (
+        TravelListing.objects.filter(created_at__gte=lower, created_at__lt=upper)
+        .values(*ROUTE_FIELDS)
+        .annotate(listings=Count('id'))
+        .order_by('-listings')[:limit]
+    )
+    routes = {tuple(row[f] for f in ROUTE_FIELDS): row for row in listings}
+    if not routes:
+        return []
+
+    request_fields = [f'travel_listing__{f}' for f in ROUTE_FIELDS]
+    requests = (
+        PackageRequest.objects.filter(
+            travel_listing__created_at__gte=lower, travel_listing__created_at__lt=upper
+        )
+        .values(*request_fields)
+        .annotate(**_request_counts())
+        .order_by()
+    )
+    for row in requests:
+        key = tuple(row[f] for f in request_fields)
+        if key in routes:
+            routes[key].update({name: row[name] for name in _request_counts()})
+
+    result = []
+    for (pickup_country, pickup, destination_country, destination), row in routes.items():
+        result.append({
+            'pickup': pickup,
+            'pickup_country': pickup_country,
+            'destination': destination,
+            'destination_country': destination_country,
+            'listings': row['listings'],
+            'requests': row.get('requests', 0),
+            'accepted': row.get('accepted', 0),
+            'completed': row.get('completed', 0),
+        })
+    return result
+
+
+def creators_and_senders(start=None, end=None):
+    """
+    Distinct trip creators and package senders, counted straight off the
+    listing/request tables instead of joining back through the user table.
+    """
+    listings = TravelListing.objects.all()
+    requests = PackageRequest.objects.all()
+    if start and end:
+        lower, upper = _day_bounds(start, end)
+        listings = listings.filter(created_at__gte=lower, created_at__lt=upper)
+        requests = requests.filter(created_at__gte=lower, created_at__lt=upper)
+    creators = listings.aggregate(n=Count('user', distinct=True))['n']
+    senders = requests.aggregate(n=Count('user', distinct=True))['n']
+    return creators, senders
@@ -0,0 +1,90 @@
+"""
+Pure-Python HyperLogLog for approximate distinct-user counts.
+
+A sketch is 2**p one-byte registers (p=12 by default, i.e. 4 KiB) and is
+serialised as raw bytes so it can live in a BinaryField (bytea on PostgreSQL).
+Sketches with the same precision merge by taking the register-wise maximum,
+so any window of days can be answered by merging the per-day sketches.
+
+Error bounds: the relative standard error is about 1.04 / sqrt(2**p). With
+p=12 that is ~1.6%, so roughly 95% of estimates fall within +/-3.3% of the true
+count and 99.7% within +/-4.9%. Small cardinalities (below 2.5 * 2**p) use
+linear counting and are close to exact.
+"""
+import hashlib
+import math
+
+DEFAULT_PRECISION = 12
+
+
+def _hash64(value):
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            registers = bytearray(self.size)
+        elif len(registers) != self.size:
+            raise ValueError(f'expected {self.size} registers, got {len(registers)}')
+        self.registers = bytearray(registers)
+
+    @classmethod
+    def position(cls, value, precision=DEFAULT_PRECISION):
+        """Return the (register index, rank) that `value` maps to."""
+        x = _hash64(value)
+        width = 64 - precision
+        index = x >> width
+        remainder = x & ((1 << width) - 1)
+        rank = width - remainder.bit_length() + 1
+        return index, rank
+
+    def add(self, value):
+        """Add a value; returns True when a register changed."""
+        index, rank = self.position(value, self.precision)
+        if self.registers[index] >= rank:
+            return False
+        self.registers[index] = rank
+        return True
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('cannot merge sketches with different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        precision = len(data).bit_length() - 1
+        if 1 << precision != len(data):
+            raise ValueError('sketch length must be a power of two')
+        return cls(precision=precision, registers=data)
+
+    @classmethod
+    def merged(cls, sketches, precision=DEFAULT_PRECISION):
+        """Merge an iterable of serialised sketches into a new HyperLogLog."""
+        result = cls(precision=precision)
+        for data in sketches:
+            result.merge(cls.from_bytes(data))
+        return result
@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config import httpload
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts `serve` with each worker count, drives it with keep-alive HTTP load (a seeded '
+        'run_benchmarks scenario or a plain path) and reports throughput and latency per count as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', help='Default: 1, 2, 4, ... up to the usable CPUs.')
+        parser.add_argument('--scenario', default='feed_search', help='A run_benchmarks scenario.')
+        parser.add_argument('--path', help='Request this unauthenticated path instead of a scenario.')
+        parser.add_argument('--concurrency', type=int, default=64, help='Open keep-alive connections.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds per worker count.')
+        parser.add_argument('--warmup', type=float, default=2.0)
+        parser.add_argument('--processes', type=int, default=1, help='Load generator processes.')
+        parser.add_argument('--sync-threads', type=int, help='Override SYNC_VIEW_THREADS for the server.')
+        parser.add_argument('--port', type=int, default=httpload.DEFAULT_PORT)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            report = httpload.scaling(
+                workers=options['workers'], scenario=options['scenario'], path=options['path'],
+                concurrency=options['concurrency'], duration=options['duration'], warmup=options['warmup'],
+                processes=options['processes'], sync_threads=options['sync_threads'], port=options['port'],
+            )
+        except (LookupError, RuntimeError) as exc:
+            raise CommandError(str(exc))
+
+        for run in report['runs']:
+            self.stdout.write(
+                f'{run["workers"]:>3} worker(s): {run["rps"]:>9.1f} req/s  x{run["speedup"]}  '
+                f'p50 {run["p50_ms"]} ms  p95 {run["p95_ms"]} ms  errors {run["errors"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
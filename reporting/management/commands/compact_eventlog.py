@@ -0,0 +1,77 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from reporting import partitions
+from reporting.models import DailyEventAggregate, EventLog
+
+
+class Command(BaseCommand):
+    help = (
+        'Rolls EventLog rows older than the retention window into DailyEventAggregate, '
+        'removes the raw rows and pre-creates upcoming monthly partitions (PostgreSQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int, default=settings.EVENTLOG_RETENTION_DAYS,
+            help='Keep raw events for this many days (default: EVENTLOG_RETENTION_DAYS).',
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='Number of future monthly partitions to keep ready.',
+        )
+
+    def handle(self, *args, **options):
+        retention_days = options['retention_days']
+        cutoff_day = timezone.localdate() - timedelta(days=retention_days)
+        cutoff = timezone.make_aware(datetime.combine(cutoff_day, time.min))
+
+        created = partitions.ensure_partitions(timezone.now(), months_ahead=options['months_ahead'])
+        if created:
+            self.stdout.write(f'Ensured partitions: {", ".join(created)}')
+
+        with transaction.atomic():
+            rolled_up = self.roll_up(cutoff)
+            # Whole months before the cutoff can be dropped outright; whatever is
+            # left (partial month, DEFAULT partition, or SQLite) is deleted row-wise.
+            dropped = partitions.drop_partitions_before(cutoff_day)
+            deleted, _ = EventLog.objects.filter(timestamp__lt=cutoff).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted events before {cutoff_day}: {rolled_up} daily aggregates written, '
+            f'{len(dropped)} partitions dropped, {deleted} rows deleted'
+        ))
+
+    def roll_up(self, cutoff):
+        """
+        Aggregate raw events older than `cutoff` per (day, event_type, trip) and
+        add them to the stored daily aggregates.
+        """
+        rows = (
+            EventLog.objects.filter(timestamp__lt=cutoff)
+            .annotate(day=TruncDate('timestamp'))
+            .values('day', 'event_type', 'trip')
+            .annotate(event_count=Count('id'), user_count=Count('user', distinct=True))
+            .order_by()
+        )
+        written = 0
+        for row in rows.iterator(chunk_size=2000):
+            updated = DailyEventAggregate.objects.filter(
+                day=row['day'], event_type=row['event_type'], trip_id=row['trip'],
+            ).update(
+                event_count=F('event_count') + row['event_count'],
+                user_count=F('user_count') + row['user_count'],
+            )
+            if not updated:
+                DailyEventAggregate.objects.create(
+                    day=row['day'], event_type=row['event_type'], trip_id=row['trip'],
+                    event_count=row['event_count'], user_count=row['user_count'],
+                )
+            written += 1
+        return written
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reporting.sketches import rebuild_sketches
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-day HyperLogLog activity sketches from raw EventLog rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on or after this date (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since must be in YYYY-MM-DD format')
+        count = rebuild_sketches(since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} activity sketches'))
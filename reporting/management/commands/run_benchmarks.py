@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives the hot API endpoints through the DRF test client against the data from '
+        'seed_benchmark_data and reports p50/p95 latency, query counts and allocations as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='+', metavar='SCENARIO', help='Run only these scenarios.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--compare', metavar='BASELINE', help='Print changes against an earlier JSON report.')
+
+    def handle(self, *args, **options):
+        try:
+            report = benchmark.run(options['iterations'], options['warmup'], options['only'])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+        elif not options['compare']:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            self.stdout.write(f'{baseline.get("revision")} -> {report["revision"]}')
+            for name, metric, before, after, change in benchmark.compare(baseline, report):
+                delta = f'{change:+.1f}%' if change is not None else 'n/a'
+                self.stdout.write(f'{name:>20} {metric:>15}: {before:>10} -> {after:>10} ({delta})')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds deterministic synthetic users, listings, package requests, conversations, '
+        'messages and alerts for run_benchmarks (see config.benchmark).'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.DEFAULT_COUNTS.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same data set.')
+        parser.add_argument('--flush', action='store_true', help='Delete an existing benchmark data set first.')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            self.stdout.write(f'Deleted {benchmark.flush()} rows')
+        elif benchmark.User.objects.filter(username__startswith=benchmark.PREFIX).exists():
+            raise CommandError('Benchmark data already exists; pass --flush to recreate it.')
+
+        counts = benchmark.seed({name: options[name] for name in benchmark.DEFAULT_COUNTS}, seed=options['seed'])
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded ' + ', '.join(f'{count} {name}' for name, count in counts.items())
+        ))
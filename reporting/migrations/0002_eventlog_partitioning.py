@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def partition_eventlog(apps, schema_editor):
+    # PostgreSQL only; other backends keep the plain table.
+    from reporting.partitions import partition_eventlog
+    partition_eventlog(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_remove_travellisting_mode_of_transport'),
+        ('reporting', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_eventlog, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='DailyEventAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('event_type', models.CharField(choices=[('order_click', 'Order Click'), ('message_click', 'Message Click')], max_length=20)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('user_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='eventlog',
+            index=models.Index(fields=['timestamp', 'user'], name='reporting_evt_ts_user_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyeventaggregate',
+            name='trip',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_event_aggregates', to='listings.travellisting'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyeventaggregate',
+            unique_together={('day', 'event_type', 'trip')},
+        ),
+    ]
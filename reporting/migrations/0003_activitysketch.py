@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporting', '0002_eventlog_partitioning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivitySketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('event_type', models.CharField(choices=[('order_click', 'Order Click'), ('message_click', 'Message Click')], max_length=20)),
+                ('sketch', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-day'],
+                'unique_together': {('day', 'event_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    # Sketches are only written for new events; without this DAU/WAU/MAU
+    # would read 0 for the history still in EventLog.
+    from reporting.sketches import rebuild_sketches
+    rebuild_sketches(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporting', '0004_analyticssnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
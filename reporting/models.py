@@ -5,6 +5,10 @@ from listings.models import TravelListing
 # Create your models here.
 
 class EventLog(models.Model):
+    """
+    Raw click events. On PostgreSQL the table is range-partitioned by month on
+    `timestamp` (see reporting.partitions); on other backends it is a plain table.
+    """
     EVENT_TYPE_CHOICES = [
         ("order_click", "Order Click"),
         ("message_click", "Message Click"),
@@ -14,5 +18,68 @@ class EventLog(models.Model):
     trip = models.ForeignKey(TravelListing, on_delete=models.CASCADE, related_name="event_logs")
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'user'], name='reporting_evt_ts_user_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.event_type} - {self.trip.id} at {self.timestamp}"
+
+
+class DailyEventAggregate(models.Model):
+    """
+    Per-day roll-up of EventLog rows that have aged past the retention window.
+    Written by the `compact_eventlog` management command.
+    """
+    day = models.DateField()
+    event_type = models.CharField(max_length=20, choices=EventLog.EVENT_TYPE_CHOICES)
+    trip = models.ForeignKey(TravelListing, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name="daily_event_aggregates")
+    event_count = models.PositiveIntegerField(default=0)
+    user_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'event_type', 'trip')
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day} - {self.event_type} - trip {self.trip_id}: {self.event_count}"
+
+
+class ActivitySketch(models.Model):
+    """
+    Per-day HyperLogLog sketch of the distinct users who logged a given event
+    type (see reporting.hll). Updated from buffered EventLog ingestion (see
+    reporting.sketches); windows of any length are answered by merging the
+    daily sketches.
+    """
+    day = models.DateField()
+    event_type = models.CharField(max_length=20, choices=EventLog.EVENT_TYPE_CHOICES)
+    sketch = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('day', 'event_type')
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day} - {self.event_type} sketch"
+
+
+class AnalyticsSnapshot(models.Model):
+    """
+    Cached result for one closed period of a reporting.analytics metric
+    (e.g. a signup cohort whose retention window has fully elapsed).
+    """
+    metric = models.CharField(max_length=50)
+    period_start = models.DateField()
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('metric', 'period_start')
+        ordering = ['metric', '-period_start']
+
+    def __str__(self):
+        return f"{self.metric} - {self.period_start}"
@@ -0,0 +1,180 @@
+"""
+Monthly range partitioning for the EventLog table.
+
+Only PostgreSQL supports declarative partitioning; every helper here is a
+no-op on other backends (e.g. SQLite in tests), where EventLog stays a plain
+table and retention falls back to ordinary DELETEs.
+"""
+from datetime import date, datetime, time
+import logging
+
+from django.db import connection as default_connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EVENTLOG_TABLE = 'reporting_eventlog'
+DEFAULT_PARTITION = f'{EVENTLOG_TABLE}_default'
+
+
+def month_start(value):
+    """Return the first day of the month containing `value`."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    month_index = value.month - 1 + months
+    return date(value.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{EVENTLOG_TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def supports_partitioning(connection=None):
+    connection = connection or default_connection
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned(connection=None):
+    connection = connection or default_connection
+    if not supports_partitioning(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [EVENTLOG_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection=None):
+    """
+    Return [(name, lower_bound, upper_bound)] for the monthly partitions,
+    ordered by lower bound. The DEFAULT partition is not included.
+    """
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND c.relname <> %s",
+            [EVENTLOG_TABLE, DEFAULT_PARTITION],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        try:
+            year, month = int(name[-7:-3]), int(name[-2:])
+        except ValueError:
+            continue
+        lower = date(year, month, 1)
+        partitions.append((name, lower, add_months(lower, 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_month_partition(month, connection=None):
+    """Create the partition holding `month` if it does not exist yet."""
+    connection = connection or default_connection
+    month = month_start(month)
+    name = partition_name(month)
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(EVENTLOG_TABLE)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [_aware(month), _aware(add_months(month, 1))],
+        )
+    return name
+
+
+def ensure_partitions(start, months_ahead=3, connection=None):
+    """
+    Make sure a partition exists for every month from `start` up to
+    `months_ahead` months past the current one. Returns the names touched.
+    """
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    month = month_start(start)
+    last = add_months(month_start(timezone.localdate()), months_ahead)
+    created = []
+    while month <= last:
+        created.append(create_month_partition(month, connection))
+        month = add_months(month, 1)
+    return created
+
+
+def drop_partitions_before(cutoff, connection=None):
+    """
+    Drop monthly partitions whose whole range lies before `cutoff` (a date).
+    Rows must already have been rolled up by the caller.
+    """
+    connection = connection or default_connection
+    qn = connection.ops.quote_name
+    dropped = []
+    for name, _lower, upper in list_partitions(connection):
+        if upper > cutoff:
+            break
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {qn(name)}")
+        logger.info("Dropped EventLog partition %s", name)
+        dropped.append(name)
+    return dropped
+
+
+def partition_eventlog(connection=None):
+    """
+    Convert the existing unpartitioned EventLog table into a table partitioned
+    by month on `timestamp`, copying existing rows across.
+
+    PostgreSQL requires the partition key to be part of the primary key, so the
+    physical key becomes (id, timestamp); `id` stays unique through its identity
+    sequence, which is all the ORM relies on.
+    """
+    connection = connection or default_connection
+    if not supports_partitioning(connection) or is_partitioned(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(timestamp) FROM {EVENTLOG_TABLE}")
+        oldest = cursor.fetchone()[0]
+        cursor.execute(f"ALTER TABLE {EVENTLOG_TABLE} RENAME TO {EVENTLOG_TABLE}_legacy")
+        cursor.execute(f"""
+            CREATE TABLE {EVENTLOG_TABLE} (
+                id bigint GENERATED BY DEFAULT AS IDENTITY,
+                event_type varchar(20) NOT NULL,
+                timestamp timestamp with time zone NOT NULL,
+                trip_id bigint NOT NULL REFERENCES listings_travellisting (id) DEFERRABLE INITIALLY DEFERRED,
+                user_id bigint NOT NULL REFERENCES users_customuser (id) DEFERRABLE INITIALLY DEFERRED,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """)
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {EVENTLOG_TABLE} DEFAULT")
+        cursor.execute(f"CREATE INDEX {EVENTLOG_TABLE}_trip_id_idx ON {EVENTLOG_TABLE} (trip_id)")
+        cursor.execute(f"CREATE INDEX {EVENTLOG_TABLE}_user_id_idx ON {EVENTLOG_TABLE} (user_id)")
+
+    ensure_partitions(oldest or timezone.now(), connection=connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {EVENTLOG_TABLE} (id, event_type, timestamp, trip_id, user_id)
+            OVERRIDING SYSTEM VALUE
+            SELECT id, event_type, timestamp, trip_id, user_id FROM {EVENTLOG_TABLE}_legacy
+        """)
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM {EVENTLOG_TABLE}",
+            [EVENTLOG_TABLE],
+        )
+        cursor.execute(f"DROP TABLE {EVENTLOG_TABLE}_legacy")
+        # Fire the deferred FK checks now so later DDL in the same migration
+        # (e.g. CREATE INDEX) does not trip over pending trigger events.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import EventLog
+from .sketches import dispatch, record_activity
+
+
+@receiver(post_save, sender=EventLog)
+def update_activity_sketch(sender, instance, created, **kwargs):
+    if not created:
+        return
+    user_id, event_type, day = instance.user_id, instance.event_type, timezone.localdate(instance.timestamp)
+
+    def buffer():
+        # Only events that were actually committed are counted.
+        record_activity(user_id, event_type, day)
+        if getattr(settings, 'ACTIVITY_SKETCH_FLUSH_ON_COMMIT', True):
+            dispatch()
+
+    transaction.on_commit(buffer)
@@ -0,0 +1,143 @@
+"""
+Read/write helpers for the per-day ActivitySketch rows.
+
+Ingestion does not touch the sketch rows: `record_activity()` adds the user to
+an in-process sketch per (day, event type), and `flush_activity()` merges those
+into the database, locking each row once per flush instead of once per event.
+With ACTIVITY_SKETCH_FLUSH_ON_COMMIT the web process flushes on a background
+thread after the transaction that logged the events commits; concurrent
+commits coalesce into one flush. Updates still buffered when a process dies
+are lost; `rebuild_activity_sketches` recomputes them from EventLog.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models.functions import TruncDate
+
+from .hll import HyperLogLog
+from .models import ActivitySketch, EventLog
+
+logger = logging.getLogger(__name__)
+
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def record_activity(user_id, event_type, day):
+    """Buffer `user_id` for the (day, event_type) sketch until the next flush."""
+    with _pending_lock:
+        _pending.setdefault((day, event_type), HyperLogLog()).add(user_id)
+
+
+def flush_activity():
+    """
+    Merge the buffered sketches into their ActivitySketch rows. A row is only
+    rewritten when a register actually rises. Returns the number of rows
+    written; on a database error the unwritten updates are buffered again.
+    """
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+    written = 0
+    try:
+        while pending:
+            (day, event_type), hll = next(iter(pending.items()))
+            with transaction.atomic():
+                row, created = ActivitySketch.objects.select_for_update().get_or_create(
+                    day=day, event_type=event_type,
+                    defaults={'sketch': hll.to_bytes()},
+                )
+                merged = HyperLogLog.from_bytes(row.sketch).merge(hll).to_bytes()
+                changed = created or merged != bytes(row.sketch)
+                if changed and not created:
+                    row.sketch = merged
+                    row.save(update_fields=['sketch', 'updated_at'])
+            del pending[(day, event_type)]
+            written += changed
+    finally:
+        if pending:
+            with _pending_lock:
+                for key, hll in pending.items():
+                    _pending.setdefault(key, HyperLogLog()).merge(hll)
+    return written
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='activity-sketch')
+_scheduled = threading.Event()
+
+
+def _drain():
+    _scheduled.clear()
+    try:
+        flush_activity()
+    except Exception:
+        # Metrics must never block the action that produced the event; the
+        # updates stay buffered for the next flush.
+        logger.warning("Could not flush activity sketches", exc_info=True)
+    finally:
+        connections.close_all()
+
+
+def dispatch():
+    """
+    Flush on a background thread of this process. Calls made while a flush is
+    already queued are coalesced.
+    """
+    if _scheduled.is_set():
+        return
+    _scheduled.set()
+    _executor.submit(_drain)
+
+
+def unique_users(start_day=None, end_day=None, event_types=None):
+    """
+    Approximate number of distinct users with activity between `start_day` and
+    `end_day` (inclusive, open-ended when omitted), optionally limited to some
+    event types.
+    """
+    qs = ActivitySketch.objects.all()
+    if start_day:
+        qs = qs.filter(day__gte=start_day)
+    if end_day:
+        qs = qs.filter(day__lte=end_day)
+    if event_types:
+        qs = qs.filter(event_type__in=event_types)
+    return HyperLogLog.merged(qs.values_list('sketch', flat=True).iterator()).count()
+
+
+def rolling_unique_users(today, days, event_types=None):
+    """Distinct users over `today` and the `days` days before it."""
+    return unique_users(today - timedelta(days=days), today, event_types)
+
+
+def rebuild_sketches(since=None, apps=None):
+    """
+    Recompute sketches from the raw EventLog rows still on disk. Days that have
+    already been compacted away keep their existing sketch. Migrations pass
+    their `apps` registry to use the historical models.
+    """
+    event_log = apps.get_model('reporting', 'EventLog') if apps else EventLog
+    activity_sketch = apps.get_model('reporting', 'ActivitySketch') if apps else ActivitySketch
+    qs = event_log.objects.all()
+    if since:
+        qs = qs.filter(timestamp__date__gte=since)
+    rows = (
+        qs.annotate(day=TruncDate('timestamp'))
+        .values_list('day', 'event_type', 'user')
+        .distinct()
+        .order_by()
+    )
+    sketches = {}
+    for day, event_type, user_id in rows.iterator(chunk_size=5000):
+        sketches.setdefault((day, event_type), HyperLogLog()).add(user_id)
+
+    with transaction.atomic():
+        for (day, event_type), hll in sketches.items():
+            activity_sketch.objects.update_or_create(
+                day=day, event_type=event_type,
+                defaults={'sketch': hll.to_bytes()},
+            )
+    return len(sketches)
@@ -1,3 +1,351 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from listings.models import PackageRequest, TravelListing
+from users.models import CustomUser
+
+from . import analytics, exports, partitions, sketches
+from .hll import HyperLogLog
+from .models import ActivitySketch, AnalyticsSnapshot, DailyEventAggregate, EventLog
+
+
+def make_user(n):
+    return CustomUser.objects.create_user(
+        username=f'user{n}', email=f'user{n}@example.com', phone_number=f'1555000{n:04d}', password='x',
+    )
+
+
+def make_trip(user):
+    return TravelListing.objects.create(
+        user=user, travel_date=datetime.date(2026, 11, 1), travel_time=datetime.time(9),
+        maximum_weight_in_kg=Decimal('20'), price_per_kg=Decimal('10'),
+    )
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def test_estimate_within_error_bounds(self):
+        # p=12 gives ~1.6% standard error; allow 3 sigma.
+        for true_count in (100, 5000, 100000):
+            hll = HyperLogLog()
+            for user_id in range(true_count):
+                hll.add(user_id)
+            error = abs(hll.count() - true_count) / true_count
+            self.assertLess(error, 0.049, f"{true_count}: estimated {hll.count()}")
+
+    def test_merge_matches_union(self):
+        a, b, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for user_id in range(0, 30000):
+            a.add(user_id)
+            union.add(user_id)
+        for user_id in range(20000, 50000):
+            b.add(user_id)
+            union.add(user_id)
+        merged = HyperLogLog.merged([a.to_bytes(), b.to_bytes()])
+        self.assertEqual(merged.to_bytes(), union.to_bytes())
+        self.assertLess(abs(merged.count() - 50000) / 50000, 0.049)
+
+    def test_serialisation_round_trip(self):
+        hll = HyperLogLog()
+        hll.add('user-1')
+        self.assertEqual(len(hll.to_bytes()), 4096)
+        self.assertEqual(HyperLogLog.from_bytes(hll.to_bytes()).registers, hll.registers)
+
+
+@override_settings(ACTIVITY_SKETCH_FLUSH_ON_COMMIT=False)
+class ActivitySketchTests(TestCase):
+    def setUp(self):
+        sketches._pending.clear()
+        self.addCleanup(sketches._pending.clear)
+        self.users = [make_user(n) for n in range(3)]
+        self.trip = make_trip(self.users[0])
+
+    def log(self, user, event_type='order_click'):
+        with self.captureOnCommitCallbacks(execute=True):
+            EventLog.objects.create(user=user, trip=self.trip, event_type=event_type)
+
+    def test_events_are_buffered_and_merged_once_per_row(self):
+        for user in self.users:
+            self.log(user)
+            self.log(user)
+        self.log(self.users[0], 'message_click')
+        self.assertFalse(ActivitySketch.objects.exists())
+
+        self.assertEqual(sketches.flush_activity(), 2)
+        today = timezone.localdate()
+        self.assertEqual(sketches.unique_users(today, today, ['order_click']), 3)
+        self.assertEqual(sketches.unique_users(today, today), 3)
+
+        # Users already in the sketch do not rewrite the row.
+        self.log(self.users[1])
+        self.assertEqual(sketches.flush_activity(), 0)
+        self.log(make_user(3))
+        self.assertEqual(sketches.flush_activity(), 1)
+        self.assertEqual(sketches.unique_users(today, today, ['order_click']), 4)
+
+    def test_rolled_back_events_are_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            EventLog.objects.create(user=self.users[0], trip=self.trip, event_type='order_click')
+        self.assertEqual(len(callbacks), 1)  # never run: the transaction did not commit
+        self.assertEqual(sketches.flush_activity(), 0)
+        self.assertFalse(ActivitySketch.objects.exists())
+
+    def test_failed_flush_keeps_updates_buffered(self):
+        self.log(self.users[0])
+        with mock.patch.object(ActivitySketch.objects, 'select_for_update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                sketches.flush_activity()
+        self.assertEqual(sketches.flush_activity(), 1)
+        self.assertTrue(ActivitySketch.objects.exists())
+
+    def test_rebuild_recomputes_from_eventlog(self):
+        for user in self.users:
+            EventLog.objects.create(user=user, trip=self.trip, event_type='order_click')
+        sketches._pending.clear()
+        self.assertEqual(sketches.rebuild_sketches(), 1)
+        today = timezone.localdate()
+        self.assertEqual(sketches.unique_users(today, today), 3)
+
+
+class BenchmarkSuiteTests(TestCase):
+    COUNTS = {'users': 12, 'listings': 20, 'requests': 30, 'conversations': 8, 'messages': 40, 'alerts': 5}
+
+    def test_seed_is_deterministic(self):
+        from config import benchmark
+        from listings.models import TravelListing
+
+        def snapshot():
+            return list(
+                TravelListing.objects.filter(user__username__startswith=benchmark.PREFIX)
+                .order_by('pk').values_list('user__username', 'status', 'travel_date', 'price_per_kg')
+            )
+
+        counts = benchmark.seed(self.COUNTS, seed=7)
+        self.assertEqual(counts['users'], 12)
+        self.assertEqual(counts['listings'], 20)
+        first = snapshot()
+        benchmark.flush()
+        self.assertFalse(CustomUser.objects.filter(username__startswith=benchmark.PREFIX).exists())
+        benchmark.seed(self.COUNTS, seed=7)
+        self.assertEqual(snapshot(), first)
+
+    def test_run_reports_every_scenario(self):
+        from config import benchmark
+
+        with self.assertRaises(LookupError):
+            benchmark.run(iterations=1, warmup=0)
+        benchmark.seed(self.COUNTS)
+        report = benchmark.run(iterations=3, warmup=0)
+        self.assertEqual(
+            set(report['scenarios']),
+            {'feed_search', 'my_listings', 'conversation_inbox', 'messages', 'unread_count', 'dashboard_data'},
+        )
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['status'], 200, name)
+            self.assertGreater(result['queries'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'], name)
+            self.assertGreater(result['alloc_peak_kib'], 0, name)
+        json.dumps(report)
+
+        rows = benchmark.compare(report, report)
+        self.assertEqual(len(rows), 6 * len(benchmark.COMPARED))
+        self.assertTrue(all(change in (0, None) for *_, change in rows))
+
+
+class EventLogRetentionTests(TestCase):
+    def setUp(self):
+        self.users = [make_user(n) for n in range(2)]
+        self.trip = make_trip(self.users[0])
+
+    def log(self, user, days_ago, event_type='order_click'):
+        event = EventLog.objects.create(user=user, trip=self.trip, event_type=event_type)
+        EventLog.objects.filter(pk=event.pk).update(timestamp=timezone.now() - datetime.timedelta(days=days_ago))
+
+    def test_table_is_partitioned_by_month(self):
+        if not partitions.supports_partitioning():
+            self.skipTest('EventLog is only partitioned on PostgreSQL')
+        self.assertTrue(partitions.is_partitioned())
+        this_month = partitions.month_start(timezone.localdate())
+        names = [name for name, _, _ in partitions.list_partitions()]
+        self.assertIn(partitions.partition_name(this_month), names)
+
+        old = partitions.add_months(this_month, -14)
+        self.assertEqual(partitions.create_month_partition(old), partitions.partition_name(old))
+        self.assertIn((partitions.partition_name(old), old, partitions.add_months(old, 1)),
+                      partitions.list_partitions())
+        # Idempotent.
+        partitions.create_month_partition(old)
+
+    def test_compaction_rolls_up_old_events(self):
+        for user, days_ago in ((self.users[0], 400), (self.users[0], 400), (self.users[1], 400),
+                               (self.users[1], 200), (self.users[0], 1)):
+            self.log(user, days_ago)
+
+        out = io.StringIO()
+        call_command('compact_eventlog', retention_days=90, stdout=out)
+        self.assertIn('Compacted events', out.getvalue())
+        self.assertEqual(
+            set(DailyEventAggregate.objects.filter(trip=self.trip, event_type='order_click')
+                .values_list('event_count', 'user_count')),
+            {(3, 2), (1, 1)},
+        )
+        self.assertEqual(EventLog.objects.count(), 1)
+
+        # Compacted rows are gone, so a second run adds nothing.
+        call_command('compact_eventlog', retention_days=90, stdout=io.StringIO())
+        self.assertEqual(
+            sum(DailyEventAggregate.objects.values_list('event_count', flat=True)), 4,
+        )
+
+    def test_compaction_drops_whole_expired_partitions(self):
+        if not partitions.supports_partitioning():
+            self.skipTest('EventLog is only partitioned on PostgreSQL')
+        old = partitions.add_months(timezone.localdate(), -14)
+        partitions.create_month_partition(old)
+        self.log(self.users[0], (timezone.localdate() - old).days - 1)
+        # In production the events were committed long before; here they share
+        # the test's transaction, and a table with pending FK checks cannot be dropped.
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        with self.assertLogs('reporting.partitions', 'INFO') as logs:
+            call_command('compact_eventlog', retention_days=90, stdout=io.StringIO())
+        self.assertIn(partitions.partition_name(old), '\n'.join(logs.output))
+        cutoff = timezone.localdate() - datetime.timedelta(days=90)
+        self.assertTrue(all(upper > cutoff for _, _, upper in partitions.list_partitions()))
+        self.assertEqual(DailyEventAggregate.objects.get().event_count, 1)
+        self.assertFalse(EventLog.objects.exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(
+            username='admin', email='admin@example.com', phone_number='15550009999', password='x',
+        )
+        self.user = make_user(1)
+        self.trips = [make_trip(self.user) for _ in range(5)]
+
+    def url(self, dataset, output=None):
+        url = reverse('admin-metrics-export', kwargs={'dataset': dataset})
+        return f'{url}?output={output}' if output else url
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+    def test_csv_streams_every_row(self):
+        response = self.client.get(self.url('trips'), **self.auth(self.admin))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="trips.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], exports.DATASETS['trips'][0])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [trip.pk for trip in self.trips])
+
+    def test_ndjson(self):
+        response = self.client.get(self.url('trips', 'ndjson'), **self.auth(self.admin))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['id'] for record in records], [trip.pk for trip in self.trips])
+        self.assertEqual(records[0]['travel_date'], '2026-11-01')
+        self.assertEqual(records[0]['price_per_kg'], '10.00')
+
+    def test_rejects_unknown_exports_and_non_admins(self):
+        admin, user = self.auth(self.admin), self.auth(self.user)
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get(self.url('passwords'), **admin).status_code, 400)
+            self.assertEqual(self.client.get(self.url('trips', 'xml'), **admin).status_code, 400)
+            self.assertEqual(self.client.get(self.url('trips'), **user).status_code, 403)
+
+    async def test_asgi_response_is_sent_in_batches(self):
+        with mock.patch.object(exports, 'CHUNK_SIZE', 2):
+            response = await self.async_client.get(
+                self.url('trips'), headers={'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'},
+            )
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        # Header and five rows, two lines per batch.
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(b''.join(chunks).decode().splitlines()), 6)
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        # A week old enough to be closed for both metrics, and the current one.
+        self.closed = analytics.week_start(timezone.localdate()) - datetime.timedelta(weeks=20)
+        self.current = analytics.week_start(timezone.localdate())
+        self.a, self.b, self.c = [make_user(n) for n in range(3)]
+        for user in (self.a, self.b, self.c):
+            self.backdate(user, 'date_joined', self.closed, 1)
+
+    def at(self, week, weekday):
+        return timezone.make_aware(datetime.datetime.combine(week + datetime.timedelta(days=weekday),
+                                                             datetime.time(12)))
+
+    def backdate(self, obj, field, week, weekday=0):
+        type(obj).objects.filter(pk=obj.pk).update(**{field: self.at(week, weekday)})
+
+    def trip(self, user, week):
+        trip = make_trip(user)
+        self.backdate(trip, 'created_at', week)
+        return trip
+
+    def request(self, user, trip, week, status='pending'):
+        request = PackageRequest.objects.create(user=user, travel_listing=trip, status=status)
+        self.backdate(request, 'created_at', week)
+        return request
+
+    def test_cohort_retention_counts_each_user_once_per_week(self):
+        week = datetime.timedelta(weeks=1)
+        trip = self.trip(self.a, self.closed)          # a: week 0
+        self.request(self.a, trip, self.closed + 2 * week)
+        self.trip(self.a, self.closed + 2 * week)       # a: week 2, through both
+        self.request(self.b, trip, self.closed + week)  # b: week 1; c is never active
+
+        [cohort] = analytics.weekly_cohorts(self.closed, self.closed)
+        self.assertEqual(cohort['week'], self.closed)
+        self.assertEqual(cohort['signups'], 3)
+        self.assertEqual(cohort['retention'], [1, 1, 1] + [0] * (analytics.RETENTION_WEEKS - 2))
+
+    def test_funnel_attributes_requests_to_the_listing_week(self):
+        trip = self.trip(self.a, self.closed)
+        self.trip(self.a, self.closed)
+        self.request(self.b, trip, self.closed + datetime.timedelta(weeks=3), 'pending')
+        self.request(self.b, trip, self.closed, 'accepted')
+        self.request(self.c, trip, self.closed, 'completed')
+
+        weeks = analytics.weekly_funnel(self.closed, self.closed + datetime.timedelta(weeks=1))
+        self.assertEqual([row['week'] for row in weeks], [self.closed, self.closed + datetime.timedelta(weeks=1)])
+        self.assertEqual({k: v for k, v in weeks[0].items() if k != 'week'},
+                         {'listings': 2, 'requests': 3, 'accepted': 2, 'completed': 1})
+        self.assertEqual(weeks[1]['listings'], 0)
+
+    def test_closed_weeks_are_served_from_snapshots(self):
+        self.trip(self.a, self.closed)
+        self.trip(self.a, self.current)
+        first = analytics.weekly_funnel(self.closed, self.current)
+        snapshots = set(AnalyticsSnapshot.objects.filter(metric='weekly_funnel').values_list('period_start', flat=True))
+        self.assertIn(self.closed, snapshots)
+        self.assertNotIn(self.current, snapshots)
+
+        # Only the open weeks are recomputed: new data shows up there and
+        # nowhere else.
+        self.trip(self.b, self.closed)
+        self.trip(self.b, self.current)
+        second = analytics.weekly_funnel(self.closed, self.current)
+        self.assertEqual(second[0], first[0])
+        self.assertEqual(second[-1]['listings'], first[-1]['listings'] + 1)
+
+        with self.assertNumQueries(1):
+            analytics.weekly_funnel(self.closed, self.closed)
 
-# Create your tests here.
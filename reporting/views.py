@@ -5,9 +5,46 @@ from django.db.models import Count, Q, Avg, Sum, F, DateField, DateTimeField
 from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncYear
 from users.models import CustomUser
 from listings.models import TravelListing, PackageRequest
-from reporting.models import EventLog
 from datetime import datetime, timedelta
 from config.views import StandardResponseViewSet
+from django.utils import timezone
+from reporting.sketches import rolling_unique_users, unique_users
+from reporting.exports import DATASETS, CONTENT_TYPES, streaming_export
+from reporting import analytics
+from rest_framework.exceptions import ValidationError
+
+
+def _active_users():
+    """
+    DAU/WAU/MAU from the per-day HyperLogLog sketches (~1.6% standard error)
+    instead of COUNT(DISTINCT user) scans over EventLog.
+    """
+    today = timezone.localdate()
+    return {
+        'DAU': rolling_unique_users(today, 0),
+        'WAU': rolling_unique_users(today, 7),
+        'MAU': rolling_unique_users(today, 30),
+    }
+
+
+def _date_range(request, default_weeks=12, required=True):
+    """
+    Parse `start` / `end` (YYYY-MM-DD) query params. Defaults to the last
+    `default_weeks` weeks, or (None, None) when not `required`.
+    """
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+    if not required and not (start or end):
+        return None, None
+    try:
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else timezone.localdate()
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else end - timedelta(weeks=default_weeks)
+    except ValueError:
+        raise ValidationError({'date': 'start and end must be in YYYY-MM-DD format'})
+    if start > end:
+        raise ValidationError({'date': 'start must be before end'})
+    return start, end
+
 
 class IsSuperUser(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -133,6 +170,21 @@ class AdminMetricsViewSet(StandardResponseViewSet):
         data = PackageRequest.objects.values('travel_listing').annotate(offers=Count('id')).order_by('-offers')
         return self._standardize_response(Response({'offers_per_trip': list(data)}))
 
+    @action(detail=False, methods=['get'], url_path='export/(?P<dataset>[^/.]+)')
+    def export(self, request, dataset=None):
+        """
+        Streams a full-history export of trips, requests, events or offers_per_trip.
+        Query params:
+        - output: csv (default) or ndjson
+        """
+        output = request.query_params.get('output', 'csv')
+        if dataset not in DATASETS or output not in CONTENT_TYPES:
+            return self._standardize_response(Response(
+                {"detail": f"Unknown export. Datasets: {', '.join(DATASETS)}; outputs: {', '.join(CONTENT_TYPES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            ))
+        return streaming_export(request, dataset, output)
+
     @action(detail=False, methods=['get'])
     def total_kg_sold(self, request):
         """
@@ -155,8 +207,8 @@ class AdminMetricsViewSet(StandardResponseViewSet):
         """
         Returns the ratio of users who clicked order vs message.
         """
-        order_users = EventLog.objects.filter(event_type='order_click').values('user').distinct().count()
-        message_users = EventLog.objects.filter(event_type='message_click').values('user').distinct().count()
+        order_users = unique_users(event_types=['order_click'])
+        message_users = unique_users(event_types=['message_click'])
         ratio = order_users / message_users if message_users else None
         return self._standardize_response(Response({'offer_to_message_ratio': ratio, 'order_users': order_users, 'message_users': message_users}))
 
@@ -165,21 +217,15 @@ class AdminMetricsViewSet(StandardResponseViewSet):
         """
         Returns daily, weekly, and monthly active users (DAU, WAU, MAU).
         """
-        today = datetime.now().date()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        dau = EventLog.objects.filter(timestamp__date=today).values('user').distinct().count()
-        wau = EventLog.objects.filter(timestamp__date__gte=week_ago).values('user').distinct().count()
-        mau = EventLog.objects.filter(timestamp__date__gte=month_ago).values('user').distinct().count()
-        return self._standardize_response(Response({'DAU': dau, 'WAU': wau, 'MAU': mau}))
+        return self._standardize_response(Response(_active_users()))
 
     @action(detail=False, methods=['get'])
     def trip_creators_vs_senders(self, request):
         """
         Returns the ratio of trip creators to senders.
+        Optional `start` / `end` (YYYY-MM-DD) restrict to listings/requests created in that range.
         """
-        trip_creators = CustomUser.objects.filter(travellisting__isnull=False).distinct().count()
-        senders = CustomUser.objects.filter(packagerequest__isnull=False).distinct().count()
+        trip_creators, senders = analytics.creators_and_senders(*_date_range(request, required=False))
         ratio = trip_creators / senders if senders else None
         return self._standardize_response(Response({'trip_creators': trip_creators, 'senders': senders, 'ratio': ratio}))
 
@@ -275,6 +321,41 @@ class AdminMetricsViewSet(StandardResponseViewSet):
             'delivery_confirmed': delivery_confirmed
         }))
 
+    @action(detail=False, methods=['get'])
+    def cohort_retention(self, request):
+        """
+        Returns weekly signup cohorts with retention: for each cohort week, the number of
+        members who created a listing or package request in each of the following weeks.
+        Query params: start, end (YYYY-MM-DD; default last 12 weeks).
+        """
+        start, end = _date_range(request)
+        return self._standardize_response(Response({
+            'retention_weeks': analytics.RETENTION_WEEKS,
+            'cohorts': analytics.weekly_cohorts(start, end),
+        }))
+
+    @action(detail=False, methods=['get'])
+    def weekly_funnel(self, request):
+        """
+        Returns listing -> request -> accepted -> completed counts per week of listing creation.
+        Query params: start, end (YYYY-MM-DD; default last 12 weeks).
+        """
+        start, end = _date_range(request)
+        return self._standardize_response(Response({'weekly_funnel': analytics.weekly_funnel(start, end)}))
+
+    @action(detail=False, methods=['get'])
+    def route_funnel(self, request):
+        """
+        Returns the listing -> request -> accepted -> completed funnel per route.
+        Query params: start, end (YYYY-MM-DD; default last 12 weeks), limit (default 50).
+        """
+        start, end = _date_range(request)
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            raise ValidationError({'limit': 'limit must be an integer'})
+        return self._standardize_response(Response({'route_funnel': analytics.route_funnel(start, end, limit)}))
+
     @action(detail=False, methods=['get'])
     def dashboard_data(self, request):
         """
@@ -305,9 +386,7 @@ class AdminMetricsViewSet(StandardResponseViewSet):
         package_status_dist = list(PackageRequest.objects.values('status').annotate(count=Count('id')))
 
         # DAU, WAU, MAU
-        dau = EventLog.objects.filter(timestamp__date=today).values('user').distinct().count()
-        wau = EventLog.objects.filter(timestamp__date__gte=week_ago).values('user').distinct().count()
-        mau = EventLog.objects.filter(timestamp__date__gte=month_ago).values('user').distinct().count()
+        active_users = _active_users()
 
         data = {
             'users_per_day': users_per_day,
@@ -318,8 +397,6 @@ class AdminMetricsViewSet(StandardResponseViewSet):
             'requests_per_month': requests_per_month,
             'popular_routes': popular_routes,
             'package_status_distribution': package_status_dist,
-            'DAU': dau,
-            'WAU': wau,
-            'MAU': mau,
+            **active_users,
         }
         return self._standardize_response(Response(data))
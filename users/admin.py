@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Profile, OTP, IdType
+from .models import CustomUser, Profile, OTP, IdType, EmailOutbox
 from messaging.utils import send_notification_to_user
 
 
@@ -104,9 +104,9 @@ class ProfileAdmin(admin.ModelAdmin):
 
 @admin.register(OTP)
 class OTPAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'phone_number', 'code', 'purpose', 'created_at', 'is_used')
+    list_display = ('id', 'user', 'phone_number', 'purpose', 'created_at', 'is_used')
     list_filter = ('purpose', 'is_used', 'created_at')
-    search_fields = ('user__email', 'user__username', 'code', 'user__phone_number')
+    search_fields = ('user__email', 'user__username', 'user__phone_number')
     ordering = ('-created_at',)
     readonly_fields = ('created_at',)
 
@@ -123,4 +123,15 @@ class IdTypeAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'to', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('to', 'subject')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    # Bodies may contain one-time codes.
+    exclude = ('body', 'html_body')
+
+
 admin.site.register(CustomUser, CustomUserAdmin)
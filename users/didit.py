@@ -0,0 +1,144 @@
+"""
+Didit identity-verification session state.
+
+Didit pushes status changes to DiditWebhookView; check_verification_status
+answers from the stored session and only asks the decision API again, in the
+background, when the stored status is older than DIDIT_STATUS_MAX_AGE and not
+final.
+"""
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from config.http import get_client
+
+from .models import DiditVerificationSession
+
+logger = logging.getLogger(__name__)
+
+# Didit session status (lower-cased) -> CustomUser.is_identity_verified
+IDENTITY_STATUSES = {
+    'approved': 'approved',
+    'declined': 'declined',
+    'rejected': 'declined',
+    'expired': 'expired',
+    'not started': 'not_started',
+    'in progress': 'in_progress',
+    'kyc expired': 'kyc_expired',
+    'in review': 'in_review',
+    'abandoned': 'abandoned',
+}
+
+# Statuses Didit will not move away from; never worth polling again.
+FINAL_STATUSES = {'approved', 'declined', 'rejected', 'expired', 'kyc expired', 'abandoned'}
+
+# Webhooks older than this are rejected to limit replay.
+WEBHOOK_TOLERANCE = 300
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='didit-refresh')
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def identity_status(didit_status):
+    return IDENTITY_STATUSES.get((didit_status or '').lower(), 'pending')
+
+
+def sync_user_status(user, didit_status):
+    """Mirror a Didit status onto the user, writing only when it changes."""
+    new_status = identity_status(didit_status)
+    if user.is_identity_verified != new_status:
+        user.is_identity_verified = new_status
+        user.save(update_fields=['is_identity_verified', 'is_profile_completed'])
+    return new_status
+
+
+def apply_status(verification_session, didit_status, sent_at=None):
+    """
+    Store a status confirmed by Didit on the session and its user. `sent_at`
+    is the webhook's own timestamp, kept to order later deliveries.
+    """
+    verification_session.status = didit_status
+    verification_session.status_checked_at = timezone.now()
+    update_fields = ['status', 'status_checked_at', 'updated_at']
+    if sent_at is not None:
+        verification_session.status_sent_at = sent_at
+        update_fields.append('status_sent_at')
+    verification_session.save(update_fields=update_fields)
+    return sync_user_status(verification_session.user, didit_status)
+
+
+def is_out_of_order(verification_session, sent_at):
+    """
+    Whether a webhook sent at `sent_at` is older than the last one applied.
+    Both are Didit's whole-second timestamps, so a delivery from the same
+    second counts as newer.
+    """
+    last = verification_session.status_sent_at
+    return last is not None and sent_at < last
+
+
+def is_stale(verification_session):
+    if verification_session.status.lower() in FINAL_STATUSES:
+        return False
+    checked_at = verification_session.status_checked_at
+    return checked_at is None or (
+        timezone.now() - checked_at
+    ).total_seconds() > settings.DIDIT_STATUS_MAX_AGE
+
+
+def fetch_status(session_id):
+    """Current status from Didit's decision API."""
+    response = get_client('didit').get(
+        settings.DIDIT_SESSION_DECISION_URL.format(session_id=session_id),
+        headers={"Accept": "application/json", "X-Api-Key": settings.DIDIT_API_KEY},
+    )
+    response.raise_for_status()
+    return response.json().get('status')
+
+
+def refresh_session(pk):
+    try:
+        verification_session = DiditVerificationSession.objects.select_related('user').get(pk=pk)
+        didit_status = fetch_status(verification_session.session_id)
+        if didit_status:
+            apply_status(verification_session, didit_status)
+    except Exception:
+        logger.warning("Refreshing Didit session %s failed", pk, exc_info=True)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(pk)
+        connections.close_all()
+
+
+def refresh_in_background(verification_session):
+    """Schedule a decision API refresh unless one is already running."""
+    with _in_flight_lock:
+        if verification_session.pk in _in_flight:
+            return
+        _in_flight.add(verification_session.pk)
+    _executor.submit(refresh_session, verification_session.pk)
+
+
+def verify_webhook_signature(body, signature, timestamp):
+    """
+    Check the X-Signature (hex HMAC-SHA256 of the raw body with
+    DIDIT_WEBHOOK_SECRET) and that X-Timestamp is recent.
+    """
+    secret = settings.DIDIT_WEBHOOK_SECRET
+    if not secret or not signature or not timestamp:
+        return False
+    try:
+        if abs(time.time() - int(timestamp)) > WEBHOOK_TOLERANCE:
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
@@ -0,0 +1,31 @@
+"""
+Lazy firebase-admin access.
+
+The SDK, and the google-auth/requests stack behind it, is imported and the
+default app initialized on the first Firebase phone check instead of at
+startup. Credentials come from settings.FIREBASE_CREDENTIAL (a
+firebase_admin credential object) or a service-account JSON file named by
+FIREBASE_CREDENTIAL_FILE.
+"""
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+_lock = threading.Lock()
+
+
+def firebase_auth():
+    """firebase_admin.auth with the default app initialized; ImportError without firebase-admin."""
+    import firebase_admin
+    from firebase_admin import auth, credentials
+
+    with _lock:
+        if not firebase_admin._apps:
+            cred = getattr(settings, 'FIREBASE_CREDENTIAL', None)
+            if cred is None and settings.FIREBASE_CREDENTIAL_FILE:
+                cred = credentials.Certificate(settings.FIREBASE_CREDENTIAL_FILE)
+            if cred is None:
+                raise ImproperlyConfigured('FIREBASE_CREDENTIAL is not configured in settings.')
+            firebase_admin.initialize_app(cred)
+    return auth
@@ -0,0 +1,145 @@
+"""
+Cached public keys for social sign-in (Apple JWKS, Google OAuth2 certs).
+
+Each KeySetCache keeps the provider's keys in process memory for as long as
+the provider's Cache-Control max-age allows, so steady-state sign-ins verify
+tokens without any outbound request. An unknown `kid` (key rotation) forces
+a refresh, rate-limited by MIN_REFRESH_INTERVAL, and concurrent refreshes are
+collapsed into one fetch by a lock (single flight).
+
+The fetcher is pluggable: any callable taking a URL and returning
+(keys, max_age) where keys is {kid: key material}.
+"""
+import logging
+import re
+import threading
+import time
+
+import jwt
+from django.conf import settings
+from jwt.algorithms import RSAAlgorithm
+
+from config.http import get_client
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+APPLE_ISSUER = 'https://appleid.apple.com'
+
+DEFAULT_MAX_AGE = 3600
+MIN_REFRESH_INTERVAL = 30
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class KeyNotFound(jwt.InvalidTokenError, ValueError):
+    pass
+
+
+def cache_max_age(headers):
+    """Remaining freshness lifetime from Cache-Control max-age minus Age."""
+    match = _MAX_AGE_RE.search(headers.get('Cache-Control', ''))
+    if not match:
+        return DEFAULT_MAX_AGE
+    age = headers.get('Age', '0')
+    return max(int(match.group(1)) - (int(age) if age.isdigit() else 0), 0)
+
+
+def _get(service, url):
+    response = get_client(service).get(url)
+    response.raise_for_status()
+    return response.json(), cache_max_age(response.headers)
+
+
+def fetch_apple_jwks(url):
+    """JWKS document ({"keys": [...]}) -> {kid: jwk}."""
+    body, max_age = _get('apple', url)
+    return {key['kid']: key for key in body['keys']}, max_age
+
+
+def fetch_google_certs(url):
+    """Google v1 certs document ({kid: x509 pem}) as is."""
+    return _get('google', url)
+
+
+class KeySetCache:
+    def __init__(self, url, fetcher, min_refresh_interval=MIN_REFRESH_INTERVAL):
+        self.url = url
+        self.fetcher = fetcher
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._expires_at = 0.0
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self, stale_keys):
+        with self._lock:
+            # Another thread may have refreshed while we waited on the lock.
+            if self._keys is not stale_keys:
+                return
+            try:
+                keys, max_age = self.fetcher(self.url)
+            except Exception:
+                if not self._keys:
+                    raise
+                # Keep serving the keys we have and retry a little later.
+                logger.warning("Refreshing keys from %s failed, using cached keys", self.url, exc_info=True)
+                self._fetched_at = time.monotonic()
+                self._expires_at = self._fetched_at + self.min_refresh_interval
+                return
+            now = time.monotonic()
+            self._keys = keys
+            self._fetched_at = now
+            self._expires_at = now + max_age
+            logger.info("Fetched %d keys from %s (max-age %ss)", len(keys), self.url, max_age)
+
+    def get(self, kid):
+        """Key material for `kid`, fetching only when expired or on a kid miss."""
+        keys = self._keys
+        now = time.monotonic()
+        if now >= self._expires_at:
+            self._refresh(keys)
+        elif kid not in keys and (
+                self._fetched_at is None or now - self._fetched_at >= self.min_refresh_interval):
+            self._refresh(keys)
+        try:
+            return self._keys[kid]
+        except KeyError:
+            raise KeyNotFound(f'No public key found for kid {kid!r}')
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._expires_at = 0.0
+            self._fetched_at = None
+
+
+apple_keys = KeySetCache(settings.APPLE_PUBLIC_KEY_URL, fetch_apple_jwks)
+google_certs = KeySetCache(GOOGLE_CERTS_URL, fetch_google_certs)
+
+
+def verify_apple_identity_token(token, audience):
+    kid = jwt.get_unverified_header(token).get('kid')
+    public_key = RSAAlgorithm.from_jwk(apple_keys.get(kid))
+    return jwt.decode(token, public_key, algorithms=['RS256'], audience=audience, issuer=APPLE_ISSUER)
+
+
+def verify_google_id_token(token, audience):
+    """
+    Equivalent of google.oauth2.id_token.verify_oauth2_token against the
+    cached certs. Raises ValueError for invalid tokens.
+    """
+    # google-auth is only needed here; keep it out of startup.
+    from google.auth import exceptions, jwt as google_jwt
+
+    try:
+        kid = jwt.get_unverified_header(token).get('kid')
+    except jwt.InvalidTokenError as e:
+        raise ValueError(str(e))
+    idinfo = google_jwt.decode(token, certs={kid: google_certs.get(kid)}, audience=audience)
+    if idinfo['iss'] not in GOOGLE_ISSUERS:
+        raise exceptions.GoogleAuthError(
+            f"Wrong issuer. 'iss' should be one of the following: {list(GOOGLE_ISSUERS)}"
+        )
+    return idinfo
@@ -0,0 +1,199 @@
+"""
+Outbound email queue.
+
+Requests only insert an EmailOutbox row; delivery happens outside the request
+over a single SMTP connection per batch. Rows are claimed with
+SELECT ... FOR UPDATE SKIP LOCKED and leased by pushing `next_attempt_at`
+forward, so several workers (or web processes) can drain the queue without
+sending a message twice. Failed sends are retried with exponential backoff
+until EMAIL_OUTBOX_MAX_ATTEMPTS is reached.
+
+Bodies can carry one-time codes, so they are blanked as soon as a message is
+sent or given up on, and `purge_finished()` deletes finished rows after
+EMAIL_OUTBOX_RETENTION_DAYS.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# Long enough for a batch to be delivered before another worker may reclaim it.
+LEASE = timedelta(minutes=5)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts` (1-based): base * 2^(n-1), capped."""
+    base = _setting('EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+    cap = _setting('EMAIL_OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def enqueue_email(to, subject, body, html_body='', from_email=None):
+    """
+    Queue a message and schedule delivery once the surrounding transaction
+    commits. Returns the EmailOutbox row.
+    """
+    message = EmailOutbox.objects.create(
+        to=to,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.EMAIL_HOST_USER,
+    )
+    if _setting('EMAIL_OUTBOX_SEND_ON_COMMIT', True):
+        transaction.on_commit(dispatch)
+    return message
+
+
+def _claim(batch_size):
+    """Lease up to `batch_size` due messages and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if batch:
+            EmailOutbox.objects.filter(pk__in=[m.pk for m in batch]).update(
+                next_attempt_at=now + LEASE, attempts=F('attempts') + 1,
+            )
+    for message in batch:
+        message.attempts += 1
+    return batch
+
+
+def _build(message, connection):
+    email = EmailMultiAlternatives(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email or None,
+        to=[message.to],
+        connection=connection,
+    )
+    if message.html_body:
+        email.attach_alternative(message.html_body, 'text/html')
+    return email
+
+
+FAILURE_FIELDS = ['status', 'next_attempt_at', 'last_error', 'body', 'html_body']
+
+
+def _record_failure(message, error):
+    """Schedule a retry, or give up (blanking the body) after the last attempt. Does not save."""
+    message.last_error = str(error)
+    if message.attempts >= _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5):
+        message.status = 'failed'
+        message.body = message.html_body = ''
+        logger.error("Giving up on email %s to %s after %d attempts: %s",
+                     message.pk, message.to, message.attempts, error)
+    else:
+        message.next_attempt_at = timezone.now() + backoff(message.attempts)
+        logger.warning("Email %s to %s failed (attempt %d), retrying at %s: %s",
+                       message.pk, message.to, message.attempts, message.next_attempt_at, error)
+
+
+def _deliver(message, connection):
+    """Send one message, recording success or scheduling a retry."""
+    try:
+        connection.open()
+        connection.send_messages([_build(message, connection)])
+    except Exception as e:
+        _record_failure(message, e)
+        message.save(update_fields=FAILURE_FIELDS)
+        # The server may have dropped the session; reconnect for the next message.
+        connection.close()
+        return False
+    message.status = 'sent'
+    message.sent_at = timezone.now()
+    message.last_error = ''
+    message.body = message.html_body = ''
+    message.save(update_fields=['status', 'sent_at', 'last_error', 'body', 'html_body'])
+    return True
+
+
+def send_pending(batch_size=None, connection=None):
+    """
+    Deliver due messages in batches until the queue is empty, reusing one SMTP
+    connection. Returns (sent, failed) counts for this call.
+    """
+    batch_size = batch_size or _setting('EMAIL_OUTBOX_BATCH_SIZE', 50)
+    owns_connection = connection is None
+    connection = connection or get_connection()
+    sent = failed = 0
+    try:
+        while True:
+            batch = _claim(batch_size)
+            if not batch:
+                break
+            try:
+                connection.open()
+            except Exception as e:
+                # Count it as a failed attempt for each leased message: retry
+                # later, or give up once the attempts are used up.
+                logger.warning("Could not open email connection: %s", e)
+                for message in batch:
+                    _record_failure(message, e)
+                EmailOutbox.objects.bulk_update(batch, FAILURE_FIELDS)
+                failed += len(batch)
+                break
+            for message in batch:
+                if _deliver(message, connection):
+                    sent += 1
+                else:
+                    failed += 1
+    finally:
+        if owns_connection:
+            connection.close()
+    return sent, failed
+
+
+def purge_finished(batch_size=1000):
+    """Delete sent and failed messages older than the retention; returns the number deleted."""
+    cutoff = timezone.now() - timedelta(days=_setting('EMAIL_OUTBOX_RETENTION_DAYS', 7))
+    finished = EmailOutbox.objects.filter(status__in=['sent', 'failed'], created_at__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += EmailOutbox.objects.filter(pk__in=ids).delete()[0]
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+_scheduled = threading.Event()
+
+
+def _drain():
+    _scheduled.clear()
+    try:
+        send_pending()
+    except Exception:
+        logger.exception("Email outbox dispatch failed")
+    finally:
+        connections.close_all()
+
+
+def dispatch():
+    """
+    Drain the outbox on a background thread of this process. Calls made while
+    a drain is already queued are coalesced.
+    """
+    if _scheduled.is_set():
+        return
+    _scheduled.set()
+    _executor.submit(_drain)
@@ -0,0 +1,106 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+
+User = get_user_model()
+
+PREFIX = 'benchlogin'
+
+
+class Command(BaseCommand):
+    help = (
+        'Microbenchmark of login identifier resolution: the legacy OR query across '
+        'email/username/phone versus CustomUserManager.get_by_login_identifier. '
+        'Synthetic users (default 1,000,000) are created in a transaction that is rolled back. '
+        'Refuses to run unless DEBUG or --yes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--lookups', type=int, default=2000)
+        parser.add_argument('--yes', action='store_true',
+                            help='Run without DEBUG: loads the configured database for the duration.')
+
+    def handle(self, *args, **options):
+        if not (settings.DEBUG or options['yes']):
+            raise CommandError('Writes synthetic users to the configured database; pass --yes to run without DEBUG.')
+        with transaction.atomic():
+            self.run(options['users'], options['lookups'])
+            transaction.set_rollback(True)
+        self.stdout.write('Rolled back the synthetic users')
+
+    def run(self, total, lookups):
+        self.seed(total)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {User._meta.db_table}')
+
+        rng = random.Random(42)
+        identifiers = []
+        for _ in range(lookups):
+            i = rng.randrange(total)
+            identifiers.append(rng.choice([
+                f'{PREFIX}{i}@Example.com',
+                f'{PREFIX}{i}',
+                f'+9{i:013d}',
+            ]))
+
+        self.report('legacy OR query', identifiers, self.legacy_lookup)
+        self.report('classified lookup', identifiers, User.objects.get_by_login_identifier)
+
+        if connection.vendor == 'postgresql':
+            for label, queryset in (
+                ('legacy', self.legacy_queryset(identifiers[0])),
+                ('classified email', User.objects.alias(email_lower=models.functions.Lower('email'))
+                 .filter(email_lower=f'{PREFIX}1@example.com')),
+            ):
+                self.stdout.write(f'\nEXPLAIN ({label}):\n{queryset.explain(analyze=True)}')
+
+    def seed(self, total):
+        self.stdout.write(f'Seeding {total} users...')
+        batch = []
+        for i in range(total):
+            batch.append(User(
+                username=f'{PREFIX}{i}',
+                email=f'{PREFIX}{i}@example.com',
+                phone_number=f'9{i:013d}',
+                password='!',
+            ))
+            if len(batch) == 10_000:
+                User.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            User.objects.bulk_create(batch)
+
+    @staticmethod
+    def legacy_queryset(username):
+        normalized = username
+        if username.replace('+', '').isdigit():
+            normalized = ''.join(filter(str.isdigit, username))
+        return User.objects.filter(
+            models.Q(email=username) | models.Q(username=username) | models.Q(phone_number=normalized)
+        )
+
+    def legacy_lookup(self, username):
+        return self.legacy_queryset(username).get()
+
+    def report(self, label, identifiers, lookup):
+        timings = []
+        misses = 0
+        for identifier in identifiers:
+            start = time.perf_counter()
+            try:
+                lookup(identifier)
+            except User.DoesNotExist:
+                misses += 1
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f'{label:>18}: mean {statistics.mean(timings):.3f} ms, '
+            f'p50 {timings[len(timings) // 2]:.3f} ms, p95 {timings[int(len(timings) * 0.95)]:.3f} ms, '
+            f'misses {misses}/{len(identifiers)}'
+        )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config import importtime
+
+
+class Command(BaseCommand):
+    help = (
+        'Profiles a cold Django boot with `python -X importtime` and fails when the median '
+        'import time exceeds IMPORT_TIME_BUDGET_MS or a lazily loaded SDK is imported at start-up.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=float, help='Default: settings.IMPORT_TIME_BUDGET_MS.')
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list.')
+        parser.add_argument('--statement', default=importtime.BOOT_STATEMENT,
+                            help='Python statement to profile (e.g. a worker import path).')
+
+    def handle(self, *args, **options):
+        median_ms, profile, eager, ok = importtime.check(options['budget_ms'], options['runs'], options['statement'])
+        self.stdout.write(f'Import time (median of {options["runs"]}): {median_ms:.0f} ms')
+        for name, cumulative_ms in profile.slowest(options['top'], top_level=True):
+            self.stdout.write(f'{cumulative_ms:>10.1f} ms  {name}')
+        if eager:
+            self.stderr.write(self.style.ERROR(f'Imported at start-up but should be lazy: {", ".join(eager)}'))
+        if not ok:
+            raise CommandError('Import-time budget exceeded')
+        self.stdout.write(self.style.SUCCESS('Within the import-time budget'))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.mail import purge_finished
+from users.otp import purge
+
+
+class Command(BaseCommand):
+    help = 'Deletes used and expired one-time codes and finished queued emails that may contain them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep purging periodically instead of exiting.')
+        parser.add_argument('--interval', type=float, default=3600.0, help='Seconds between purges with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = purge(batch_size=options['batch_size'])
+            emails = purge_finished(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} one-time codes, {emails} finished emails'))
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recomputes materialised Profile statistics from listings, requests and reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        fixed = reconcile(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled statistics, {fixed} profiles corrected'))
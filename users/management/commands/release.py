@@ -0,0 +1,37 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Release phase, run once per deploy before new instances start: fails if models have '
+        'changes without migrations, applies migrations, ensures a superuser exists and builds '
+        'the hashed static manifest. Instances then only start the ASGI server.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-migrate', action='store_true',
+                            help='Only check for missing migrations.')
+        parser.add_argument('--skip-static', action='store_true',
+                            help='Static files were already collected into the build artifact.')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        self.stdout.write('Checking for model changes without migrations...')
+        try:
+            call_command('makemigrations', check=True, dry_run=True, verbosity=verbosity, stdout=self.stdout)
+        except SystemExit:
+            raise CommandError('Models have changes that are not in migrations; run makemigrations and commit them')
+
+        if not options['skip_migrate']:
+            self.stdout.write('Applying migrations...')
+            call_command('migrate', interactive=False, verbosity=verbosity, stdout=self.stdout)
+            call_command('create_superuser', stdout=self.stdout)
+
+        if not options['skip_static']:
+            # No --clear: hashed files from the previous release stay available
+            # to clients that loaded pages before the switch-over.
+            self.stdout.write('Collecting static files...')
+            call_command('collectstatic', interactive=False, verbosity=verbosity, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS('Release tasks complete'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.mail import purge_finished, send_pending
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued EmailOutbox messages over a reused SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_pending(batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
+            purged = purge_finished()
+            if purged:
+                self.stdout.write(f'Purged {purged} finished emails')
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,44 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config import serving
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts uvicorn with the production serving profile: one worker process per usable CPU '
+        '(or WEB_CONCURRENCY) and SYNC_VIEW_THREADS pooled threads per worker for sync views.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='0.0.0.0')
+        parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8000)))
+        parser.add_argument('--workers', type=int, help='Default: WEB_CONCURRENCY, else one per usable CPU.')
+        parser.add_argument('--ws-max-size', type=int, default=2097152)
+        parser.add_argument('--no-access-log', action='store_true')
+
+    def handle(self, *args, **options):
+        import uvicorn
+
+        workers = options['workers'] or serving.worker_count()
+        if workers > 1 and not serving.shared_cache():
+            raise CommandError(
+                'Several workers need a shared cache (rate limits would be per process); set CACHE_URL or use one worker.'
+            )
+        self.stdout.write(
+            f'Serving on {options["host"]}:{options["port"]} with {workers} worker(s), '
+            f'{settings.SYNC_VIEW_THREADS} sync-view thread(s) each'
+        )
+        uvicorn.run(
+            'config.asgi:application',
+            host=options['host'],
+            port=options['port'],
+            workers=workers,
+            ws_max_size=options['ws_max_size'],
+            access_log=not options['no_access_log'],
+            # Channels' router has no lifespan support; logging is Django's LOGGING.
+            lifespan='off',
+            log_config=None,
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diditverificationsession',
+            name='status_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:55
+
+from django.db import migrations, models
+from django.utils.crypto import salted_hmac
+
+
+def hash_plain_codes(apps, schema_editor):
+    # Same scheme as users.otp.hash_code; provider-sent rows keep code=''.
+    OTP = apps.get_model('users', 'OTP')
+    for otp in OTP.objects.exclude(code='').iterator():
+        if len(otp.code) == 6:
+            otp.code = salted_hmac(
+                'users.otp', f'{otp.user_id}:{otp.purpose}:{otp.code}', algorithm='sha256'
+            ).hexdigest()
+            otp.save(update_fields=['code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_diditverificationsession_status_checked_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='otp',
+            name='code',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['user', 'purpose', 'is_used', 'created_at'], name='users_otp_lookup_idx'),
+        ),
+        migrations.RunPython(hash_plain_codes, migrations.RunPython.noop),
+    ]
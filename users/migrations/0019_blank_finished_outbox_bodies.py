@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def blank_finished_bodies(apps, schema_editor):
+    # users.mail now blanks bodies (which may carry one-time codes) once a
+    # message is sent or given up on; clear the rows finished before that.
+    EmailOutbox = apps.get_model('users', 'EmailOutbox')
+    EmailOutbox.objects.filter(status__in=['sent', 'failed']).update(body='', html_body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_otp_hashed_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_finished_bodies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-19 02:43
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def refuse_case_collisions(apps, schema_editor):
+    # Accounts whose emails differ only in case cannot log in by email
+    # (get_by_login_identifier finds two users) and block the constraint.
+    # They have to be merged or re-addressed by hand; nothing is guessed here.
+    CustomUser = apps.get_model('users', 'CustomUser')
+    collisions = (
+        CustomUser.objects.annotate(email_lower=Lower('email'))
+        .values('email_lower').annotate(n=Count('pk')).filter(n__gt=1)
+        .values_list('email_lower', flat=True)
+    )
+    groups = [
+        list(CustomUser.objects.annotate(email_lower=Lower('email')).filter(email_lower=email)
+             .values_list('pk', flat=True))
+        for email in collisions[:20]
+    ]
+    if groups:
+        raise RuntimeError(
+            'Users whose emails differ only in case (user ids per address): '
+            f'{groups}. Resolve them before migrating.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0019_blank_finished_outbox_bodies'),
+    ]
+
+    operations = [
+        migrations.RunPython(refuse_case_collisions, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='users_email_lower_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='users_email_lower_uniq', violation_error_message='A user with this email already exists.'),
+        ),
+    ]
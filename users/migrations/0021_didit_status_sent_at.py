@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_email_lower_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diditverificationsession',
+            name='status_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def reconcile_profile_stats(apps, schema_editor):
+    # The counters are maintained by signals from now on; bring the values
+    # written before that in line with the source tables first.
+    from users.stats import reconcile
+    reconcile(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0013_remove_travellisting_mode_of_transport'),
+        ('users', '0021_didit_status_sent_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconcile_profile_stats, migrations.RunPython.noop),
+    ]
@@ -1,19 +1,117 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 from django.conf import settings
+from django.db.models.functions import Lower
+from django.utils import timezone
+import copy
+import re
 
 from config.utils import upload_image, delete_image, optimized_image_url, auto_crop_url
 
 
+class ChangeTrackingMixin:
+    """
+    Remembers field values as loaded from (or last saved to) the database so
+    that a plain save() of an existing row only writes the fields that
+    changed, plus auto_now fields. A save with nothing changed issues no
+    query, like save(update_fields=[]). Explicit update_fields are honoured.
+    Fields in `untracked_fields` are never written by a plain save().
+    """
+    untracked_fields = ()
+
+    def _snapshot(self, attnames=None):
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if (attnames is None or field.attname in attnames) and field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                # JSON values can be mutated in place; keep a private copy.
+                loaded[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot(fields and {self._meta.get_field(name).attname for name in fields})
+
+    def changed_fields(self):
+        """Names of concrete fields whose value differs from the database copy."""
+        loaded = self.__dict__.get('_loaded_values', {})
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in self.untracked_fields
+            and field.attname in self.__dict__ and (
+                field.attname not in loaded or self.__dict__[field.attname] != loaded[field.attname]
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            changed = self.changed_fields()
+            if changed:
+                changed += [
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False) and field.name not in changed
+                ]
+            kwargs['update_fields'] = changed
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._snapshot(update_fields and {self._meta.get_field(name).attname for name in update_fields})
+
+
 class BaseUser(AbstractUser):
     class Meta:
         abstract = True
 
 
+PHONE_IDENTIFIER_RE = re.compile(r'^\+?[\d\s\-().]{7,}$')
+
+
+def classify_login_identifier(identifier):
+    """
+    Classify a login identifier as ('email' | 'phone' | 'username', normalized value).
+    Emails are lower-cased, phone numbers reduced to digits (as stored at registration).
+    """
+    identifier = identifier.strip()
+    if '@' in identifier:
+        return 'email', identifier.lower()
+    if PHONE_IDENTIFIER_RE.match(identifier):
+        return 'phone', ''.join(filter(str.isdigit, identifier))
+    return 'username', identifier
+
+
 class CustomUserManager(BaseUserManager):
+    def with_email(self, email):
+        """Users whose email matches case-insensitively (unique; uses the lower(email) index)."""
+        if not email:
+            return self.none()
+        return self.alias(email_lower=Lower('email')).filter(email_lower=email.strip().lower())
+
+    def get_by_login_identifier(self, identifier):
+        """
+        Resolve an email / phone / username with one indexed equality query
+        (lower(email), phone_number or username). Only when that misses is a
+        username equality tried, since usernames may contain '@' or be all digits.
+        Raises DoesNotExist when nothing (or more than one user) matches.
+        """
+        kind, value = classify_login_identifier(identifier)
+        if kind == 'email':
+            queryset = self.with_email(value)
+        elif kind == 'phone':
+            queryset = self.filter(phone_number=value)
+        else:
+            queryset = self.filter(username=value)
+        users = list(queryset[:2])
+        if len(users) != 1 and kind != 'username':
+            users = list(self.filter(username=identifier.strip())[:2])
+        if len(users) != 1:
+            raise self.model.DoesNotExist('No user matches this identifier')
+        return users[0]
+
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
@@ -61,7 +159,7 @@ IDENTITY_VERIFICATION_CHOICES = [
 ]
 
 
-class CustomUser(BaseUser):
+class CustomUser(ChangeTrackingMixin, BaseUser):
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15, unique=True)
     is_email_verified = models.BooleanField(default=False)
@@ -82,6 +180,16 @@ class CustomUser(BaseUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'phone_number']
 
+    class Meta:
+        constraints = [
+            # Emails differing only in case are one address; the index also backs
+            # case-insensitive lookups (CustomUserManager.with_email).
+            models.UniqueConstraint(
+                Lower('email'), name='users_email_lower_uniq',
+                violation_error_message='A user with this email already exists.',
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -95,7 +203,18 @@ class CustomUser(BaseUser):
         super().save(*args, **kwargs)
 
 
-class Profile(models.Model):
+# Maintained by users.stats with F() updates; never written by Profile.save().
+PROFILE_STAT_FIELDS = (
+    'total_trips_created',
+    'total_offer_sent',
+    'total_offer_received',
+    'total_completed_deliveries',
+    'average_rating',
+    'total_rating_received',
+)
+
+
+class Profile(ChangeTrackingMixin, models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='profile')
     contact_info = models.CharField(max_length=255, blank=True)
     languages = models.CharField(max_length=255, blank=True)
@@ -142,23 +261,17 @@ class Profile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # A save of an already-loaded profile must not write back stale counter
+    # values and undo concurrent F() increments.
+    untracked_fields = PROFILE_STAT_FIELDS
+
     def __str__(self):
         return f"{self.user.get_full_name()}'s Profile"
 
-
-@receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, created, **kwargs):
-    if created:
-        Profile.objects.create(user=instance)
-    else:
-        # Only save the profile if it exists
-        if hasattr(instance, 'profile'):
-            instance.profile.save()
-
-
 class OTP(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='otps')
-    code = models.CharField(max_length=6)
+    # Keyed hash of the code (users.otp.hash_code); empty for provider-sent codes
+    code = models.CharField(max_length=64)
     request_id = models.CharField(max_length=100, blank=True, null=True, help_text="Stores external API request ID")
     created_at = models.DateTimeField(auto_now_add=True)
     is_used = models.BooleanField(default=False)
@@ -173,6 +286,9 @@ class OTP(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'purpose', 'is_used', 'created_at'], name='users_otp_lookup_idx'),
+        ]
 
 
 class DiditVerificationSession(models.Model):
@@ -186,6 +302,10 @@ class DiditVerificationSession(models.Model):
     workflow_id = models.CharField(max_length=100, blank=True)
     callback_url = models.URLField(blank=True)
     verification_url = models.URLField(blank=True)
+    # When `status` was last confirmed by Didit (webhook or decision API)
+    status_checked_at = models.DateTimeField(null=True, blank=True)
+    # Didit's X-Timestamp of the last webhook applied; orders later deliveries
+    status_sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -194,3 +314,36 @@ class DiditVerificationSession(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+
+
+class EmailOutbox(models.Model):
+    """
+    Outgoing email, queued by the request and delivered by users.mail
+    (`send_queued_email` worker or the in-process dispatcher).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='users_outbox_due_idx'),
+        ]
@@ -0,0 +1,116 @@
+"""
+One-time codes sent by email (verification, password reset).
+
+Only a keyed hash of each code is stored. Issuing a code retires the user's
+earlier unused codes for the same purpose, and codes stop working OTP_TTL
+seconds after creation. Lookups go through the (user, purpose, is_used,
+created_at) index and compare hashes in constant time.
+
+Issuing and verifying are rate limited per user and per client IP with
+sliding windows in the cache (settings.OTP_RATE_LIMITS), so brute force and
+resend storms are refused before they reach the database. Limits raise DRF's
+Throttled, which the API renders as a 429 with Retry-After.
+"""
+import hmac
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from config.ratelimit import SlidingWindowLimit, client_ip
+
+from .models import OTP
+
+CODE_LENGTH = 6
+
+
+def _limit(name):
+    limit, window = settings.OTP_RATE_LIMITS[name]
+    return SlidingWindowLimit(f'otp-{name}', limit, window)
+
+
+def hash_code(user_id, purpose, code):
+    return salted_hmac('users.otp', f'{user_id}:{purpose}:{code}', algorithm='sha256').hexdigest()
+
+
+def generate_code():
+    return ''.join(secrets.choice('0123456789') for _ in range(CODE_LENGTH))
+
+
+def expiry_cutoff():
+    return timezone.now() - timedelta(seconds=settings.OTP_TTL)
+
+
+def check_issue_limits(request, user=None):
+    """Count one code sent to `user` from this client, or raise Throttled."""
+    limits = []
+    if request is not None:
+        limits.append((_limit('issue_ip'), client_ip(request)))
+    if user is not None:
+        limits.append((_limit('issue_user'), user.pk))
+    for limit, key in limits:
+        limit.check(key)
+    for limit, key in limits:
+        limit.hit(key)
+
+
+def check_verify_limits(request, user_id, purpose):
+    """Raise Throttled when too many wrong codes were tried recently."""
+    _limit('verify_user').check(f'{user_id}:{purpose}')
+    if request is not None:
+        _limit('verify_ip').check(client_ip(request))
+
+
+def record_failed_attempt(request, user_id, purpose):
+    _limit('verify_user').hit(f'{user_id}:{purpose}')
+    if request is not None:
+        _limit('verify_ip').hit(client_ip(request))
+
+
+def issue(user, purpose, request=None):
+    """Create a fresh code for `user` and return it (plain text, for sending)."""
+    check_issue_limits(request, user)
+    code = generate_code()
+    OTP.objects.filter(user=user, purpose=purpose, is_used=False).update(is_used=True)
+    OTP.objects.create(user=user, code=hash_code(user.pk, purpose, code), purpose=purpose)
+    return code
+
+
+def verify(user_id, purpose, code, request=None, consume=True):
+    """
+    The live OTP matching `code`, marked used unless `consume` is False, or
+    None. Wrong codes count towards the verification limits.
+    """
+    check_verify_limits(request, user_id, purpose)
+    expected = hash_code(user_id, purpose, code)
+    candidates = OTP.objects.filter(
+        user_id=user_id,
+        purpose=purpose,
+        is_used=False,
+        created_at__gte=expiry_cutoff(),
+    ).exclude(code='').select_related('user')
+    for otp in candidates:
+        if hmac.compare_digest(otp.code, expected):
+            if consume:
+                # Conditional update: of two concurrent requests with the same
+                # code, only the one that flips is_used gets the OTP.
+                if OTP.objects.filter(pk=otp.pk, is_used=False).update(is_used=True) != 1:
+                    return None
+                otp.is_used = True
+            return otp
+    record_failed_attempt(request, user_id, purpose)
+    return None
+
+
+def purge(batch_size=1000):
+    """Delete used and expired codes in batches; returns the number deleted."""
+    dead = OTP.objects.filter(Q(is_used=True) | Q(created_at__lt=expiry_cutoff()))
+    deleted = 0
+    while True:
+        ids = list(dead.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += OTP.objects.filter(pk__in=ids).delete()[0]
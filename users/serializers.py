@@ -1,16 +1,22 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Profile, OTP, DiditVerificationSession
+from .models import Profile, OTP, DiditVerificationSession, PROFILE_STAT_FIELDS
 from django.utils import timezone
 from listings.models import Region, Country
 from listings.serializers import RegionSerializer, CountrySerializer
 from .models import IdType
 from django.conf import settings
-from config.utils import upload_image, delete_image, optimized_image_url, auto_crop_url
+from config.utils import (
+    upload_image, upload_images, delete_image, optimized_image_url, auto_crop_url,
+    image_variants, requested_image_sizes,
+)
 import json
+import logging
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 class UserSerializer(serializers.ModelSerializer):
     """
@@ -60,7 +66,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         fields = ('email', 'username', 'first_name', 'last_name', 'phone_number', 'user_location')
 
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        if User.objects.with_email(value).exists():
             raise serializers.ValidationError("A user with this email already exists.")
         return value
 
@@ -178,20 +184,18 @@ class ProfileSerializer(serializers.ModelSerializer):
                                                     required=False)
 
     def get_user_location_data(self, obj):
-        print(f"DEBUG: get_user_location_data called for profile {obj.id}, user_location: {obj.user_location}")
         if obj.user_location:
-            location_data = {
+            return {
                 'id': obj.user_location.id,
                 'name': obj.user_location.name,
                 'country': obj.user_location.country,
                 'countryCode': obj.user_location.country_code
             }
-            print(f"DEBUG: Returning location data: {location_data}")
-            return location_data
-        print("DEBUG: No user_location found, returning None")
         return None
 
     profile_picture = serializers.ImageField(write_only=True, required=False)
+    # {size: url} derivatives of profile_picture_url; sizes chosen with ?image_sizes=
+    profile_picture_urls = serializers.SerializerMethodField(read_only=True)
     front_side_identity_card = serializers.ImageField(write_only=True, required=False)
     back_side_identity_card = serializers.ImageField(write_only=True, required=False)
     selfie_photo = serializers.ImageField(write_only=True, required=False)
@@ -223,6 +227,7 @@ class ProfileSerializer(serializers.ModelSerializer):
             'notification_setting',
             'profile_picture',
             'profile_picture_url',
+            'profile_picture_urls',
             'contact_info',
             'languages',
             'travel_history',
@@ -248,7 +253,31 @@ class ProfileSerializer(serializers.ModelSerializer):
             'updated_at'
         )
         read_only_fields = (
-        'created_at', 'updated_at', 'city_of_residence', 'id_type', 'issue_country', 'user_location_data')
+        'created_at', 'updated_at', 'city_of_residence', 'id_type', 'issue_country', 'user_location_data',
+        *PROFILE_STAT_FIELDS)
+
+    def get_profile_picture_urls(self, obj):
+        return image_variants(obj.profile_picture_url, requested_image_sizes(self.context.get('request')))
+
+    # upload field -> (URL field, Cloudinary public_id template)
+    IMAGE_UPLOADS = {
+        'profile_picture': ('profile_picture_url', 'verlo/profile/profile_{user_id}'),
+        'front_side_identity_card': ('front_side_identity_card_url', 'verlo/front_id/front_id_{user_id}'),
+        'back_side_identity_card': ('back_side_identity_card_url', 'verlo/back_id/back_id_{user_id}'),
+        'selfie_photo': ('selfie_photo_url', 'verlo/selfie/selfie_{user_id}'),
+    }
+
+    def _upload_images(self, instance, files):
+        """Upload the given images concurrently and set their URL fields."""
+        fields = [field for field, file in files.items() if file]
+        results = upload_images(
+            [files[field] for field in fields],
+            [self.IMAGE_UPLOADS[field][1].format(user_id=instance.user_id) for field in fields],
+        )
+        for field, result in zip(fields, results):
+            if not result.ok:
+                raise result.error
+            setattr(instance, self.IMAGE_UPLOADS[field][0], result.url)
 
     def create(self, validated_data):
         profile_picture = validated_data.pop('profile_picture', None)
@@ -257,16 +286,12 @@ class ProfileSerializer(serializers.ModelSerializer):
         selfie_photo = validated_data.pop('selfie_photo', None)
 
         instance = Profile.objects.create(**validated_data)
-        if profile_picture:
-            instance.profile_picture_url = upload_image(profile_picture, f"verlo/profile/profile_{instance.user.id}")
-        if front_side_identity_card:
-            instance.front_side_identity_card_url = upload_image(front_side_identity_card,
-                                                                 f"verlo/front_id/front_id_{instance.user.id}")
-        if back_side_identity_card:
-            instance.back_side_identity_card_url = upload_image(back_side_identity_card,
-                                                                f"verlo/back_id/back_id_{instance.user.id}")
-        if selfie_photo:
-            instance.selfie_photo_url = upload_image(selfie_photo, f"verlo/selfie/selfie_{instance.user.id}")
+        self._upload_images(instance, {
+            'profile_picture': profile_picture,
+            'front_side_identity_card': front_side_identity_card,
+            'back_side_identity_card': back_side_identity_card,
+            'selfie_photo': selfie_photo,
+        })
         instance.save()
         return instance
 
@@ -284,17 +309,15 @@ class ProfileSerializer(serializers.ModelSerializer):
         # Handle JSON format for user_location_input
         json_location_input = data.get('user_location_input')
 
-        try:
-            print(
-                f"DEBUG ProfileSerializer.to_internal_value: content_type= {getattr(getattr(self, 'context', {}).get('request'), 'content_type', None)}")
-            print(f"DEBUG ProfileSerializer.to_internal_value: data keys: {list(data.keys())}")
-            print(
-                f"DEBUG ProfileSerializer.to_internal_value: user_location_input name={location_name} country={location_country} countryCode={location_country_code}")
-            print(
-                f"DEBUG ProfileSerializer.to_internal_value: pickup_location_input name={pickup_location_name} country={pickup_location_country} countryCode={pickup_location_country_code}")
-            print(f"DEBUG ProfileSerializer.to_internal_value: json_location_input={json_location_input}")
-        except Exception:
-            pass
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "ProfileSerializer.to_internal_value: content_type=%s data keys=%s "
+                "user_location_input=(%s, %s, %s) pickup_location_input=(%s, %s, %s) json_location_input=%s",
+                getattr(self.context.get('request'), 'content_type', None), list(data.keys()),
+                location_name, location_country, location_country_code,
+                pickup_location_name, pickup_location_country, pickup_location_country_code,
+                json_location_input,
+            )
 
         # Create a mutable copy of data
         data = data.copy()
@@ -303,7 +326,7 @@ class ProfileSerializer(serializers.ModelSerializer):
         if json_location_input and isinstance(json_location_input, dict):
             # JSON format is already in the correct structure
             if all(key in json_location_input for key in ['name', 'country', 'countryCode']):
-                print(f"DEBUG ProfileSerializer.to_internal_value: Using JSON format location: {json_location_input}")
+                logger.debug("ProfileSerializer.to_internal_value: using JSON location %s", json_location_input)
                 # Ensure it's properly formatted for the update method
                 data['user_location_input'] = json_location_input
         # Convert form data to nested dict format (for backward compatibility)
@@ -317,8 +340,7 @@ class ProfileSerializer(serializers.ModelSerializer):
             data.pop('user_location_input[name]', None)
             data.pop('user_location_input[country]', None)
             data.pop('user_location_input[countryCode]', None)
-            print(
-                f"DEBUG ProfileSerializer.to_internal_value: Converted form data to nested format: {data.get('user_location_input')}")
+            logger.debug("ProfileSerializer.to_internal_value: converted form location %s", data['user_location_input'])
         elif pickup_location_name and pickup_location_country and pickup_location_country_code:
             data['user_location_input'] = {
                 'name': pickup_location_name,
@@ -328,8 +350,8 @@ class ProfileSerializer(serializers.ModelSerializer):
             data.pop('pickup_location_input[name]', None)
             data.pop('pickup_location_input[country]', None)
             data.pop('pickup_location_input[countryCode]', None)
-            print(
-                f"DEBUG ProfileSerializer.to_internal_value: Converted pickup_* to nested format: {data.get('user_location_input')}")
+            logger.debug("ProfileSerializer.to_internal_value: converted pickup_* location %s",
+                         data['user_location_input'])
 
         # Call parent class to continue validation
         ret = super().to_internal_value(data)
@@ -337,13 +359,11 @@ class ProfileSerializer(serializers.ModelSerializer):
         # Ensure user_location_input is included in validated data
         if 'user_location_input' in data:
             ret['user_location_input'] = data['user_location_input']
-            print(
-                f"DEBUG ProfileSerializer.to_internal_value: Added user_location_input to ret: {ret['user_location_input']}")
 
         return ret
 
     def update(self, instance, validated_data):
-        print(f"DEBUG ProfileSerializer.update: validated_data keys= {list(validated_data.keys())}")
+        logger.debug("ProfileSerializer.update: validated_data keys=%s", list(validated_data))
         profile_picture = validated_data.pop('profile_picture', None)
         front_side_identity_card = validated_data.pop('front_side_identity_card', None)
         back_side_identity_card = validated_data.pop('back_side_identity_card', None)
@@ -351,7 +371,6 @@ class ProfileSerializer(serializers.ModelSerializer):
 
         # Handle new location format
         user_location_input = validated_data.pop('user_location_input', None)
-        print(f"DEBUG ProfileSerializer.update: user_location_input= {user_location_input}")
 
         if user_location_input and isinstance(user_location_input, dict):
             # Check if we have the required location fields
@@ -359,9 +378,6 @@ class ProfileSerializer(serializers.ModelSerializer):
                 from listings.models import LocationData
                 from django.db import IntegrityError
 
-                print(
-                    f"DEBUG ProfileSerializer.update: Creating LocationData with: name={user_location_input['name']}, country={user_location_input['country']}, country_code={user_location_input['countryCode']}")
-
                 # Prepare location data
                 location_data = {
                     'name': user_location_input['name'],
@@ -381,12 +397,10 @@ class ProfileSerializer(serializers.ModelSerializer):
                         # If still not found, raise the original error
                         raise
 
-                print(
-                    f"DEBUG ProfileSerializer.update: LocationData created/found: {user_location}, created: {created}")
+                logger.debug("ProfileSerializer.update: location %s (created: %s)", user_location.pk, created)
 
                 # Link it to the profile
                 instance.user_location = user_location
-                print(f"DEBUG ProfileSerializer.update: Set instance.user_location to: {instance.user_location}")
 
                 # Also store in preferences for backward compatibility
                 preferences = instance.preferences
@@ -407,33 +421,21 @@ class ProfileSerializer(serializers.ModelSerializer):
                 }
                 # Convert preferences to JSON string
                 instance.preferences = json.dumps(preferences)
-                print(f"DEBUG ProfileSerializer.update: Updated preferences with location: {preferences['location']}")
             else:
-                print(
-                    f"DEBUG ProfileSerializer.update: Missing required location fields in user_location_input: {user_location_input}")
-        else:
-            print(f"DEBUG ProfileSerializer.update: No user_location_input found or not a dict")
+                logger.debug("ProfileSerializer.update: incomplete user_location_input %s", user_location_input)
 
         # Update Profile fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        if profile_picture:
-            instance.profile_picture_url = upload_image(profile_picture, f"verlo/profile/profile_{instance.user.id}")
-
-        if front_side_identity_card:
-            instance.front_side_identity_card_url = upload_image(front_side_identity_card,
-                                                                 f"verlo/front_id/front_id_{instance.user.id}")
-
-        if back_side_identity_card:
-            instance.back_side_identity_card_url = upload_image(back_side_identity_card,
-                                                                f"verlo/back_id/back_id_{instance.user.id}")
-
-        if selfie_photo:
-            instance.selfie_photo_url = upload_image(selfie_photo, f"verlo/selfie/selfie_{instance.user.id}")
+        self._upload_images(instance, {
+            'profile_picture': profile_picture,
+            'front_side_identity_card': front_side_identity_card,
+            'back_side_identity_card': back_side_identity_card,
+            'selfie_photo': selfie_photo,
+        })
 
         instance.save()
-        print(f"DEBUG ProfileSerializer.update: Saved instance with user_location: {instance.user_location}")
         return instance
 
 
@@ -618,7 +620,7 @@ class TelegramUserRegistrationSerializer(serializers.ModelSerializer):
 
     def validate_email(self, value):
         if value:
-            if User.objects.filter(email=value).exists():
+            if User.objects.with_email(value).exists():
                 raise serializers.ValidationError("A user with this email already exists.")
         return value
 
@@ -1,8 +1,13 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
-from .models import Profile
+from .models import CustomUser, Profile
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.create(user=instance)
+    elif CustomUser.profile.is_cached(instance):
+        # Persist changes made through user.profile (Profile.save writes only
+        # changed fields); a profile that was never loaded has none.
+        instance.profile.save()
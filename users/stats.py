@@ -0,0 +1,135 @@
+"""
+Materialised per-user statistics on Profile.
+
+The counters are only ever changed with single-statement F() updates issued
+from listing/request/review lifecycle signals (see listings.signals), so they
+stay correct under concurrency and profile reads never need aggregates.
+`reconcile_profile_stats` rebuilds them from source tables if they drift
+(e.g. after bulk queryset updates that bypass signals); migration
+0022_reconcile_profile_stats ran it once for the values written before.
+"""
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+
+from .models import Profile, PROFILE_STAT_FIELDS as STAT_FIELDS
+
+
+def profile_of(user_id):
+    return Profile.objects.filter(user_id=user_id)
+
+
+def owner_of(listing_id):
+    """
+    The profile of a travel listing's owner, resolved inside the UPDATE rather
+    than by loading the listing first.
+    """
+    return Profile.objects.filter(user__travellisting=listing_id)
+
+
+def bump(profiles, **deltas):
+    """Add `deltas` (field=amount) to the counters of `profiles`."""
+    profiles.update(**{field: F(field) + amount for field, amount in deltas.items()})
+
+
+def add_rating(profiles, rate):
+    total = F('total_rating_received')
+    profiles.update(
+        average_rating=(F('average_rating') * total + rate) / Cast(total + 1, FloatField()),
+        total_rating_received=total + 1,
+    )
+
+
+def remove_rating(profiles, rate):
+    total = F('total_rating_received')
+    profiles.update(
+        average_rating=Case(
+            When(total_rating_received__lte=1, then=Value(0.0)),
+            default=(F('average_rating') * total - rate) / Cast(total - 1, FloatField()),
+            output_field=FloatField(),
+        ),
+        total_rating_received=Case(
+            When(total_rating_received__lte=0, then=Value(0)),
+            default=total - 1,
+        ),
+    )
+
+
+def change_rating(profiles, old_rate, new_rate):
+    if old_rate == new_rate:
+        return
+    profiles.filter(total_rating_received__gt=0).update(
+        average_rating=F('average_rating') + (new_rate - old_rate) / Cast(F('total_rating_received'), FloatField()),
+    )
+
+
+def compute_stats(apps=None):
+    """
+    Return {user_id: {field: value}} computed from the source tables with one
+    grouped query per statistic.
+    """
+    if apps:
+        TravelListing, PackageRequest, Review = (
+            apps.get_model('listings', name) for name in ('TravelListing', 'PackageRequest', 'Review')
+        )
+    else:
+        from listings.models import TravelListing, PackageRequest, Review
+
+    stats = {}
+
+    def merge(rows, field):
+        for user_id, value in rows:
+            stats.setdefault(user_id, {})[field] = value
+
+    merge(TravelListing.objects.values_list('user').annotate(n=Count('id')).order_by(), 'total_trips_created')
+    merge(PackageRequest.objects.values_list('user').annotate(n=Count('id')).order_by(), 'total_offer_sent')
+    merge(
+        PackageRequest.objects.values_list('travel_listing__user').annotate(n=Count('id')).order_by(),
+        'total_offer_received',
+    )
+    merge(
+        PackageRequest.objects.filter(status='completed')
+        .values_list('travel_listing__user').annotate(n=Count('id')).order_by(),
+        'total_completed_deliveries',
+    )
+    for user_id, count, total in (
+        Review.objects.values_list('travel_listing__user')
+        .annotate(n=Count('id'), total=Sum('rate')).order_by()
+    ):
+        stats.setdefault(user_id, {}).update(
+            total_rating_received=count,
+            average_rating=total / count if count else 0,
+        )
+    return stats
+
+
+def reconcile(batch_size=500, apps=None):
+    """
+    Rewrite profile counters that differ from the source tables. Returns the
+    number of profiles corrected. Migrations pass their `apps` registry to use
+    the historical models.
+    """
+    profile_model = apps.get_model('users', 'Profile') if apps else Profile
+    stats = compute_stats(apps)
+    defaults = {field: 0 for field in STAT_FIELDS}
+    changed = []
+    fixed = 0
+    for profile in profile_model.objects.only('id', 'user_id', *STAT_FIELDS).iterator(chunk_size=batch_size):
+        expected = {**defaults, **stats.get(profile.user_id, {})}
+        dirty = False
+        for field, value in expected.items():
+            current = getattr(profile, field)
+            if field == 'average_rating' and abs(current - value) < 1e-9:
+                continue
+            if current != value:
+                setattr(profile, field, value)
+                dirty = True
+        if dirty:
+            changed.append(profile)
+        if len(changed) >= batch_size:
+            profile_model.objects.bulk_update(changed, STAT_FIELDS)
+            fixed += len(changed)
+            changed = []
+    if changed:
+        profile_model.objects.bulk_update(changed, STAT_FIELDS)
+        fixed += len(changed)
+    return fixed
@@ -1,3 +1,679 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from PIL import Image
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+from django.core import mail
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config import http
+from config.http import CircuitOpenError, ServiceClient
+from config.storage import FileSystemStorage, ImageStorage, prepare_image
+from config.utils import derived_image_url, image_variants, upload_images
+
+from .jwks import APPLE_ISSUER, KeyNotFound, KeySetCache, apple_keys, cache_max_age, verify_apple_identity_token
+from .mail import enqueue_email, send_pending
+from .models import OTP, CustomUser, DiditVerificationSession, EmailOutbox, classify_login_identifier
+from .otp import hash_code, issue as issue_otp, verify as verify_otp
+from .serializers import ProfileSerializer, UserRegistrationSerializer
+
+
+class FlakyBackend(LocmemBackend):
+    """Fails the first `failures` sends, then behaves like locmem."""
+    failures = 0
+
+    def send_messages(self, messages):
+        if FlakyBackend.failures:
+            FlakyBackend.failures -= 1
+            raise ConnectionError('SMTP unavailable')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_OUTBOX_SEND_ON_COMMIT=False)
+class EmailOutboxTests(TestCase):
+    def test_enqueue_does_not_send(self):
+        enqueue_email('a@example.com', 'Subject', 'Body', '<p>Body</p>')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.get().status, 'pending')
+
+    def test_send_pending_delivers_batch(self):
+        for i in range(3):
+            enqueue_email(f'user{i}@example.com', 'Subject', 'Body', '<p>Body</p>')
+        self.assertEqual(send_pending(batch_size=2), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(EmailOutbox.objects.exclude(status='sent').exists())
+        # Nothing left to send.
+        self.assertEqual(send_pending(), (0, 0))
+
+    @override_settings(
+        EMAIL_BACKEND='users.tests.FlakyBackend',
+        EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+        EMAIL_OUTBOX_BACKOFF_SECONDS=60,
+    )
+    def test_failed_send_backs_off_then_gives_up(self):
+        FlakyBackend.failures = 2
+        message = enqueue_email('a@example.com', 'Subject', 'Body')
+
+        self.assertEqual(send_pending(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        # Not due yet.
+        self.assertEqual(send_pending(), (0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_pending(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 2))
+        self.assertEqual(message.last_error, 'SMTP unavailable')
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_BACKOFF_SECONDS=60)
+    def test_unreachable_server_counts_as_an_attempt(self):
+        message = enqueue_email('a@example.com', 'Code', 'Your code is 123456', '<p>123456</p>')
+        connection = mock.Mock(**{'open.side_effect': ConnectionRefusedError('refused')})
+
+        self.assertEqual(send_pending(connection=connection), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertEqual(message.body, 'Your code is 123456')
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('users.mail', 'ERROR'):
+            self.assertEqual(send_pending(connection=connection), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.last_error), ('failed', 2, 'refused'))
+        self.assertEqual((message.body, message.html_body), ('', ''))
+
+    def test_bodies_are_blanked_when_finished_and_rows_purged(self):
+        sent = enqueue_email('a@example.com', 'Code', 'Your code is 123456', '<p>123456</p>')
+        self.assertEqual(send_pending(), (1, 0))
+        sent.refresh_from_db()
+        self.assertEqual((sent.status, sent.body, sent.html_body), ('sent', '', ''))
+        self.assertIn('123456', mail.outbox[0].body)
+
+        with override_settings(EMAIL_BACKEND='users.tests.FlakyBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=1):
+            FlakyBackend.failures = 1
+            failed = enqueue_email('b@example.com', 'Code', 'Your code is 654321')
+            self.assertEqual(send_pending(), (0, 1))
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.body), ('failed', ''))
+
+        pending = enqueue_email('c@example.com', 'Code', 'Your code is 111111')
+        EmailOutbox.objects.update(created_at=timezone.now() - timezone.timedelta(days=8))
+        with override_settings(EMAIL_OUTBOX_RETENTION_DAYS=7):
+            call_command('purge_otps', stdout=io.StringIO())
+        self.assertEqual(list(EmailOutbox.objects.values_list('pk', flat=True)), [pending.pk])
+
+    def test_admin_hides_bodies(self):
+        admin_user = CustomUser.objects.create_superuser(
+            username='root', email='root@example.com', password='x', phone_number='15550000099',
+        )
+        message = enqueue_email('a@example.com', 'Code', 'Your code is 123456')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:users_emailoutbox_change', args=[message.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, '123456')
+
+    def test_on_commit_dispatch_drains_queue(self):
+        with override_settings(EMAIL_OUTBOX_SEND_ON_COMMIT=True):
+            with self.captureOnCommitCallbacks() as callbacks:
+                enqueue_email('a@example.com', 'Subject', 'Body')
+        self.assertEqual(len(callbacks), 1)
+
+
+class KeySetCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = 0
+        self.keys = {'k1': 'key-1'}
+        self.max_age = 3600
+
+    def fetcher(self, url):
+        self.calls += 1
+        time.sleep(0.01)
+        return dict(self.keys), self.max_age
+
+    def test_steady_state_makes_no_fetches(self):
+        cache = KeySetCache('https://keys.example', self.fetcher)
+        for _ in range(100):
+            self.assertEqual(cache.get('k1'), 'key-1')
+        self.assertEqual(self.calls, 1)
+
+    def test_expired_keys_are_refetched(self):
+        self.max_age = 0
+        cache = KeySetCache('https://keys.example', self.fetcher)
+        cache.get('k1')
+        cache.get('k1')
+        self.assertEqual(self.calls, 2)
+
+    def test_kid_miss_refreshes_once_per_interval(self):
+        cache = KeySetCache('https://keys.example', self.fetcher, min_refresh_interval=0)
+        cache.get('k1')
+        self.keys['k2'] = 'key-2'
+        self.assertEqual(cache.get('k2'), 'key-2')
+        self.assertEqual(self.calls, 2)
+
+        cache = KeySetCache('https://keys.example', self.fetcher, min_refresh_interval=60)
+        cache.get('k1')
+        with self.assertRaises(KeyNotFound):
+            cache.get('unknown')
+        with self.assertRaises(KeyNotFound):
+            cache.get('unknown')
+        self.assertEqual(self.calls, 3)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        cache = KeySetCache('https://keys.example', self.fetcher)
+        threads = [threading.Thread(target=cache.get, args=('k1',)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+
+    def test_failed_refresh_keeps_serving_cached_keys(self):
+        self.max_age = 0
+        cache = KeySetCache('https://keys.example', self.fetcher)
+        cache.get('k1')
+        cache.fetcher = failing_fetcher
+        self.assertEqual(cache.get('k1'), 'key-1')
+
+    def test_cache_control_max_age(self):
+        self.assertEqual(cache_max_age({'Cache-Control': 'public, max-age=21600', 'Age': '600'}), 21000)
+        self.assertEqual(cache_max_age({}), 3600)
+
+
+def failing_fetcher(url):
+    raise ConnectionError('offline')
+
+
+class AppleTokenVerificationTests(SimpleTestCase):
+    def setUp(self):
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        jwk['kid'] = 'apple-1'
+        self.original_fetcher = apple_keys.fetcher
+        apple_keys.fetcher = lambda url: ({'apple-1': jwk}, 3600)
+        apple_keys.clear()
+
+    def tearDown(self):
+        apple_keys.fetcher = self.original_fetcher
+        apple_keys.clear()
+
+    def token(self, kid='apple-1', **claims):
+        payload = {'iss': APPLE_ISSUER, 'aud': 'com.example.app', 'sub': 'apple-user',
+                   'exp': int(time.time()) + 60, **claims}
+        return jwt.encode(payload, self.private_key, algorithm='RS256', headers={'kid': kid})
+
+    def test_valid_token(self):
+        decoded = verify_apple_identity_token(self.token(), 'com.example.app')
+        self.assertEqual(decoded['sub'], 'apple-user')
+
+    def test_wrong_audience_and_unknown_kid_are_invalid(self):
+        with self.assertRaises(jwt.InvalidTokenError):
+            verify_apple_identity_token(self.token(), 'com.other.app')
+        with self.assertRaises(jwt.InvalidTokenError):
+            verify_apple_identity_token(self.token(kid='rotated'), 'com.example.app')
+
+
+@override_settings(DIDIT_WEBHOOK_SECRET='whsec', DIDIT_STATUS_MAX_AGE=60)
+class DiditVerificationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='kyc@example.com', username='kyc', phone_number='15550000001', password='x',
+        )
+        self.session = DiditVerificationSession.objects.create(
+            user=self.user, session_id='sess-1', status='In Progress',
+        )
+        self.client = APIClient()
+
+    def post_webhook(self, payload, secret='whsec', timestamp=None):
+        body = json.dumps(payload).encode()
+        timestamp = str(timestamp or int(time.time()))
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            reverse('didit_webhook'), body, content_type='application/json',
+            HTTP_X_SIGNATURE=signature, HTTP_X_TIMESTAMP=timestamp,
+        )
+
+    def test_signed_webhook_updates_session_and_user(self):
+        response = self.post_webhook({'session_id': 'sess-1', 'status': 'Approved'})
+        self.assertEqual(response.status_code, 200)
+        self.session.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(self.session.status, 'Approved')
+        self.assertIsNotNone(self.session.status_checked_at)
+        self.assertEqual(self.user.is_identity_verified, 'approved')
+
+    def test_rejects_bad_signature_and_stale_timestamp(self):
+        self.assertEqual(
+            self.post_webhook({'session_id': 'sess-1', 'status': 'Approved'}, secret='wrong').status_code, 401)
+        self.assertEqual(
+            self.post_webhook({'session_id': 'sess-1', 'status': 'Approved'},
+                              timestamp=int(time.time()) - 3600).status_code, 401)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'In Progress')
+
+    def test_out_of_order_delivery_is_ignored(self):
+        now = int(time.time())
+        self.post_webhook({'session_id': 'sess-1', 'status': 'Approved'}, timestamp=now)
+        self.post_webhook({'session_id': 'sess-1', 'status': 'In Review'}, timestamp=now - 10)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'Approved')
+
+    def test_webhooks_from_the_same_second_apply_in_arrival_order(self):
+        # Our own clock is ahead of Didit's whole-second timestamps.
+        now = int(time.time())
+        with mock.patch('users.didit.timezone.now', return_value=timezone.now() + timedelta(seconds=2)):
+            self.post_webhook({'session_id': 'sess-1', 'status': 'In Review'}, timestamp=now)
+            self.post_webhook({'session_id': 'sess-1', 'status': 'Approved'}, timestamp=now)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'Approved')
+        self.assertEqual(self.session.status_sent_at.timestamp(), now)
+
+    def test_status_check_reads_db_and_refreshes_only_when_stale(self):
+        self.client.force_authenticate(self.user)
+        url = '/api/users/users/check_verification_status/'
+        with mock.patch('users.views.refresh_in_background') as refresh:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['data']['is_identity_verified'], 'in_progress')
+            self.assertEqual(refresh.call_count, 1)
+
+            DiditVerificationSession.objects.update(status_checked_at=timezone.now())
+            self.client.get(url)
+            self.assertEqual(refresh.call_count, 1)
+
+            DiditVerificationSession.objects.update(status='Approved', status_checked_at=None)
+            response = self.client.get(url)
+            self.assertEqual(response.json()['data']['is_identity_verified'], 'approved')
+            self.assertEqual(refresh.call_count, 1)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    statuses = []
+
+    def do_GET(self):
+        code = StubHandler.statuses.pop(0) if StubHandler.statuses else 200
+        body = b'{"ok": true}'
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServiceClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}/'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def make_client(self, **options):
+        return ServiceClient('stub', **{**http.DEFAULTS, 'backoff_factor': 0, **options})
+
+    def test_retries_transient_status_and_reuses_connection(self):
+        StubHandler.statuses = [503, 200]
+        client = self.make_client()
+        self.assertEqual(client.get(self.url).status_code, 200)
+        self.assertEqual(client.get(self.url).status_code, 200)
+        self.assertEqual(client.stats['requests'], 2)
+        self.assertEqual(client.stats['errors'], 0)
+
+    def test_circuit_opens_after_failures_and_half_opens(self):
+        client = self.make_client(retries=0, failure_threshold=2, reset_timeout=0.2)
+        StubHandler.statuses = [500, 500]
+        client.get(self.url)
+        client.get(self.url)
+        self.assertEqual(client.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            client.get(self.url)
+        self.assertEqual(client.stats['rejected'], 1)
+
+        time.sleep(0.25)
+        self.assertEqual(client.get(self.url).status_code, 200)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_listeners_receive_latency(self):
+        seen = []
+        listener = lambda *args: seen.append(args)
+        http.add_listener(listener)
+        try:
+            self.make_client().get(self.url)
+        finally:
+            http.remove_listener(listener)
+        self.assertEqual(seen[0][:3], ('stub', 'GET', 200))
+        self.assertGreater(seen[0][3], 0)
+
+
+def image_upload(name, size=(64, 64), color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class SlowStorage(FileSystemStorage):
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def upload(self, file, public_id=None):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            time.sleep(0.2)
+            return super().upload(file, public_id)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+class ProfileImageUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_STORAGE_BACKEND='users.tests.SlowStorage',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='img@example.com', username='img', phone_number='15550000002', password='x',
+        )
+
+    def test_four_images_upload_concurrently(self):
+        files = {field: image_upload(f'{field}.jpg') for field in ProfileSerializer.IMAGE_UPLOADS}
+        serializer = ProfileSerializer(self.user.profile, data=files, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        SlowStorage.max_active = 0
+        profile = serializer.save()
+        self.assertGreater(SlowStorage.max_active, 1)
+        self.assertEqual(profile.profile_picture_url, f'/media/verlo/profile/profile_{self.user.id}.jpg')
+        self.assertEqual(profile.selfie_photo_url, f'/media/verlo/selfie/selfie_{self.user.id}.jpg')
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, f'verlo/front_id/front_id_{self.user.id}.jpg')))
+
+    def test_incomplete_backend_cannot_be_created(self):
+        class UploadOnly(ImageStorage):
+            def upload(self, file, public_id=None):
+                return '/media/x'
+
+        with self.assertRaises(TypeError):
+            UploadOnly()
+
+    def test_raw_bytes_are_accepted(self):
+        [result] = upload_images([image_upload('raw.jpg').read()], ['raw/1'])
+        self.assertTrue(result.ok, result.error)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, 'raw', '1')))
+
+    def test_large_image_is_downscaled_before_upload(self):
+        large = image_upload('big.png', size=(4000, 3000))
+        prepared = prepare_image(large)
+        with Image.open(prepared) as image:
+            self.assertEqual(image.size, (2048, 1536))
+        self.assertEqual(prepared.name, 'big.jpg')
+        small = image_upload('small.jpg')
+        self.assertIs(prepare_image(small), small)
+
+    def test_batch_reports_per_file_results_and_deduplicates(self):
+        avatar = image_upload('avatar.jpg')
+        other = image_upload('other.jpg', color='blue')
+        results = upload_images([avatar, other, 'missing.jpg'], ['avatars/1', 'avatars/2', 'avatars/3'])
+        self.assertEqual([r.ok for r in results], [True, True, False])
+        self.assertEqual(results[0].url, '/media/avatars/1.jpg')
+
+        # Same bytes again under the same public_id: no storage call.
+        with mock.patch.object(SlowStorage, 'upload', return_value='/media/avatars/1b.jpg') as upload:
+            again = upload_images([image_upload('avatar.jpg'), image_upload('avatar.jpg', color='green')],
+                                  ['avatars/1', 'avatars/1b'])
+        self.assertTrue(again[0].deduplicated)
+        self.assertEqual(again[0].url, results[0].url)
+        self.assertTrue(again[1].ok)
+        self.assertFalse(again[1].deduplicated)
+        self.assertEqual(again[1].url, '/media/avatars/1b.jpg')
+        self.assertEqual(upload.call_count, 1)
+
+        # Different content replaces the record.
+        replaced = upload_images([other], ['avatars/1'])[0]
+        self.assertFalse(replaced.deduplicated)
+        self.assertFalse(upload_images([avatar], ['avatars/1'])[0].deduplicated)
+
+    def test_files_without_public_id_are_stored_once_by_content(self):
+        first = upload_images([image_upload('a.jpg')])[0]
+        self.assertRegex(first.url, r'^/media/uploads/[0-9a-f]{64}\.jpg$')
+        with mock.patch.object(SlowStorage, 'upload') as upload:
+            again = upload_images([image_upload('renamed.jpg'), image_upload('a.jpg')])
+        upload.assert_not_called()
+        self.assertTrue(all(result.deduplicated and result.url == first.url for result in again))
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='variants@example.com', username='variants', phone_number='15550000003', password='x',
+        )
+        self.user.profile.profile_picture_url = (
+            'https://res.cloudinary.com/demo/image/upload/v1712345678/verlo/profile/profile_1.jpg'
+        )
+        self.user.profile.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cloudinary_urls_get_memoized_derivatives(self):
+        derived_image_url.cache_clear()
+        variants = image_variants(self.user.profile.profile_picture_url, ('thumbnail', 'medium'))
+        self.assertIn('c_auto,f_auto,g_auto,h_150,q_auto,w_150/v1712345678/verlo/profile/profile_1',
+                      variants['thumbnail'])
+        self.assertIn('h_600', variants['medium'])
+        image_variants(self.user.profile.profile_picture_url, ('thumbnail',))
+        self.assertEqual(derived_image_url.cache_info().hits, 1)
+        self.assertEqual(image_variants('/media/a.jpg', ('thumbnail',)), {'thumbnail': '/media/a.jpg'})
+        self.assertIsNone(image_variants('', ('thumbnail',)))
+
+    def test_sizes_follow_query_param(self):
+        data = ProfileSerializer(self.user.profile).data
+        self.assertEqual(set(data['profile_picture_urls']), {'thumbnail', 'medium'})
+        response = self.client.get(
+            reverse('profile-detail', args=[self.user.profile.pk]), {'image_sizes': 'thumbnail'})
+        self.assertEqual(set(response.json()['data']['profile_picture_urls']), {'thumbnail'})
+
+
+@override_settings(EMAIL_OUTBOX_SEND_ON_COMMIT=False)
+class OTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = CustomUser.objects.create_user(
+            email='otp@example.com', username='otp', phone_number='15550000004', password='x',
+        )
+        self.client = APIClient()
+
+    def verify(self, code):
+        return self.client.post(reverse('customuser-verify-otp'), {
+            'user_id': self.user.id, 'otp': code, 'purpose': 'email_verification',
+        }, format='json')
+
+    def test_codes_are_hashed_and_single_use(self):
+        first = issue_otp(self.user, 'email_verification')
+        code = issue_otp(self.user, 'email_verification')
+        stored = OTP.objects.filter(is_used=False).get()
+        self.assertEqual(stored.code, hash_code(self.user.id, 'email_verification', code))
+        self.assertNotIn(code, stored.code)
+        if first != code:
+            self.assertEqual(self.verify(first).status_code, 400)
+        self.assertEqual(self.verify(code).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_email_verified)
+        self.assertEqual(self.verify(code).status_code, 400)
+
+    def test_concurrent_verification_consumes_code_once(self):
+        code = issue_otp(self.user, 'email_verification')
+        compare = hmac.compare_digest
+
+        def used_meanwhile(a, b):
+            # Another request consumes the code between our read and update.
+            OTP.objects.filter(user=self.user).update(is_used=True)
+            return compare(a, b)
+
+        with mock.patch('users.otp.hmac.compare_digest', side_effect=used_meanwhile):
+            self.assertIsNone(verify_otp(self.user.id, 'email_verification', code))
+        self.assertEqual(self.verify(code).status_code, 400)
+
+    @override_settings(OTP_TTL=60)
+    def test_expired_codes_fail_and_are_purged(self):
+        code = issue_otp(self.user, 'email_verification')
+        OTP.objects.update(created_at=timezone.now() - timezone.timedelta(seconds=61))
+        self.assertEqual(self.verify(code).status_code, 400)
+        issue_otp(self.user, 'password_reset')
+        call_command('purge_otps', stdout=io.StringIO())
+        self.assertEqual(list(OTP.objects.values_list('purpose', flat=True)), ['password_reset'])
+
+    def test_wrong_codes_are_rate_limited(self):
+        code = issue_otp(self.user, 'email_verification')
+        wrong = '000000' if code != '000000' else '111111'
+        for _ in range(5):
+            self.assertEqual(self.verify(wrong).status_code, 400)
+        # Only the serializer's user lookup; no OTP query.
+        with self.assertNumQueries(1):
+            response = self.verify(code)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertFalse(response.json()['success'])
+
+    def test_resend_storm_is_rate_limited(self):
+        url = reverse('customuser-resend-otp')
+        payload = {'user_id': self.user.id, 'purpose': 'email_verification'}
+        codes = [self.client.post(url, payload, format='json').status_code for _ in range(4)]
+        self.assertEqual(codes, [200, 200, 200, 429])
+        self.assertEqual(OTP.objects.count(), 3)
+
+
+class LoginIdentifierTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='Mixed.Case@Example.com', username='mixed', phone_number='15550000010', password='x',
+        )
+
+    def test_emails_are_unique_regardless_of_case(self):
+        self.assertEqual(CustomUser.objects.with_email(' mixed.case@example.COM ').get(), self.user)
+        serializer = UserRegistrationSerializer(data={
+            'email': 'MIXED.case@example.com', 'username': 'other', 'phone_number': '15550000011',
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('email', serializer.errors)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CustomUser.objects.create_user(
+                email='mixed.case@example.com', username='other', phone_number='15550000011', password='x',
+            )
+
+    def test_classification(self):
+        self.assertEqual(classify_login_identifier(' Mixed.Case@Example.com '), ('email', 'mixed.case@example.com'))
+        self.assertEqual(classify_login_identifier('+1 (555) 000-0010'), ('phone', '15550000010'))
+        self.assertEqual(classify_login_identifier('mixed'), ('username', 'mixed'))
+        self.assertEqual(classify_login_identifier('12345'), ('username', '12345'))
+
+    def test_lookup_is_one_query_per_kind(self):
+        for identifier in ('MIXED.case@example.com', '+1 555-000-0010', 'mixed'):
+            with self.subTest(identifier=identifier), self.assertNumQueries(1):
+                self.assertEqual(CustomUser.objects.get_by_login_identifier(identifier), self.user)
+
+    def test_falls_back_to_username(self):
+        # Usernames that look like an email or a phone number.
+        at = CustomUser.objects.create_user(
+            email='at@example.com', username='team@velro', phone_number='15550000012', password='x',
+        )
+        digits = CustomUser.objects.create_user(
+            email='digits@example.com', username='5550000099', phone_number='15550000013', password='x',
+        )
+        for identifier, user in (('team@velro', at), ('5550000099', digits)):
+            with self.subTest(identifier=identifier), self.assertNumQueries(2):
+                self.assertEqual(CustomUser.objects.get_by_login_identifier(identifier), user)
+        for identifier in ('nobody@example.com', '15559999999', 'nobody', '   '):
+            with self.subTest(identifier=identifier), self.assertRaises(CustomUser.DoesNotExist):
+                CustomUser.objects.get_by_login_identifier(identifier)
+
+
+@override_settings(EMAIL_OUTBOX_SEND_ON_COMMIT=False)
+class SaveQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = CustomUser.objects.create_user(
+            email='queries@example.com', username='queries', phone_number='15550000005', password='pw',
+        )
+        self.client = APIClient()
+
+    def test_login(self):
+        # user, outstanding token, profile for the response
+        with self.assertNumQueries(3):
+            response = self.client.post(reverse('user_login'), {
+                'username': 'queries@example.com', 'password': 'pw',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_verify_otp_updates_only_changed_user_fields(self):
+        code = issue_otp(self.user, 'email_verification')
+        # user (serializer), otp, otp update, user update; no profile writes
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('customuser-verify-otp'), {
+                'user_id': self.user.id, 'otp': code, 'purpose': 'email_verification',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_check_verification_status(self):
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        url = reverse('customuser-check-verification-status')
+        # session, user status update, profile for the response
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # Status unchanged: nothing to write (and the profile is already loaded).
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_profile_saves_write_only_changed_fields(self):
+        profile = CustomUser.objects.get(pk=self.user.pk).profile
+        with self.assertNumQueries(0):
+            profile.save()
+        profile.notification_setting['email'] = False
+        profile.total_trips_created = 99
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"notification_setting"', queries[0]['sql'])
+        self.assertNotIn('"total_trips_created"', queries[0]['sql'])
+        self.assertNotIn('"full_name"', queries[0]['sql'])
+        profile.refresh_from_db()
+        self.assertEqual((profile.notification_setting, profile.total_trips_created), ({'email': False}, 0))
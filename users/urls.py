@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 # from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     UserViewSet, ProfileViewSet, UserLoginView,
-    GoogleSignInView, AppleSignInView, IdTypeViewSet,TokenRefreshView, UserLogoutView
+    GoogleSignInView, AppleSignInView, IdTypeViewSet,TokenRefreshView, UserLogoutView,
+    DiditWebhookView
 )
 
 router = DefaultRouter()
@@ -18,5 +19,6 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('google/signin/', GoogleSignInView.as_view(), name='google_signin'),
     path('apple/signin/', AppleSignInView.as_view(), name='apple_signin'),
+    path('didit/webhook/', DiditWebhookView.as_view(), name='didit_webhook'),
     # ID verification is handled by the UserViewSet's verify_id_document action at /users/verify_id_document/
 ]
\ No newline at end of file
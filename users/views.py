@@ -4,7 +4,7 @@ from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, Throttled
 from django.contrib.auth import get_user_model, authenticate
 from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -18,26 +18,49 @@ from .serializers import (
     DiditVerificationSessionSerializer
 )
 from .utils import send_verification_email
-import random
-import string
-import requests
+from .jwks import verify_apple_identity_token, verify_google_id_token
+from .otp import check_issue_limits, issue as issue_otp, verify as verify_otp_code
+from .firebase import firebase_auth as get_firebase_auth
+from .didit import (
+    apply_status, is_out_of_order, is_stale, refresh_in_background, sync_user_status, verify_webhook_signature,
+)
+import logging
 import os
 from config.views import StandardResponseViewSet
 from config.utils import standard_response
+from config.http import get_client, twilio_client
 from django.db import models
 from rest_framework_simplejwt.views import TokenRefreshView as BaseTokenRefreshView
 from django.conf import settings
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
-import requests
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-import jwt
-from datetime import datetime
-from jwt.algorithms import RSAAlgorithm
+from django.core.exceptions import ImproperlyConfigured
+from datetime import datetime, timezone as dt_timezone
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
+
+LOGGED_LOCATION_FIELDS = (
+    'pickup_location_input[name]', 'pickup_location_input[country]', 'pickup_location_input[countryCode]',
+    'user_location_input[name]', 'user_location_input[country]', 'user_location_input[countryCode]',
+)
+
+
+def _log_profile_payload(action, request):
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    try:
+        data, files = request.data, request.FILES
+    except Exception:
+        logger.debug("ProfileViewSet.%s: unreadable payload", action, exc_info=True)
+        return
+    logger.debug(
+        "ProfileViewSet.%s: content_type=%s data keys=%s locations=%s FILES keys=%s",
+        action, request.content_type, list(data.keys()),
+        {field: data.get(field) for field in LOGGED_LOCATION_FIELDS if field in data},
+        list(files.keys()),
+    )
+
 
 class UserLoginView(APIView):
     permission_classes = [AllowAny]
@@ -52,16 +75,10 @@ class UserLoginView(APIView):
                 error=['Please provide both username/email and password']
             )
 
-        # Try to find the user by email or username or phone (normalize phone)
-        normalized_username = username
-        if username and username.replace('+', '').isdigit():
-            normalized_username = ''.join(filter(str.isdigit, username))
+        # Classify the identifier (email / phone / username) and look it up with a
+        # single indexed equality query instead of an OR across three columns
         try:
-            user = CustomUser.objects.get(
-                models.Q(email=username) |
-                models.Q(username=username) |
-                models.Q(phone_number=normalized_username)
-            )
+            user = CustomUser.objects.get_by_login_identifier(username)
         except CustomUser.DoesNotExist:
             return standard_response(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -70,7 +87,7 @@ class UserLoginView(APIView):
 
         # Check if the password is correct
         if not user.check_password(password):
-            print("Invalid password attempt for user:", user.username, "Email:", user.email)
+            logger.info("Invalid password attempt for user %s", user.pk)
             return standard_response(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 error=['Invalid credentials']
@@ -153,17 +170,11 @@ class UserViewSet(StandardResponseViewSet):
         """
         Ensure users can only update their own account
         """
-        try:
-            print("DEBUG UserViewSet.update: content_type=", request.content_type)
-            print("DEBUG UserViewSet.update: data keys=", list(request.data.keys()))
-            if 'profile' in request.data:
-                try:
-                    profile_payload = request.data.get('profile')
-                    print("DEBUG UserViewSet.update: profile payload type=", type(profile_payload))
-                except Exception as e:
-                    print("DEBUG UserViewSet.update: error reading profile payload:", str(e))
-        except Exception as e:
-            print("DEBUG UserViewSet.update: logging error:", str(e))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "UserViewSet.update: content_type=%s data keys=%s profile payload type=%s",
+                request.content_type, list(request.data.keys()), type(request.data.get('profile')).__name__,
+            )
         if not request.user.is_superuser and request.user.id != int(kwargs.get('pk')):
             return standard_response(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -187,17 +198,11 @@ class UserViewSet(StandardResponseViewSet):
         """
         Ensure users can only partially update their own account
         """
-        try:
-            print("DEBUG UserViewSet.partial_update: content_type=", request.content_type)
-            print("DEBUG UserViewSet.partial_update: data keys=", list(request.data.keys()))
-            if 'profile' in request.data:
-                try:
-                    profile_payload = request.data.get('profile')
-                    print("DEBUG UserViewSet.partial_update: profile payload type=", type(profile_payload))
-                except Exception as e:
-                    print("DEBUG UserViewSet.partial_update: error reading profile payload:", str(e))
-        except Exception as e:
-            print("DEBUG UserViewSet.partial_update: logging error:", str(e))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "UserViewSet.partial_update: content_type=%s data keys=%s profile payload type=%s",
+                request.content_type, list(request.data.keys()), type(request.data.get('profile')).__name__,
+            )
         if not request.user.is_superuser:
             if request.user.id != int(kwargs.get('pk')):
                 return standard_response(
@@ -243,9 +248,9 @@ class UserViewSet(StandardResponseViewSet):
         # Create the user with location data
         serializer = UserRegistrationSerializer(data=data)
         if serializer.is_valid():
+            check_issue_limits(request)
             user = serializer.save()
-            otp = ''.join(random.choices(string.digits, k=6))
-            OTP.objects.create(user=user, code=otp, purpose='email_verification')
+            otp = issue_otp(user, 'email_verification')
             try:
                 send_verification_email(user, otp)
                 return standard_response(
@@ -282,23 +287,13 @@ class UserViewSet(StandardResponseViewSet):
         otp_code = serializer.validated_data['otp']
         purpose = serializer.validated_data['purpose']
 
-        try:
-            otp = OTP.objects.get(
-                user_id=user_id,
-                code=otp_code,
-                purpose=purpose,
-                is_used=False,
-                created_at__gte=timezone.now() - timezone.timedelta(minutes=10)
-            )
-        except OTP.DoesNotExist:
+        otp = verify_otp_code(user_id, purpose, otp_code, request)
+        if otp is None:
             return standard_response(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 error=['Invalid or expired OTP']
             )
 
-        otp.is_used = True
-        otp.save()
-
         if purpose == 'email_verification':
             otp.user.is_email_verified = True
             otp.user.save()
@@ -332,8 +327,7 @@ class UserViewSet(StandardResponseViewSet):
             )
 
         # Generate new OTP
-        otp = ''.join(random.choices(string.digits, k=6))
-        OTP.objects.create(user=user, code=otp, purpose=purpose)
+        otp = issue_otp(user, purpose, request)
 
         # Send OTP via email
         try:
@@ -368,7 +362,7 @@ class UserViewSet(StandardResponseViewSet):
             if verification_method == 'email':
                 # Find user by email
                 try:
-                    user = User.objects.get(email=identifier)
+                    user = User.objects.with_email(identifier).get()
                 except User.DoesNotExist:
                     return standard_response(
                         status_code=status.HTTP_404_NOT_FOUND,
@@ -376,8 +370,7 @@ class UserViewSet(StandardResponseViewSet):
                     )
 
                 # Generate OTP
-                otp = ''.join(random.choices(string.digits, k=6))
-                OTP.objects.create(user=user, code=otp, purpose='password_reset')
+                otp = issue_otp(user, 'password_reset', request)
 
                 # Send OTP via email
                 try:
@@ -407,6 +400,7 @@ class UserViewSet(StandardResponseViewSet):
                         error=['User not found']
                     )
 
+                check_issue_limits(request, user)
                 try:
                     # Format phone number with E.164 format
                     phone_number = user.phone_number
@@ -425,7 +419,7 @@ class UserViewSet(StandardResponseViewSet):
                     }
 
                     # Make the API request to send verification code
-                    response = requests.post(
+                    response = get_client('didit').post(
                         settings.DIDIT_PHONE_SEND_URL,
                         headers=headers,
                         json=payload
@@ -478,6 +472,8 @@ class UserViewSet(StandardResponseViewSet):
                     error=['Invalid verification method. Use "email" or "phone"']
                 )
 
+        except Throttled:
+            raise
         except Exception as e:
             return standard_response(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -554,24 +550,13 @@ class UserViewSet(StandardResponseViewSet):
             )
 
         if verification_method == 'email':
-            try:
-                otp = OTP.objects.get(
-                    user_id=user_id,
-                    code=verification_code,
-                    purpose='password_reset',
-                    is_used=False,
-                    created_at__gte=timezone.now() - timezone.timedelta(minutes=10)
-                )
-            except OTP.DoesNotExist:
+            # Marks the OTP as used
+            if verify_otp_code(user.pk, 'password_reset', verification_code, request) is None:
                 return standard_response(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     error=['Invalid or expired OTP']
                 )
 
-            # Mark OTP as used
-            otp.is_used = True
-            otp.save()
-
         elif verification_method == 'phone':
             try:
                 # Format phone number with E.164 format
@@ -592,7 +577,7 @@ class UserViewSet(StandardResponseViewSet):
                 }
 
                 # Make the API request to verify code
-                response = requests.post(
+                response = get_client('didit').post(
                     settings.DIDIT_PHONE_CHECK_URL,
                     headers=headers,
                     json=payload
@@ -668,15 +653,7 @@ class UserViewSet(StandardResponseViewSet):
             )
 
         if verification_method == 'email':
-            try:
-                otp = OTP.objects.get(
-                    user_id=user_id,
-                    code=verification_code,
-                    purpose='password_reset',
-                    is_used=False,
-                    created_at__gte=timezone.now() - timezone.timedelta(minutes=10)
-                )
-            except OTP.DoesNotExist:
+            if verify_otp_code(user.pk, 'password_reset', verification_code, request, consume=False) is None:
                 return standard_response(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     error=['Invalid or expired OTP']
@@ -688,9 +665,11 @@ class UserViewSet(StandardResponseViewSet):
             )
 
         elif verification_method == 'phone':
+            from twilio.base.exceptions import TwilioRestException
+
             try:
-                # Initialize Twilio client
-                client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+                # Shared Twilio client (pooled connections, timeouts, circuit breaker)
+                client = twilio_client()
 
                 # Verify the code
                 verification_check = client.verify.v2.services(settings.TWILIO_VERIFY_SERVICE) \
@@ -740,6 +719,7 @@ class UserViewSet(StandardResponseViewSet):
 
         user = request.user
         phone_number = serializer.validated_data['phone_number']
+        check_issue_limits(request, user)
 
         # Call Didit.me API to send verification code
         try:
@@ -755,7 +735,7 @@ class UserViewSet(StandardResponseViewSet):
             }
 
             # Make the API request
-            response = requests.post(
+            response = get_client('didit').post(
                 settings.DIDIT_PHONE_SEND_URL,
                 headers=headers,
                 json=payload
@@ -836,7 +816,7 @@ class UserViewSet(StandardResponseViewSet):
             }
 
             # Make the API request
-            response = requests.post(
+            response = get_client('didit').post(
                 settings.DIDIT_PHONE_CHECK_URL,
                 headers=headers,
                 json=payload
@@ -968,11 +948,7 @@ class UserViewSet(StandardResponseViewSet):
 
         # Verify the Google id_token
         try:
-            idinfo = id_token.verify_oauth2_token(
-                id_token_str,
-                google_requests.Request(),
-                settings.GOOGLE_CLIENT_ID
-            )
+            idinfo = verify_google_id_token(id_token_str, settings.GOOGLE_CLIENT_ID)
             email = idinfo['email']
             first_name = idinfo.get('given_name', '')
             last_name = idinfo.get('family_name', '')
@@ -983,7 +959,7 @@ class UserViewSet(StandardResponseViewSet):
             )
 
         # Check if email or username already exists
-        if CustomUser.objects.filter(email=email).exists():
+        if CustomUser.objects.with_email(email).exists():
             return standard_response(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 error=["A user with this email already exists."]
@@ -1034,11 +1010,7 @@ class UserViewSet(StandardResponseViewSet):
                 error=['Google id_token is required']
             )
         try:
-            idinfo = id_token.verify_oauth2_token(
-                id_token_str,
-                google_requests.Request(),
-                settings.GOOGLE_CLIENT_ID
-            )
+            idinfo = verify_google_id_token(id_token_str, settings.GOOGLE_CLIENT_ID)
             email = idinfo['email']
             first_name = idinfo.get('given_name', '')
             last_name = idinfo.get('family_name', '')
@@ -1064,11 +1036,6 @@ class UserViewSet(StandardResponseViewSet):
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def register_telegram(self, request):
         api_key = request.headers.get('X-Telegram-Bot-Api-Key')
-        print("-----------")
-        print(api_key)
-        print(getattr(settings, 'TELEGRAM_BOT_API', None))
-        print(settings.TELEGRAM_BOT_API)
-        print("-----------")
         if not api_key or api_key != getattr(settings, 'TELEGRAM_BOT_API', None):
             return standard_response(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -1095,15 +1062,18 @@ class UserViewSet(StandardResponseViewSet):
         Verifies a user's phone number using a Firebase ID token.
         Expects: { "firebase_id_token": "...", "user_id": ... }
         """
-        from django.conf import settings
         try:
-            import firebase_admin
-            from firebase_admin import auth as firebase_auth
+            firebase_auth = get_firebase_auth()
         except ImportError:
             return standard_response(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 error=["firebase-admin is not installed on the server."]
             )
+        except ImproperlyConfigured as e:
+            return standard_response(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                error=[str(e)]
+            )
 
         firebase_id_token = request.data.get('firebase_id_token')
         user_id = request.data.get('user_id')
@@ -1119,19 +1089,9 @@ class UserViewSet(StandardResponseViewSet):
                 status_code=status.HTTP_404_NOT_FOUND,
                 error=["User not found."]
             )
-        # Initialize Firebase app if not already
-        if not firebase_admin._apps:
-            cred = getattr(settings, 'FIREBASE_CREDENTIAL', None)
-            if cred is None:
-                return standard_response(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    error=["FIREBASE_CREDENTIAL is not configured in settings."]
-                )
-            firebase_admin.initialize_app(cred)
         try:
             decoded_token = firebase_auth.verify_id_token(firebase_id_token)
-            print("Decoded Firebase Token: ##################33")
-            print(decoded_token)
+            logger.debug("Verified Firebase token for uid %s", decoded_token.get('uid'))
             phone_number = decoded_token.get('phone_number')
             if not phone_number:
                 return standard_response(
@@ -1222,27 +1182,7 @@ class UserViewSet(StandardResponseViewSet):
                 message = 'ID verification session created successfully'
 
             # Update user's identity verification status based on session status
-            status_lower = session_data['status'].lower()
-            if status_lower == 'approved':
-                user.is_identity_verified = 'approved'
-            elif status_lower in ['declined', 'rejected']:
-                user.is_identity_verified = 'declined'
-            elif status_lower == 'in progress':
-                user.is_identity_verified = 'in_progress'
-            elif status_lower == 'kyc expired':
-                user.is_identity_verified = 'kyc_expired'
-            elif status_lower == 'in review':
-                user.is_identity_verified = 'in_review'
-            elif status_lower == 'expired':
-                user.is_identity_verified = 'expired'
-            elif status_lower == 'abandoned':
-                user.is_identity_verified = 'abandoned'
-            elif status_lower == 'not started':
-                user.is_identity_verified = 'not_started'
-            else:
-                user.is_identity_verified = 'pending'
-
-            user.save()
+            sync_user_status(user, session_data['status'])
 
             # Return the verification session data
             return standard_response(
@@ -1264,18 +1204,16 @@ class UserViewSet(StandardResponseViewSet):
     @action(detail=False, methods=['get'])
     def check_verification_status(self, request):
         """
-        Checks the verification status directly from Didit.me API
-        Updates the user profile if the verification status has changed
-        Returns the complete user profile with the updated status
+        Returns the user profile with the verification status stored from
+        Didit webhooks. If the stored status is older than DIDIT_STATUS_MAX_AGE
+        and not final, Didit is asked again in the background; the next poll
+        sees the result.
         """
         # Get the user - either the authenticated user or by user_id param
         user = request.user
         user_id_param = request.query_params.get('user_id')
         session_id = request.query_params.get('session_id')
 
-        # Use the Didit API endpoint based on documentation
-        DIDIT_SESSION_API_URL = "https://verification.didit.me/v2/session/{session_id}/decision/"
-
         # If user_id is provided and current user is admin, allow checking other users
         if user_id_param and request.user.is_staff:
             try:
@@ -1295,19 +1233,20 @@ class UserViewSet(StandardResponseViewSet):
 
                 if not verification_session:
                     # No verification sessions found, return the user profile with default status
-                    user.is_identity_verified = 'not_started'  # Default status when no verification has been attempted
-                    user.save()
-
+                    sync_user_status(user, 'not started')
                     return standard_response(
                         data=UserSerializer(user).data,
                         status_code=status.HTTP_200_OK
                     )
+                verification_session.user = user
             else:
                 # If session_id is provided, find that specific session
                 try:
-                    verification_session = DiditVerificationSession.objects.get(session_id=session_id)
+                    verification_session = DiditVerificationSession.objects.select_related('user').get(
+                        session_id=session_id
+                    )
                     # Ensure the session belongs to the authenticated user unless user is staff
-                    if verification_session.user != request.user and not request.user.is_staff:
+                    if verification_session.user_id != request.user.id and not request.user.is_staff:
                         return standard_response(
                             status_code=status.HTTP_403_FORBIDDEN,
                             error=["You don't have permission to access this verification session"]
@@ -1319,101 +1258,9 @@ class UserViewSet(StandardResponseViewSet):
                         error=[f"Verification session with id {session_id} not found"]
                     )
 
-            # Call Didit.me API to get the latest status
-            try:
-                # Prepare headers for Didit.me API
-                headers = {
-                    "Accept": "application/json",
-                    "Content-Type": "application/json",
-                    "X-Api-Key": settings.DIDIT_API_KEY
-                }
-
-                # Make API call to Didit to get the current status
-                response = requests.get(
-                    DIDIT_SESSION_API_URL.format(session_id=verification_session.session_id),
-                    headers=headers
-                )
-
-                if response.status_code == 200:
-                    didit_data = response.json()
-                    didit_status = didit_data.get('status', '').lower()
-
-                    # Update the session in our database
-                    verification_session.status = didit_data.get('status', verification_session.status)
-                    verification_session.save()
-
-                    # Map Didit status to our internal status
-                    if didit_status == 'approved':
-                        user.is_identity_verified = 'approved'
-                    elif didit_status in ['declined', 'rejected']:
-                        user.is_identity_verified = 'declined'
-                    elif didit_status == 'expired':
-                        user.is_identity_verified = 'expired'
-                    elif didit_status == 'not started':
-                        user.is_identity_verified = 'not_started'
-                    elif didit_status == 'in progress':
-                        user.is_identity_verified = 'in_progress'
-                    elif didit_status == 'kyc expired':
-                        user.is_identity_verified = 'kyc_expired'
-                    elif didit_status == 'in review':
-                        user.is_identity_verified = 'in_review'
-                    elif didit_status == 'abandoned':
-                        user.is_identity_verified = 'abandoned'
-                    else:
-                        user.is_identity_verified = 'pending'
-
-                    user.save()
-                else:
-                    # If API call fails, use the stored status
-                    current_status = verification_session.status.lower()
-
-                    if current_status == 'approved':
-                        user.is_identity_verified = 'approved'
-                    elif current_status in ['declined', 'rejected']:
-                        user.is_identity_verified = 'declined'
-                    elif current_status == 'expired':
-                        user.is_identity_verified = 'expired'
-                    elif current_status == 'not started':
-                        user.is_identity_verified = 'not_started'
-                    elif current_status == 'in progress':
-                        user.is_identity_verified = 'in_progress'
-                    elif current_status == 'kyc expired':
-                        user.is_identity_verified = 'kyc_expired'
-                    elif current_status == 'in review':
-                        user.is_identity_verified = 'in_review'
-                    elif current_status == 'abandoned':
-                        user.is_identity_verified = 'abandoned'
-                    else:
-                        user.is_identity_verified = 'pending'
-
-                    user.save()
-
-            except Exception as api_error:
-                # If API call fails, log error and use the stored status
-                print(f"Error calling Didit API: {str(api_error)}")
-                # Use the stored status
-                current_status = verification_session.status.lower()
-
-                if current_status == 'approved':
-                    user.is_identity_verified = 'approved'
-                elif current_status in ['declined', 'rejected']:
-                    user.is_identity_verified = 'declined'
-                elif current_status == 'expired':
-                    user.is_identity_verified = 'expired'
-                elif current_status == 'not started':
-                    user.is_identity_verified = 'not_started'
-                elif current_status == 'in progress':
-                    user.is_identity_verified = 'in_progress'
-                elif current_status == 'kyc expired':
-                    user.is_identity_verified = 'kyc_expired'
-                elif current_status == 'in review':
-                    user.is_identity_verified = 'in_review'
-                elif current_status == 'abandoned':
-                    user.is_identity_verified = 'abandoned'
-                else:
-                    user.is_identity_verified = 'pending'
-
-                user.save()
+            sync_user_status(user, verification_session.status)
+            if is_stale(verification_session):
+                refresh_in_background(verification_session)
 
             # Return the complete user profile
             return standard_response(
@@ -1451,34 +1298,11 @@ class UserViewSet(StandardResponseViewSet):
                     error=[f"Verification session with id {session_id} not found"]
                 )
 
-            # Update the session status
+            # Update the session and the user's verification status
             verification_session.status = new_status
             verification_session.save()
-
-            # Update user's verification status
             user = verification_session.user
-            current_status = new_status.lower()
-
-            if current_status == 'approved':
-                user.is_identity_verified = 'approved'
-            elif current_status in ['declined', 'rejected']:
-                user.is_identity_verified = 'declined'
-            elif current_status == 'expired':
-                user.is_identity_verified = 'expired'
-            elif current_status == 'not started':
-                user.is_identity_verified = 'not_started'
-            elif current_status == 'in progress':
-                user.is_identity_verified = 'in_progress'
-            elif current_status == 'kyc expired':
-                user.is_identity_verified = 'kyc_expired'
-            elif current_status == 'in review':
-                user.is_identity_verified = 'in_review'
-            elif current_status == 'abandoned':
-                user.is_identity_verified = 'abandoned'
-            else:
-                user.is_identity_verified = 'pending'
-
-            user.save()
+            sync_user_status(user, new_status)
 
             return standard_response(
                 data={
@@ -1568,27 +1392,7 @@ class ProfileViewSet(StandardResponseViewSet):
         """
         Only allow users to update their own profile
         """
-        try:
-            print("DEBUG ProfileViewSet.update: content_type=", request.content_type)
-            print("DEBUG ProfileViewSet.update: data keys=", list(request.data.keys()))
-            print("DEBUG ProfileViewSet.update: pickup_location_input[name]=",
-                  request.data.get('pickup_location_input[name]'))
-            print("DEBUG ProfileViewSet.update: pickup_location_input[country]=",
-                  request.data.get('pickup_location_input[country]'))
-            print("DEBUG ProfileViewSet.update: pickup_location_input[countryCode]=",
-                  request.data.get('pickup_location_input[countryCode]'))
-            print("DEBUG ProfileViewSet.update: user_location_input[name]=",
-                  request.data.get('user_location_input[name]'))
-            print("DEBUG ProfileViewSet.update: user_location_input[country]=",
-                  request.data.get('user_location_input[country]'))
-            print("DEBUG ProfileViewSet.update: user_location_input[countryCode]=",
-                  request.data.get('user_location_input[countryCode]'))
-            try:
-                print("DEBUG ProfileViewSet.update: FILES keys=", list(request.FILES.keys()))
-            except Exception:
-                pass
-        except Exception as e:
-            print("DEBUG ProfileViewSet.update: logging error:", str(e))
+        _log_profile_payload('update', request)
 
         try:
             instance = self.get_object()
@@ -1607,14 +1411,14 @@ class ProfileViewSet(StandardResponseViewSet):
             )
         except serializers.ValidationError as e:
             # Handle serializer validation errors
-            print(f"DEBUG ProfileViewSet.update: Validation error: {str(e)}")
+            logger.info("ProfileViewSet.update: validation error: %s", e)
             return standard_response(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 error=[f"Validation error: {str(e)}"]
             )
         except Exception as e:
             # Handle any other unexpected errors
-            print(f"DEBUG ProfileViewSet.update: Unexpected error: {str(e)}")
+            logger.exception("ProfileViewSet.update: unexpected error")
             return standard_response(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 error=[f"An error occurred while updating profile: {str(e)}"]
@@ -1624,27 +1428,7 @@ class ProfileViewSet(StandardResponseViewSet):
         """
         Only allow users to partially update their own profile
         """
-        try:
-            print("DEBUG ProfileViewSet.partial_update: content_type=", request.content_type)
-            print("DEBUG ProfileViewSet.partial_update: data keys=", list(request.data.keys()))
-            print("DEBUG ProfileViewSet.partial_update: pickup_location_input[name]=",
-                  request.data.get('pickup_location_input[name]'))
-            print("DEBUG ProfileViewSet.partial_update: pickup_location_input[country]=",
-                  request.data.get('pickup_location_input[country]'))
-            print("DEBUG ProfileViewSet.partial_update: pickup_location_input[countryCode]=",
-                  request.data.get('pickup_location_input[countryCode]'))
-            print("DEBUG ProfileViewSet.partial_update: user_location_input[name]=",
-                  request.data.get('user_location_input[name]'))
-            print("DEBUG ProfileViewSet.partial_update: user_location_input[country]=",
-                  request.data.get('user_location_input[country]'))
-            print("DEBUG ProfileViewSet.partial_update: user_location_input[countryCode]=",
-                  request.data.get('user_location_input[countryCode]'))
-            try:
-                print("DEBUG ProfileViewSet.partial_update: FILES keys=", list(request.FILES.keys()))
-            except Exception:
-                pass
-        except Exception as e:
-            print("DEBUG ProfileViewSet.partial_update: logging error:", str(e))
+        _log_profile_payload('partial_update', request)
 
         try:
             instance = self.get_object()
@@ -1663,14 +1447,14 @@ class ProfileViewSet(StandardResponseViewSet):
             )
         except serializers.ValidationError as e:
             # Handle serializer validation errors
-            print(f"DEBUG ProfileViewSet.partial_update: Validation error: {str(e)}")
+            logger.info("ProfileViewSet.partial_update: validation error: %s", e)
             return standard_response(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 error=[f"Validation error: {str(e)}"]
             )
         except Exception as e:
             # Handle any other unexpected errors
-            print(f"DEBUG ProfileViewSet.partial_update: Unexpected error: {str(e)}")
+            logger.exception("ProfileViewSet.partial_update: unexpected error")
             return standard_response(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 error=[f"An error occurred while updating profile: {str(e)}"]
@@ -1721,14 +1505,8 @@ class GoogleSignInView(APIView):
             )
 
         try:
-            # Verify the token
-            print(settings.GOOGLE_CLIENT_ID)
-            print(token)
-            idinfo = id_token.verify_oauth2_token(
-                token,
-                google_requests.Request(),
-                settings.GOOGLE_CLIENT_ID
-            )
+            # Verify the token against the cached Google certs
+            idinfo = verify_google_id_token(token, settings.GOOGLE_CLIENT_ID)
 
             # Get user info from the token
             email = idinfo['email']
@@ -1738,7 +1516,7 @@ class GoogleSignInView(APIView):
 
             # Try to find existing user
             try:
-                user = CustomUser.objects.get(email=email)
+                user = CustomUser.objects.with_email(email).get()
                 # Update Google ID if not set
                 if not user.google_id:
                     user.google_id = google_id
@@ -1790,6 +1568,8 @@ class AppleSignInView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
+        import jwt
+
         token = request.data.get('token')
         if not token:
             return standard_response(
@@ -1798,17 +1578,7 @@ class AppleSignInView(APIView):
             )
 
         try:
-            unverified_header = jwt.get_unverified_header(token)
-            apple_keys = requests.get(settings.APPLE_PUBLIC_KEY_URL).json()['keys']
-            key = next(k for k in apple_keys if k['kid'] == unverified_header['kid'])
-            public_key = RSAAlgorithm.from_jwk(key)
-            decoded = jwt.decode(
-                token,
-                public_key,
-                algorithms=['RS256'],
-                audience=settings.APPLE_BUNDLE_ID,
-                issuer='https://appleid.apple.com'
-            )
+            decoded = verify_apple_identity_token(token, settings.APPLE_BUNDLE_ID)
 
             # Get user info from the token
             email = decoded.get('email') or request.data.get('email')
@@ -1816,7 +1586,7 @@ class AppleSignInView(APIView):
             full_name = request.data.get('fullName')
 
             try:
-                user = CustomUser.objects.get(email=email)
+                user = CustomUser.objects.with_email(email).get()
                 if not user.apple_id:
                     user.apple_id = apple_id
                     user.save()
@@ -1852,6 +1622,55 @@ class AppleSignInView(APIView):
             )
 
 
+class DiditWebhookView(APIView):
+    """
+    Receives Didit session status webhooks. The raw body must be signed with
+    DIDIT_WEBHOOK_SECRET (X-Signature, X-Timestamp headers).
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        timestamp = request.headers.get('X-Timestamp')
+        if not verify_webhook_signature(request.body, request.headers.get('X-Signature'), timestamp):
+            return standard_response(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                error=['Invalid webhook signature']
+            )
+
+        session_id = request.data.get('session_id')
+        new_status = request.data.get('status')
+        if not session_id or not new_status:
+            return standard_response(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=['session_id and status are required']
+            )
+
+        try:
+            verification_session = DiditVerificationSession.objects.select_related('user').get(
+                session_id=session_id
+            )
+        except DiditVerificationSession.DoesNotExist:
+            return standard_response(
+                status_code=status.HTTP_404_NOT_FOUND,
+                error=[f"Verification session with id {session_id} not found"]
+            )
+
+        # Deliveries can arrive out of order; ignore ones older than what we have.
+        sent_at = datetime.fromtimestamp(int(timestamp), tz=dt_timezone.utc)
+        if not is_out_of_order(verification_session, sent_at):
+            apply_status(verification_session, new_status, sent_at)
+
+        return standard_response(
+            data={
+                'session_id': verification_session.session_id,
+                'session_status': verification_session.status,
+                'verification_status': verification_session.user.is_identity_verified,
+            },
+            status_code=status.HTTP_200_OK
+        )
+
+
 class IdTypeViewSet(StandardResponseViewSet):
     """
     API endpoint for ID types